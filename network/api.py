@@ -0,0 +1,222 @@
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control, set_response_etag
+from rest_framework import serializers
+from rest_framework.pagination import BasePagination
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
+
+from .accounts import import_users
+from .auth import HashingBusy
+from .feeds import load_rows
+from .graph import get_follow_graph, usernames
+from .models import Hashtag, Post, User
+from .pagination import CursorPaginator
+from .tags import TagPaginator, trending, window
+from .templatetags.avatars import avatar_for
+from .timeline import TimelinePaginator
+
+AVATAR_SIZE = 96
+
+
+class PostRowSerializer(serializers.Serializer):
+    """Serializes the dicts of feeds.load_rows; no model instances involved"""
+
+    id = serializers.IntegerField(read_only=True)
+    content = serializers.CharField(read_only=True)
+    created_on = serializers.DateTimeField(read_only=True)
+    like_count = serializers.IntegerField(read_only=True)
+    liked = serializers.BooleanField(source="liked_by_viewer", read_only=True)
+    author = serializers.SerializerMethodField()
+
+    def get_author(self, row):
+        return {
+            "username": row["author"],
+            "avatar": avatar_for(row["author_image"], row["author_thumbnails_ready"], AVATAR_SIZE),
+        }
+
+
+class ImportRowSerializer(serializers.Serializer):
+    """One row of a user import; what network.accounts does with it is documented there"""
+
+    username = serializers.CharField(allow_blank=True)
+    email = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    password = serializers.CharField(required=False, allow_blank=True, allow_null=True, trim_whitespace=False)
+    password_hash = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+class FeedPagination(BasePagination):
+    """
+    DRF front for CursorPaginator: ?cursor= tokens are the same ones the
+    HTML feeds use, ?limit= picks the page size up to max_page_size.
+    """
+
+    page_size = api_settings.PAGE_SIZE or 10
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get("limit", self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate(self, make_paginator, request):
+        """Page of bare (id, created_on) rows; make_paginator(per_page) builds the view's paginator"""
+        self.request = request
+        page = make_paginator(self.get_page_size(request)).get_page(request.query_params.get("cursor"))
+        # Cursors come from the bare rows, before they are swapped for dicts
+        self.next_cursor, self.previous_cursor = page.next_cursor, page.previous_cursor
+        return page
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), "cursor", cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_link(self.next_cursor),
+            "previous": self.get_link(self.previous_cursor),
+            "results": data,
+        })
+
+
+class FeedView(APIView):
+    """
+    Base for the read-only feed endpoints.
+
+    Responses carry an ETag of their body; a matching If-None-Match gets an
+    empty 304, so pollers only download a page when something on it changed.
+    """
+
+    pagination_class = FeedPagination
+
+    def get_paginator(self, per_page):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        pagination = self.pagination_class()
+        page = pagination.paginate(self.get_paginator, request)
+        rows = load_rows(page, request.user)
+        return pagination.get_paginated_response(PostRowSerializer(rows, many=True).data)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in ("GET", "HEAD") or response.status_code != 200:
+            return response
+        response.render()
+        set_response_etag(response)
+        # Always revalidate, but only this user's browser may keep a copy
+        patch_cache_control(response, private=True, no_cache=True)
+        return get_conditional_response(request, etag=response["ETag"], response=response)
+
+
+class PostsFeed(FeedView):
+    """All posts, newest first"""
+
+    def get_paginator(self, per_page):
+        return CursorPaginator(Post.objects.only("id", "created_on"), per_page)
+
+
+class FollowingFeed(FeedView):
+    """Posts of the accounts the user follows"""
+
+    permission_classes = [IsAuthenticated]
+
+    def get_paginator(self, per_page):
+        return TimelinePaginator(self.request.user, per_page)
+
+
+class UserFeed(FeedView):
+    """One user's posts"""
+
+    def get_paginator(self, per_page):
+        author = get_object_or_404(User.objects.only("id"), username=self.kwargs["username"])
+        return CursorPaginator(Post.objects.filter(created_by=author).only("id", "created_on"), per_page)
+
+
+class UserGraph(APIView):
+    """Mutuals, followers-of-followers and who to follow for one user, from the in-memory follow graph"""
+
+    max_limit = 100
+
+    def get(self, request, username):
+        user = get_object_or_404(User.objects.only("id"), username=username)
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 10)), self.max_limit))
+        except ValueError:
+            limit = 10
+        graph = get_follow_graph()
+        mutuals = sorted(graph.mutuals(user.pk))
+        reached = graph.followers_of_followers(user.pk, limit)
+        suggested = graph.suggestions(user.pk, limit)
+        names = usernames({*mutuals[:limit], *(pk for pk, _ in reached), *(pk for pk, _ in suggested)})
+        return Response({
+            "following": len(graph.following(user.pk)),
+            "followers": len(graph.followers(user.pk)),
+            "mutuals": {"count": len(mutuals), "results": [names[pk] for pk in mutuals[:limit] if pk in names]},
+            "followers_of_followers": [{"username": names[pk], "followers": n} for pk, n in reached if pk in names],
+            "suggestions": [{"username": names[pk], "followed_by": n} for pk, n in suggested if pk in names],
+        })
+
+
+class TagFeed(FeedView):
+    """Posts with one #tag"""
+
+    def get_paginator(self, per_page):
+        tag = get_object_or_404(Hashtag.objects.only("id"), name=self.kwargs["tag"].lower())
+        return TagPaginator(tag, per_page)
+
+
+class TrendingTags(APIView):
+    """The most used tags of the trending window, from the counts network.tags keeps"""
+
+    max_limit = 100
+
+    def get(self, request):
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 10)), self.max_limit))
+        except ValueError:
+            limit = 10
+        return Response({
+            "window": window(),
+            "results": [{"tag": name, "posts": posts} for name, posts in trending(limit)],
+        })
+
+
+class UserImport(APIView):
+    """
+    Staff only: {"users": [{"username", "email", "password" or "password_hash"}, ...]} -> the
+    network.accounts import counts. Passwords are hashed in this process, on the bounded
+    hashing pool, since starting a process pool would cost more than a request's hashes;
+    import_users on the command line is the way for whole migrations. Batches are committed
+    as they go, and sending the same users again skips those already created. Raw passwords
+    cost a PBKDF2 hash each inside the request, so only max_passwords of them are taken at a
+    time; send password_hash for more.
+    """
+
+    permission_classes = [IsAdminUser]
+    max_rows = 1000
+    max_passwords = 20
+
+    def post(self, request):
+        rows = request.data.get("users") if isinstance(request.data, dict) else None
+        if not isinstance(rows, list):
+            return Response({"error": "A list of users is required."}, status=400)
+        if len(rows) > self.max_rows:
+            return Response({"error": f"At most {self.max_rows} users per request."}, status=400)
+        serializer = ImportRowSerializer(data=rows, many=True)
+        if not serializer.is_valid():
+            return Response({"error": "Invalid users.", "users": serializer.errors}, status=400)
+        rows = serializer.validated_data
+        if sum(1 for row in rows if row.get("password") and not row.get("password_hash")) > self.max_passwords:
+            return Response({"error": f"At most {self.max_passwords} raw passwords per request; "
+                                      "send password_hash, or use the import_users command."}, status=400)
+        try:
+            result = import_users(rows, processes=0)
+        except HashingBusy:
+            return Response({"error": "Too many passwords being hashed, try again later."}, status=503)
+        return Response(result.as_dict(), status=201)
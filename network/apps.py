@@ -5,4 +5,6 @@ class NetworkConfig(AppConfig):
     name = 'network'
 
     def ready(self):
-        import network.signals
\ No newline at end of file
+        import network.signals
+        from network.metrics import instrument_templates
+        instrument_templates()
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""
+Coroutine versions of the feed views and PUT /post, routed instead of the
+ones in views.py when settings.ASYNC_VIEWS is on (project4/asgi.py turns
+it on; WSGI keeps the sync views).
+
+Django 3.2 has no async ORM, so each view does all of its database work in
+a single sync_to_async hop and renders on the event loop. The loop thread
+is never blocked on the database, and a lazy query left in a template fails
+loudly with SynchronousOnlyOperation rather than stalling it.
+Form posts (new post, follow, upload) are rare and go to the sync views.
+Each view runs on a thread of its own (db.request_thread).
+"""
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import JsonResponse
+from django.shortcuts import render, resolve_url
+
+from . import views
+from .conditional import conditional_feed, following_state, index_state, profile_state
+from .db import request_thread
+from .feeds import load_page
+from .follows import follows
+from .graph import profile_graph
+from .forms import PostModelForm, ProfileForm
+from .models import Post, User
+from .pagination import CursorPaginator
+from .profiles import attach_avatars, profile_of, user_avatar
+from .timeline import TimelinePaginator
+
+
+def _load_user(request):
+    user = request.user
+    if user.is_authenticated:
+        user_avatar(user) # the nav bar shows the avatar
+    return user
+
+
+async def load_user(request):
+    """Resolve the lazy request.user (session, user and profile, avatar) off the event loop"""
+    return await sync_to_async(_load_user)(request)
+
+
+def login_required(login_url=None):
+    """django's login_required for coroutine views; its own wrapper is sync"""
+    def decorator(view):
+        @wraps(view)
+        async def wrapped(request, *args, **kwargs):
+            user = await load_user(request)
+            if not user.is_authenticated:
+                return redirect_to_login(request.get_full_path(), resolve_url(login_url) if login_url else None)
+            return await view(request, *args, **kwargs)
+        return wrapped
+    return decorator
+
+
+def _index_page(viewer, cursor):
+    posts = Post.objects.only("id", "created_on")
+    return load_page(CursorPaginator(posts, 10).get_page(cursor), viewer)
+
+
+@request_thread
+@conditional_feed(index_state)
+async def index(request):
+    if request.method == "POST":
+        return await sync_to_async(views.index)(request)
+
+    user = await load_user(request)
+    page_obj = await sync_to_async(_index_page)(user, request.GET.get("cursor"))
+    return render(request, "network/index.html", {
+        'form': PostModelForm(),
+        'current_user': user,
+        'page_obj': page_obj
+    })
+
+
+def _profile_context(viewer, user_name, cursor):
+    profile_user = User.objects.select_related("profile").get(username=user_name)
+    attach_avatars([viewer, profile_user])
+    posts = Post.objects.filter(created_by=profile_user).only("id", "created_on")
+    return {
+        "profile_user": profile_user,
+        "current_user": viewer,
+        "is_following": follows(viewer, profile_user),
+        "page_obj": load_page(CursorPaginator(posts, 10).get_page(cursor), viewer),
+        "form": ProfileForm(instance=profile_of(viewer)),
+        **profile_graph(viewer, profile_user),
+    }
+
+
+@request_thread
+@login_required(login_url="login")
+@conditional_feed(profile_state)
+async def profile(request, user_name):
+    if request.method == "POST":
+        return await sync_to_async(views.profile)(request, user_name)
+
+    context = await sync_to_async(_profile_context)(request.user, user_name, request.GET.get("cursor"))
+    return render(request, "network/profile.html", context)
+
+
+def _following_page(viewer, cursor):
+    return load_page(TimelinePaginator(viewer, 10).get_page(cursor), viewer)
+
+
+@request_thread
+@login_required(login_url="login")
+@conditional_feed(following_state)
+async def following(request):
+    if request.method == "POST":
+        return await sync_to_async(views.following)(request)
+
+    page_obj = await sync_to_async(_following_page)(request.user, request.GET.get("cursor"))
+    return render(request, "network/following.html", {
+        'form': PostModelForm(),
+        'name': request.user,
+        "page_obj": page_obj
+    })
+
+
+@request_thread
+@login_required()
+async def post(request):
+    if request.method != "PUT":
+        return JsonResponse({
+            "error": "PUT request required."
+        }, status=400)
+    return await sync_to_async(views.update_post)(request.user, json.loads(request.body))
+
+# csrf_exempt's wrapper is sync, so mark the coroutine directly
+post.csrf_exempt = True
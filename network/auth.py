@@ -0,0 +1,104 @@
+"""
+Authentication fast path.
+
+ProfileBackend loads the signed-in user together with their Profile in one
+query. Django resolves request.user once per request and keeps it on the
+request, so together with the cached sessions (SESSION_ENGINE) a signed-in
+page costs a single query before the view's own.
+
+PooledPBKDF2PasswordHasher runs the PBKDF2 work in a pool of
+PASSWORD_HASH_WORKERS threads (hashlib releases the GIL while it hashes), so
+a burst of logins or sign-ups keeps at most that many cores busy and feed
+requests keep the rest. Up to PASSWORD_HASH_QUEUE more wait their turn for at
+most PASSWORD_HASH_WAIT seconds; past that HashingBusy is raised and the login
+and register views answer 503.
+
+ProfileBackend is the only backend listed, so a failed login is hashed once.
+LegacySessionMiddleware moves sessions signed in through ModelBackend before
+it existed over to it, instead of signing them out.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.utils.deprecation import MiddlewareMixin
+
+from .models import User
+
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+
+THREAD_PREFIX = "password-hash"
+
+
+class HashingBusy(Exception):
+    """More password hashes are waiting than PASSWORD_HASH_QUEUE allows"""
+
+
+class ProfileBackend(ModelBackend):
+    def get_user(self, user_id):
+        try:
+            user = User._default_manager.select_related("profile").get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+
+LEGACY_BACKENDS = ("django.contrib.auth.backends.ModelBackend",)
+
+
+class LegacySessionMiddleware(MiddlewareMixin):
+    """Point sessions made by a LEGACY_BACKENDS backend at ProfileBackend; goes before AuthenticationMiddleware"""
+
+    def process_request(self, request):
+        if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            return
+        if request.session.get(BACKEND_SESSION_KEY) in LEGACY_BACKENDS:
+            request.session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+
+
+def get_hashing_pool():
+    """The process's hashing pool and the semaphore bounding the hashes running or queued on it"""
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            workers = getattr(settings, "PASSWORD_HASH_WORKERS", 2)
+            _slots = threading.BoundedSemaphore(workers + getattr(settings, "PASSWORD_HASH_QUEUE", 32))
+            _pool = ThreadPoolExecutor(workers, thread_name_prefix=THREAD_PREFIX)
+        return _pool, _slots
+
+
+def _forget_pool():
+    """A forked child has none of the pool's threads: it starts a pool of its own when it needs one"""
+    global _pool, _slots, _pool_lock
+    _pool = _slots = None
+    _pool_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_pool)
+
+
+def run_hash(function, *args):
+    """function(*args) on the hashing pool; raises HashingBusy if no slot frees up in PASSWORD_HASH_WAIT seconds"""
+    if threading.current_thread().name.startswith(THREAD_PREFIX):
+        return function(*args)
+    pool, slots = get_hashing_pool()
+    if not slots.acquire(timeout=getattr(settings, "PASSWORD_HASH_WAIT", 5)):
+        raise HashingBusy()
+    try:
+        return pool.submit(function, *args).result()
+    finally:
+        slots.release()
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """Django's default hasher, same algorithm and hashes, run on the hashing pool"""
+
+    def encode(self, password, salt, iterations=None):
+        return run_hash(super().encode, password, salt, iterations)
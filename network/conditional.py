@@ -0,0 +1,147 @@
+"""
+Conditional GET for the HTML feeds (index, following, profile).
+
+A feed page is a function of a few things that are cheap to read: the
+created_on of the feed's newest post (one indexed read), and version stamps
+(FeedVersion rows, one indexed read) for what changes pages without adding
+a post:
+
+    likes            any like or unlike (like counts and hearts)
+    cards            a post edited or deleted, an author's avatar changed
+    follows          any follow or unfollow (counts, mutuals, suggestions)
+    follows:<id>     a follow or unfollow by or of that user (their timeline)
+
+A stamp is the time of the last change in nanoseconds, written on commit, so
+a page rendered from the old rows never goes out under the new stamp. They
+live in the database rather than the cache so that every worker sees every
+change; a name never bumped has stamp 0. The stamps are coarse: any like
+anywhere changes every feed's ETag, which only costs one ordinary render.
+
+conditional_feed hashes them with the viewer into an ETag, and takes the
+newest of them, rounded up to the second, as Last-Modified. A request that
+already has the page gets a 304 before the view runs its feed query or
+renders a template. Pages for a
+signed-in viewer are private and revalidated on every use; the anonymous
+index is public, so a shared proxy may serve it for FEED_SHARED_MAX_AGE
+seconds and revalidate it after. Its Vary: Cookie keeps signed-in viewers
+off the shared copy.
+"""
+import asyncio
+import hashlib
+import math
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .models import FeedVersion, Post
+from .pagination import CursorPaginator
+from .timeline import TimelinePaginator
+
+
+def bump(*names):
+    """Stamp names as changed now; call it once the change is committed"""
+    now = time.time_ns()
+    # Never backwards, even when another worker's clock is ahead of this one's
+    updated = FeedVersion.objects.filter(name__in=names).update(stamp=Greatest(F("stamp") + 1, Value(now)))
+    if updated < len(names):
+        FeedVersion.objects.bulk_create([FeedVersion(name=name, stamp=now) for name in names], ignore_conflicts=True)
+
+
+def versions(*names):
+    """[stamp of each name]; 0 for names never bumped"""
+    found = dict(FeedVersion.objects.filter(name__in=names).values_list("name", "stamp"))
+    return [found.get(name, 0) for name in names]
+
+
+def likes_changed():
+    bump("likes")
+
+
+def cards_changed():
+    bump("cards")
+
+
+def follows_changed(*user_ids):
+    bump("follows", *(f"follows:{pk}" for pk in user_ids))
+
+
+def index_state(request):
+    """(newest post, versions) the All Posts page depends on"""
+    return CursorPaginator(Post.objects.only("id", "created_on"), 1).newest(), ("likes", "cards")
+
+
+def following_state(request):
+    """(newest post, versions) of the viewer's Following page"""
+    viewer = request.user
+    return TimelinePaginator(viewer, 1).newest(), ("likes", "cards", f"follows:{viewer.pk}")
+
+
+def profile_state(request, user_name):
+    """(newest post, versions) of user_name's profile page"""
+    posts = Post.objects.filter(created_by__username=user_name).only("id", "created_on")
+    return CursorPaginator(posts, 1).newest(), ("likes", "cards", "follows")
+
+
+def validators(state, request, *args, **kwargs):
+    """(ETag, Last-Modified timestamp) of the page state describes, as the viewer sees it"""
+    newest, names = state(request, *args, **kwargs)
+    stamps = versions(*names)
+    viewer = request.user
+    # A signed-in page embeds the CSRF token, which changes when the viewer logs in again
+    csrf = request.META.get("CSRF_COOKIE", "") if viewer.is_authenticated else ""
+    raw = f"{state.__name__}\0{viewer.pk}\0{csrf}\0{newest.isoformat() if newest else ''}\0{stamps}"
+    last_modified = max([newest.timestamp() if newest else 0] + [stamp / 1e9 for stamp in stamps])
+    return f'"{hashlib.md5(raw.encode()).hexdigest()}"', math.ceil(last_modified)
+
+
+def tag(request, response, etag, last_modified):
+    if response.status_code not in (200, 304):
+        return response
+    response.setdefault("ETag", etag)
+    # Last-Modified has whole seconds, rounded up from the last change. Until that second is
+    # over a further change would get the same date, so the page goes out with its ETag only
+    if last_modified <= time.time():
+        response.setdefault("Last-Modified", http_date(last_modified))
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, public=True, max_age=0, s_maxage=getattr(settings, "FEED_SHARED_MAX_AGE", 10))
+    patch_vary_headers(response, ("Cookie",))
+    return response
+
+
+def conditional_feed(state):
+    """
+    Answer GET and HEAD with a 304 when the client's copy of the page is
+    current, without calling the view; tag the view's pages otherwise.
+    Wraps sync views and coroutine views alike; goes inside login_required.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapped(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return await view(request, *args, **kwargs)
+                etag, last_modified = await sync_to_async(validators)(state, request, *args, **kwargs)
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return tag(request, response, etag, last_modified)
+        else:
+            @wraps(view)
+            def wrapped(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return view(request, *args, **kwargs)
+                etag, last_modified = validators(state, request, *args, **kwargs)
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = view(request, *args, **kwargs)
+                return tag(request, response, etag, last_modified)
+        return wrapped
+    return decorator
@@ -0,0 +1,39 @@
+from functools import wraps
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+
+def tune_sqlite(sender, connection, **kwargs):
+    """Run settings.SQLITE_PRAGMAS on each new SQLite connection"""
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def _release_connection():
+    # Like request_finished would; left open inside a transaction (tests)
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+def request_thread(view):
+    """
+    Run a coroutine's sync_to_async hops on a thread of its own, then close
+    that thread's connection.
+
+    The ASGI handler runs every thread-sensitive call of every request on one
+    shared thread, which would queue all database work behind one connection.
+    """
+    @wraps(view)
+    async def wrapped(*args, **kwargs):
+        async with ThreadSensitiveContext():
+            try:
+                return await view(*args, **kwargs)
+            finally:
+                await sync_to_async(_release_connection)()
+    return wrapped
@@ -0,0 +1,45 @@
+from django.db.models import BooleanField, Exists, F, OuterRef, Value
+
+from .models import Post
+from .profiles import attach_avatars, avatars
+
+
+def feed_posts(viewer):
+    """
+    Posts with everything a post card renders but avatars, in one query:
+    author joined, liked_by_viewer annotated next to the stored like_count.
+    """
+    if viewer.is_authenticated:
+        liked_by_viewer = Exists(Post.liker.through.objects.filter(post_id=OuterRef("pk"), user_id=viewer.pk))
+    else:
+        liked_by_viewer = Value(False, output_field=BooleanField())
+
+    return (Post.objects
+            .select_related("created_by")
+            .annotate(liked_by_viewer=liked_by_viewer))
+
+
+def load_page(page, viewer):
+    """Swap a page's bare rows for fully loaded posts, keeping the page order, and look their authors' avatars up"""
+    ids = [post.pk for post in page.object_list]
+    loaded = feed_posts(viewer).in_bulk(ids)
+    page.object_list = [loaded[pk] for pk in ids if pk in loaded]
+    # The viewer's own, for the nav bar, comes along in the same lookup
+    attach_avatars([post.created_by for post in page.object_list] + ([viewer] if viewer.is_authenticated else []))
+    return page
+
+
+def load_rows(page, viewer):
+    """
+    Like load_page, but as plain dicts from values(): the JSON API never
+    builds Post, User or Profile instances.
+    """
+    ids = [post.pk for post in page.object_list]
+    rows = (feed_posts(viewer).filter(pk__in=ids)
+            .values("id", "content", "created_on", "like_count", "liked_by_viewer", "created_by_id",
+                    author=F("created_by__username")))
+    loaded = {row["id"]: row for row in rows}
+    found = avatars(row["created_by_id"] for row in loaded.values())
+    for row in loaded.values():
+        row["author_image"], row["author_thumbnails_ready"] = found[row["created_by_id"]]
+    return [loaded[pk] for pk in ids if pk in loaded]
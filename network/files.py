@@ -0,0 +1,190 @@
+"""
+Static and media files served in front of Django.
+
+Outside DEBUG, wsgi_files and asgi_files answer GET and HEAD requests for
+files under STATIC_ROOT and MEDIA_ROOT before the request reaches Django:
+no middleware, URL resolving or view runs for them. Everything else, and any
+file that does not exist, goes on to the application.
+
+Static files are sent as the .br or .gz copy that
+CompressedManifestStaticFilesStorage wrote at collect time when the client
+accepts it. Names with a content hash in them (the manifest's fingerprinted
+names, content-addressed uploads) never change, so they are cached as
+immutable for a year; the rest for STATIC_MAX_AGE seconds. Every file gets an
+ETag and Last-Modified, and a matching conditional request a 304.
+
+The body is handed to the server as an open file: wsgi.file_wrapper, which
+servers like gunicorn turn into sendfile(), or the ASGI zero-copy send
+extension, else chunks read off the event loop.
+"""
+import asyncio
+import mimetypes
+import os
+import stat
+from collections import namedtuple
+from urllib.parse import unquote
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+
+from .storage import is_content_addressed
+
+BLOCK_SIZE = 64 * 1024
+IMMUTABLE = "public, max-age=31536000, immutable"
+ENCODINGS = (("br", ".br"), ("gzip", ".gz")) # by preference
+
+# status, headers [(name, value)], path of the body or None
+Found = namedtuple("Found", "status headers path")
+
+_fingerprinted = None
+
+
+def fingerprinted():
+    """Names in the collectstatic manifest that carry their content hash"""
+    global _fingerprinted
+    if _fingerprinted is None:
+        _fingerprinted = frozenset(getattr(staticfiles_storage, "hashed_files", {}).values())
+    return _fingerprinted
+
+
+def accepted_encodings(header):
+    """Codings an Accept-Encoding header allows, i.e. not given q=0"""
+    accepted = set()
+    for part in header.split(","):
+        coding, *params = [piece.strip() for piece in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+def roots():
+    """(URL prefix, directory, is static) pairs served here; static only with a local STATIC_URL"""
+    served = []
+    if settings.STATIC_URL and settings.STATIC_URL.startswith("/") and settings.STATIC_ROOT:
+        served.append((settings.STATIC_URL, settings.STATIC_ROOT, True))
+    if settings.MEDIA_URL and settings.MEDIA_URL.startswith("/") and settings.MEDIA_ROOT:
+        served.append((settings.MEDIA_URL, settings.MEDIA_ROOT, False))
+    return served
+
+
+def find(method, path, accept_encoding="", if_none_match=None, if_modified_since=None):
+    """The response for a static or media file at URL path, or None to leave the request to Django"""
+    if settings.DEBUG or method not in ("GET", "HEAD"):
+        return None
+    for prefix, root, static in roots():
+        if path.startswith(prefix):
+            name = unquote(path[len(prefix):])
+            break
+    else:
+        return None
+    try:
+        filename = safe_join(root, name)
+    except (SuspiciousFileOperation, ValueError):
+        return None
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+
+    content_type, encoding = mimetypes.guess_type(filename)
+    headers = [("Content-Type", content_type or "application/octet-stream")]
+    if static:
+        immutable = name in fingerprinted()
+        accepted = accepted_encodings(accept_encoding)
+        variants = False
+        for coding, suffix in ENCODINGS:
+            try:
+                encoded = os.stat(filename + suffix)
+            except OSError:
+                continue
+            variants = True
+            if coding in accepted:
+                filename, st = filename + suffix, encoded
+                headers.append(("Content-Encoding", coding))
+                break
+        if variants:
+            headers.append(("Vary", "Accept-Encoding"))
+    else:
+        immutable = is_content_addressed(name)
+        if encoding:
+            headers.append(("Content-Encoding", encoding))
+
+    etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+    headers += [
+        ("Cache-Control", IMMUTABLE if immutable else f"public, max-age={getattr(settings, 'STATIC_MAX_AGE', 60)}"),
+        ("ETag", etag),
+        ("Last-Modified", http_date(st.st_mtime)),
+    ]
+    if if_none_match is not None:
+        not_modified = etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    else:
+        since = parse_http_date_safe(if_modified_since) if if_modified_since else None
+        not_modified = since is not None and int(st.st_mtime) <= since
+    if not_modified:
+        return Found("304 Not Modified", [h for h in headers if h[0] != "Content-Type"], None)
+    headers.append(("Content-Length", str(st.st_size)))
+    return Found("200 OK", headers, filename if method == "GET" else None)
+
+
+def wsgi_files(application):
+    """Wrap the WSGI application so that static and media files are served before it"""
+    def app(environ, start_response):
+        # PATH_INFO holds the URL's bytes decoded as latin-1
+        path = environ.get("PATH_INFO", "").encode("iso-8859-1").decode("utf-8", "replace")
+        found = find(environ.get("REQUEST_METHOD"), path, environ.get("HTTP_ACCEPT_ENCODING", ""),
+                     environ.get("HTTP_IF_NONE_MATCH"), environ.get("HTTP_IF_MODIFIED_SINCE"))
+        if found is None:
+            return application(environ, start_response)
+        start_response(found.status, found.headers)
+        if found.path is None:
+            return []
+        return environ.get("wsgi.file_wrapper", FileWrapper)(open(found.path, "rb"), BLOCK_SIZE)
+    return app
+
+
+def asgi_files(application):
+    """Wrap the ASGI application so that static and media files are served before it"""
+    async def app(scope, receive, send):
+        if scope["type"] == "http":
+            headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+            found = find(scope["method"], scope["path"], headers.get("accept-encoding", ""),
+                         headers.get("if-none-match"), headers.get("if-modified-since"))
+            if found is not None:
+                return await send_file(scope, send, found)
+        return await application(scope, receive, send)
+    return app
+
+
+async def send_file(scope, send, found):
+    await send({
+        "type": "http.response.start",
+        "status": int(found.status.split()[0]),
+        "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in found.headers],
+    })
+    if found.path is None:
+        return await send({"type": "http.response.body"})
+    loop = asyncio.get_running_loop()
+    f = await loop.run_in_executor(None, open, found.path, "rb")
+    try:
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            return await send({"type": "http.response.zerocopysend", "file": f})
+        while True:
+            chunk = await loop.run_in_executor(None, f.read, BLOCK_SIZE)
+            await send({"type": "http.response.body", "body": chunk, "more_body": bool(chunk)})
+            if not chunk:
+                return
+    finally:
+        f.close()
@@ -0,0 +1,39 @@
+from django.core.cache import caches
+from django.db.models import F
+
+from .models import Profile, UserFollowing
+from .profiles import increment
+
+# "does A follow B" answers live this long in the "follows" cache, which all workers
+# share (or which caches nothing); writes overwrite them immediately
+RELATIONSHIP_TTL = 60 * 60
+
+
+def relationship_key(user_id, target_id):
+    return f"network:follows:{user_id}:{target_id}"
+
+
+def follows(user, target):
+    """Whether user follows target, served from cache after the first lookup"""
+    if not user.is_authenticated or user.pk == target.pk:
+        return False
+    key = relationship_key(user.pk, target.pk)
+    answer = caches["follows"].get(key)
+    if answer is None:
+        answer = UserFollowing.objects.filter(user_id=user.pk, following_user_id=target.pk).exists()
+        caches["follows"].set(key, answer, RELATIONSHIP_TTL)
+    return answer
+
+
+def record_follow(follow):
+    """A UserFollowing row was created: bump both counters and cache the edge"""
+    increment(follow.user_id_id, "following_count")
+    increment(follow.following_user_id_id, "follower_count")
+    caches["follows"].set(relationship_key(follow.user_id_id, follow.following_user_id_id), True, RELATIONSHIP_TTL)
+
+
+def record_unfollow(follow):
+    """A UserFollowing row was deleted: drop both counters and cache the missing edge"""
+    Profile.objects.filter(user_id=follow.user_id_id, following_count__gt=0).update(following_count=F("following_count") - 1)
+    Profile.objects.filter(user_id=follow.following_user_id_id, follower_count__gt=0).update(follower_count=F("follower_count") - 1)
+    caches["follows"].set(relationship_key(follow.user_id_id, follow.following_user_id_id), False, RELATIONSHIP_TTL)
@@ -17,5 +17,4 @@ class PostModelForm(forms.ModelForm):
 class ProfileForm(forms.ModelForm):
 	class Meta:
 		model = Profile
-		fields = '__all__'
-		exclude = ['user']
\ No newline at end of file
+		fields = ('image',)
\ No newline at end of file
@@ -0,0 +1,277 @@
+"""
+In-memory follow graph for mutuals, followers-of-followers and suggestions.
+
+UserFollowing is loaded into two CSR (compressed sparse row) adjacency
+structures indexed by user id: the accounts each user follows and each
+user's followers. A row is the slice targets[offsets[id]:offsets[id + 1]],
+kept sorted; a million edges take about 8 MB of machine ints in stdlib
+arrays instead of a million Python objects.
+
+The arrays are never changed in place. Follows and unfollows committed by
+this process (signals.follow_graph_add / follow_graph_remove) go into small
+per-user overlays that reads merge in. The graph is reloaded once the
+overlays hold FOLLOW_GRAPH_COMPACT edges, or after FOLLOW_GRAPH_MAX_AGE
+seconds so that follows made by other processes show up. Reloads run on a
+background thread while requests keep reading the old graph; follows
+committed meanwhile are replayed onto the new one before it is swapped in.
+"""
+import heapq
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from itertools import accumulate, repeat
+
+from django.conf import settings
+from django.db import connection
+
+from .models import User, UserFollowing
+
+logger = logging.getLogger(__name__)
+
+SAMPLE = 1000 # first-hop accounts walked for two-hop queries; bounds them for accounts with huge rows
+
+
+def _csr(size, edges):
+    """
+    (offsets, targets, sources) of the (source, target) edges, which must be
+    sorted by source; offsets grow past size for users newer than it.
+    """
+    counts = array("i", repeat(0, size + 1))
+    sources, targets = array("i"), array("i")
+    for source, target in edges:
+        if source + 1 >= len(counts):
+            counts.extend(repeat(0, source + 2 - len(counts)))
+        counts[source + 1] += 1
+        sources.append(source)
+        targets.append(target)
+    return array("i", accumulate(counts)), targets, sources
+
+
+def _transpose(size, sources, targets):
+    """The CSR of the reversed edges, by counting sort: rows come out sorted since sources are"""
+    counts = array("i", repeat(0, size + 1))
+    for target in targets:
+        counts[target + 1] += 1
+    offsets = array("i", accumulate(counts))
+    position = array("i", offsets)
+    reversed_targets = array("i", repeat(0, len(targets)))
+    for source, target in zip(sources, targets):
+        reversed_targets[position[target]] = source
+        position[target] += 1
+    return offsets, reversed_targets
+
+
+class Adjacency:
+    """One direction of the graph: a CSR snapshot plus the edges added and removed since"""
+
+    def __init__(self, offsets, targets):
+        self.offsets = offsets
+        self.targets = targets
+        self.added = defaultdict(set)
+        self.removed = defaultdict(set)
+
+    def base(self, node):
+        if node + 1 >= len(self.offsets):
+            return array("i") # joined after the snapshot
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def in_base(self, node, other):
+        row = self.base(node)
+        i = bisect_left(row, other)
+        return i < len(row) and row[i] == other
+
+    def add(self, node, other):
+        self.removed[node].discard(other)
+        if not self.in_base(node, other):
+            self.added[node].add(other)
+
+    def remove(self, node, other):
+        self.added[node].discard(other)
+        if self.in_base(node, other):
+            self.removed[node].add(other)
+
+    def neighbours(self, node):
+        """Neighbours of node as cheaply as possible: the CSR slice itself unless the overlay touches it"""
+        if node in self.removed or node in self.added:
+            return self.row(node)
+        return self.base(node)
+
+    def row(self, node):
+        """Neighbours of node, a set"""
+        row = set(self.base(node))
+        if node in self.removed:
+            row -= self.removed[node]
+        if node in self.added:
+            row |= self.added[node]
+        return row
+
+    def degree(self, node):
+        base = self.offsets[node + 1] - self.offsets[node] if node + 1 < len(self.offsets) else 0
+        return base - len(self.removed.get(node, ())) + len(self.added.get(node, ()))
+
+
+class FollowGraph:
+    def __init__(self, size, edges):
+        offsets, targets, sources = _csr(size, edges)
+        # Users created after size was read may already follow or be followed
+        size = max(len(offsets) - 1, max(targets, default=-1) + 1)
+        self.follows = Adjacency(offsets, targets)
+        self.followed = Adjacency(*_transpose(size, sources, targets))
+        self.changes = 0
+        self.loaded = time.monotonic()
+        # Most-followed accounts, suggested to users who follow nobody yet
+        self.popular = heapq.nlargest(100, range(size), key=self.followed.degree)
+
+    @classmethod
+    def load(cls):
+        size = (User.objects.order_by("-id").values_list("id", flat=True).first() or 0) + 1
+        edges = (UserFollowing.objects.order_by("user_id", "following_user_id")
+                 .values_list("user_id", "following_user_id").iterator(chunk_size=10000))
+        return cls(size, edges)
+
+    def follow(self, follower, followed):
+        self.follows.add(follower, followed)
+        self.followed.add(followed, follower)
+        self.changes += 1
+
+    def unfollow(self, follower, followed):
+        self.follows.remove(follower, followed)
+        self.followed.remove(followed, follower)
+        self.changes += 1
+
+    def following(self, user_id):
+        return self.follows.row(user_id)
+
+    def followers(self, user_id):
+        return self.followed.row(user_id)
+
+    def mutuals(self, user_id):
+        """Accounts that user follows and that follow user back"""
+        return self.following(user_id) & self.followers(user_id)
+
+    def known_followers(self, viewer_id, user_id):
+        """Accounts viewer follows that follow user"""
+        return self.following(viewer_id) & self.followers(user_id)
+
+    def _two_hop(self, first, adjacency, exclude, limit):
+        """The limit nodes reached most often in one more hop from first, more-followed first on ties"""
+        reached = Counter()
+        for node in sorted(first)[:SAMPLE]:
+            reached.update(adjacency.neighbours(node))
+        for node in exclude:
+            reached.pop(node, None)
+        return heapq.nlargest(limit, reached.items(), key=lambda item: (item[1], self.followed.degree(item[0])))
+
+    def followers_of_followers(self, user_id, limit=10):
+        """[(account, followers of user it follows)] for accounts not yet following user"""
+        followers = self.followers(user_id)
+        return self._two_hop(followers, self.followed, followers | {user_id}, limit)
+
+    def suggestions(self, user_id, limit=10):
+        """[(account, accounts user follows that follow it)]: who to follow, most vouched for first"""
+        following = self.following(user_id)
+        picks = self._two_hop(following, self.follows, following | {user_id}, limit)
+        if len(picks) < limit:
+            # Nothing to go on yet: fill up with the most followed accounts
+            taken = following | {user_id} | {node for node, _ in picks}
+            picks += [(node, 0) for node in self.popular if node not in taken][:limit - len(picks)]
+        return picks
+
+    def stale(self):
+        overlay = getattr(settings, "FOLLOW_GRAPH_COMPACT", 10000)
+        max_age = getattr(settings, "FOLLOW_GRAPH_MAX_AGE", 300)
+        return self.changes >= overlay or time.monotonic() - self.loaded > max_age
+
+
+_graph = None
+_graph_lock = threading.Lock() # guards _graph, _replay and _reloader; never held while loading
+_load_lock = threading.Lock()  # one load at a time
+_replay = None                 # [(method, follower, followed)] committed while a load reads the table
+_reloader = None               # the background reload thread, while it runs
+
+
+def _load():
+    """Read a new graph without holding _graph_lock, catch it up and swap it in; hold _load_lock"""
+    global _graph, _replay, _reloader
+    with _graph_lock:
+        _replay = []
+    try:
+        fresh = FollowGraph.load()
+    except BaseException:
+        with _graph_lock:
+            _replay = _reloader = None
+        raise
+    with _graph_lock:
+        for method, follower, followed in _replay:
+            getattr(fresh, method)(follower, followed)
+        _graph, _replay, _reloader = fresh, None, None
+    return fresh
+
+
+def _reload():
+    try:
+        with _load_lock:
+            _load()
+    except Exception:
+        logger.exception("Follow graph reload failed")
+    finally:
+        connection.close()
+
+
+def get_follow_graph():
+    """
+    The process-wide FollowGraph. The first call loads it; once it is stale
+    a background thread loads a new one and the stale one is served until then.
+    """
+    global _reloader
+    with _graph_lock:
+        graph = _graph
+        if graph is not None and graph.stale() and _reloader is None:
+            _reloader = threading.Thread(target=_reload, name="follow-graph-reload", daemon=True)
+            _reloader.start()
+    if graph is not None:
+        return graph
+    with _load_lock:
+        # Another request may have loaded it while this one waited
+        return _graph if _graph is not None else _load()
+
+
+def _record(method, follower, followed):
+    with _graph_lock:
+        if _graph is not None:
+            getattr(_graph, method)(follower, followed)
+        if _replay is not None:
+            _replay.append((method, follower, followed))
+
+
+def record_follow(follower, followed):
+    """Called once a follow is committed; a graph not loaded yet will read it from the table"""
+    _record("follow", follower, followed)
+
+
+def record_unfollow(follower, followed):
+    _record("unfollow", follower, followed)
+
+
+def usernames(ids):
+    """{id: username} of the users, in one query"""
+    return dict(User.objects.filter(id__in=list(ids)).values_list("id", "username"))
+
+
+def profile_graph(viewer, profile_user, limit=3):
+    """Graph facts the profile page shows"""
+    graph = get_follow_graph()
+    context = {"mutual_count": len(graph.mutuals(profile_user.pk))}
+    if viewer.is_authenticated and viewer.pk != profile_user.pk:
+        known = sorted(graph.known_followers(viewer.pk, profile_user.pk))
+        names = usernames(known[:limit])
+        context["known_followers"] = [names[pk] for pk in known[:limit] if pk in names]
+        context["known_followers_more"] = max(len(known) - limit, 0)
+    elif viewer.is_authenticated:
+        picks = graph.suggestions(viewer.pk, 5)
+        names = usernames(pk for pk, _ in picks)
+        context["suggestions"] = [names[pk] for pk, _ in picks if pk in names]
+    return context
@@ -0,0 +1,92 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .models import Profile
+from .profiles import forget_avatars
+from .storage import avatar_storage, is_content_addressed
+
+logger = logging.getLogger(__name__)
+
+
+def thumbnail_sizes():
+    return getattr(settings, "THUMBNAIL_SIZES", (64, 128, 256))
+
+
+def thumbnail_name(image_name, size):
+    """profile_pics/harry.jpg -> profile_pics/thumbs/harry_128.webp"""
+    folder, filename = os.path.split(image_name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(folder, "thumbs", f"{stem}_{size}.webp")
+
+
+def make_thumbnails(image_name, force=False):
+    """Decode once, crop square, and write every size as metadata-free WebP"""
+    names = {size: thumbnail_name(image_name, size) for size in thumbnail_sizes()}
+    if not force and is_content_addressed(image_name) and all(default_storage.exists(n) for n in names.values()):
+        # Same bytes were processed before (dedup'd upload)
+        return
+
+    with avatar_storage.open(image_name, "rb") as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image) # bake in the rotation before EXIF is dropped
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+        side = min(image.size)
+        image = ImageOps.fit(image, (side, side), Image.LANCZOS)
+
+    for size in thumbnail_sizes():
+        thumb = image.resize((size, size), Image.LANCZOS) if side > size else image
+        buffer = BytesIO()
+        # A fresh image carries no EXIF/ICC/XMP, so nothing identifying is written
+        thumb.save(buffer, "WEBP", quality=80, method=6)
+        name = names[size]
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def process_profile_image(profile_id):
+    """Build the thumbnails of a profile's current image and mark them ready"""
+    row = Profile.objects.filter(pk=profile_id).values_list("image", "user_id").first()
+    if not row or not row[0]:
+        return
+    image_name, user_id = row
+    make_thumbnails(image_name)
+    # Only flag the image we processed; a newer upload queues its own job
+    if Profile.objects.filter(pk=profile_id, image=image_name).update(thumbnails_ready=True):
+        forget_avatars([user_id])
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=getattr(settings, "IMAGE_WORKERS", 2),
+                                           thread_name_prefix="thumbnails")
+        return _executor
+
+
+def _run(profile_id):
+    try:
+        process_profile_image(profile_id)
+    except Exception:
+        logger.exception("Thumbnail processing failed for profile %s", profile_id)
+    finally:
+        connection.close()
+
+
+def queue_profile_image(profile):
+    """Process a freshly uploaded image on the worker pool once the upload is committed"""
+    transaction.on_commit(lambda: get_executor().submit(_run, profile.pk))
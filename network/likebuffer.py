@@ -0,0 +1,122 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection
+
+from .likes import Like, apply_likes
+
+logger = logging.getLogger(__name__)
+
+
+class LikeBuffer:
+    """
+    Write-behind buffer for like toggles.
+
+    Toggles are coalesced per (user, post) in memory and written in one
+    transaction every `interval` seconds, so a storm of clicks on a hot post
+    turns into a single batch instead of a queue of writers on the same row.
+    A flush writes final states (not toggles) and recounts, so replaying it is
+    harmless and a crash loses at most one interval of clicks.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.pending = {}   # (user_id, post_id) -> [liked in db, liked now]
+        self.flushing = {}  # (user_id, post_id) -> liked, for the batch being written
+        self.deltas = {}    # post_id -> like_count change not yet committed
+        self.flushes = 0    # batches finished, so a membership read from before one is dropped
+        self.timer = None
+
+    def toggle(self, post_id, user_id, like_count):
+        """Queue a like toggle -> (liked, optimistic like_count)"""
+        key = (user_id, post_id)
+        in_db = read_at = None
+        while True:
+            with self.lock:
+                state = self.pending.get(key)
+                if state is None:
+                    # The batch being written is the db state as soon as it commits
+                    if key in self.flushing:
+                        in_db = self.flushing[key]
+                    elif read_at != self.flushes:
+                        in_db = None
+                    if in_db is not None:
+                        state = self.pending[key] = [in_db, in_db]
+                if state is not None:
+                    state[1] = not state[1]
+                    delta = self.deltas.get(post_id, 0) + (1 if state[1] else -1)
+                    self.deltas[post_id] = delta
+                    self.schedule()
+                    return state[1], max(like_count + delta, 0)
+                read_at = self.flushes
+            # First click on this pair since the last flush: read membership outside the lock
+            in_db = Like.objects.filter(post_id=post_id, user_id=user_id).exists()
+
+    def schedule(self):
+        if self.timer is None:
+            self.timer = threading.Timer(self.interval, self.flush_in_background)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        """Write every pending change in one transaction -> number of changed likes"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            changes = {key: now for key, (was, now) in pending.items() if was != now}
+            # Clicks during the write start from these states, and its deltas stay counted until it commits
+            self.flushing = changes
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+        if not changes:
+            return 0
+        try:
+            apply_likes(changes)
+        except Exception:
+            # Put the batch back under any newer clicks, and try again next interval
+            with self.lock:
+                self.flushing = {}
+                for key, (was, now) in pending.items():
+                    if key in self.pending:
+                        self.pending[key][0] = was
+                    else:
+                        self.pending[key] = [was, now]
+                self.flushes += 1
+                self.schedule()
+            raise
+        with self.lock:
+            self.flushing = {}
+            for (user_id, post_id), liked in changes.items():
+                delta = self.deltas.get(post_id, 0) - (1 if liked else -1)
+                if delta:
+                    self.deltas[post_id] = delta
+                else:
+                    self.deltas.pop(post_id, None)
+            self.flushes += 1
+        return len(changes)
+
+    def flush_in_background(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Like buffer flush failed")
+        finally:
+            connection.close()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_like_buffer():
+    """The process-wide LikeBuffer, created on first use"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = LikeBuffer(getattr(settings, "LIKE_BUFFER_INTERVAL", 1.0))
+            atexit.register(_buffer.flush)
+        return _buffer
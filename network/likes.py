@@ -0,0 +1,104 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from .conditional import likes_changed
+from .models import Post
+
+Like = Post.liker.through
+
+
+def actual_like_count():
+    """Subquery counting the liker rows of the outer post"""
+    count = (Like.objects.filter(post_id=OuterRef("pk")).order_by()
+             .values("post_id").annotate(n=Count("*")).values("n"))
+    return Coalesce(Subquery(count, output_field=IntegerField()), 0)
+
+
+def toggle_like(post_id, user_id):
+    """
+    Like or unlike a post for a user -> (liked, like_count).
+
+    Membership is one lookup on the (post, user) unique index and the counter
+    moves with an F() increment, so the cost does not grow with the post's likes.
+    """
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(post_id=post_id, user_id=user_id).delete()
+        if deleted:
+            liked, delta = False, -deleted
+        else:
+            try:
+                with transaction.atomic():
+                    Like.objects.create(post_id=post_id, user_id=user_id)
+                liked, delta = True, 1
+            except IntegrityError:
+                # A concurrent request liked it first
+                liked, delta = True, 0
+        if delta:
+            Post.objects.filter(id=post_id).update(like_count=F("like_count") + delta)
+        like_count = Post.objects.filter(id=post_id).values_list("like_count", flat=True).first()
+        transaction.on_commit(likes_changed)
+    return liked, like_count
+
+
+def toggle_likes(post_ids, user_id):
+    """
+    toggle_like for many posts at once -> {post_id: (liked, like_count)}.
+
+    One membership read, then one delete or savepoint insert per post on the
+    (post, user) unique index, one CASE update moving the counters by the rows
+    actually changed and one read back; nothing grows with a post's likes.
+    """
+    post_ids = set(post_ids)
+    with transaction.atomic():
+        unliked = set(Like.objects.filter(user_id=user_id, post_id__in=post_ids).values_list("post_id", flat=True))
+        deltas = {}
+        for post_id in post_ids:
+            if post_id in unliked:
+                deltas[post_id] = -Like.objects.filter(post_id=post_id, user_id=user_id).delete()[0]
+                continue
+            try:
+                with transaction.atomic():
+                    Like.objects.create(post_id=post_id, user_id=user_id)
+                deltas[post_id] = 1
+            except IntegrityError:
+                # A concurrent request liked it first
+                deltas[post_id] = 0
+        changed = {post_id: delta for post_id, delta in deltas.items() if delta}
+        if changed:
+            Post.objects.filter(id__in=changed).update(like_count=F("like_count") + Case(
+                *[When(id=post_id, then=Value(delta)) for post_id, delta in changed.items()],
+                default=Value(0), output_field=IntegerField()))
+        counts = dict(Post.objects.filter(id__in=post_ids).values_list("id", "like_count"))
+        transaction.on_commit(likes_changed)
+    return {post_id: (post_id not in unliked, counts[post_id]) for post_id in post_ids if post_id in counts}
+
+
+def apply_likes(states):
+    """
+    Write final like states {(user_id, post_id): liked} in one transaction.
+
+    Inserts ignore existing rows and deletes of missing rows are no-ops, and
+    the counters are recounted rather than incremented, so it is idempotent.
+    """
+    unliked = {}
+    for (user_id, post_id), liked in states.items():
+        if not liked:
+            unliked.setdefault(post_id, []).append(user_id)
+
+    with transaction.atomic():
+        Like.objects.bulk_create(
+            [Like(user_id=user_id, post_id=post_id) for (user_id, post_id), liked in states.items() if liked],
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+        for post_id, user_ids in unliked.items():
+            Like.objects.filter(post_id=post_id, user_id__in=user_ids).delete()
+        recount_likes({post_id for _, post_id in states})
+
+
+def recount_likes(post_ids):
+    """Reset like_count from the liker table for the given posts"""
+    updated = Post.objects.filter(id__in=post_ids).update(like_count=actual_like_count())
+    transaction.on_commit(likes_changed)
+    return updated
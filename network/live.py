@@ -0,0 +1,233 @@
+"""
+Live like counts and "N new posts" notices over Server-Sent Events.
+
+LiveHub is an in-process pub/sub broker, a stand-in for something like
+Redis pub/sub: publishers and subscribers must share the process, so only
+changes made by the ASGI process itself are pushed.
+
+Publishers, which can be on any thread, only note the latest like count per
+post and the new posts. Once per tick the pending changes become one
+immutable Tick, and a single Event.set() wakes every subscriber. Each
+subscriber then takes what concerns its page: the cost of a tick is one
+fan-out, not one message per subscriber per change.
+"""
+import asyncio
+import json
+import threading
+from collections import Counter, deque, namedtuple
+from contextlib import asynccontextmanager
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+
+from .db import request_thread
+from .models import User, UserFollowing
+
+KEEPALIVE = 15 # seconds between comments that keep proxies from closing an idle stream
+
+# likes {post_id: like_count}, posts [(post_id, author_id)], authors {author_id: new posts}
+Tick = namedtuple("Tick", "seq likes posts authors")
+
+
+class LiveHub:
+    """Coalesces published changes and hands them to subscribers once per interval"""
+
+    def __init__(self, interval, history=20):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.likes = {}
+        self.posts = []
+        self.ticks = deque(maxlen=history) # lets a subscriber that was busy catch up
+        self.seq = 0
+        self.subscribers = 0
+        self.event = None
+        self.task = None
+
+    def publish_like(self, post_id, like_count):
+        if not self.subscribers:
+            return
+        with self.lock:
+            self.likes[post_id] = like_count # only the latest count per tick matters
+
+    def publish_post(self, post_id, author_id):
+        if not self.subscribers:
+            return
+        with self.lock:
+            self.posts.append((post_id, author_id))
+
+    def tick(self):
+        """Turn what was published since the last tick into a Tick -> it, or None if nothing was"""
+        with self.lock:
+            likes, self.likes = self.likes, {}
+            posts, self.posts = self.posts, []
+        if not likes and not posts:
+            return None
+        self.seq += 1
+        tick = Tick(self.seq, likes, posts, Counter(author for _, author in posts))
+        self.ticks.append(tick)
+        return tick
+
+    def notify(self):
+        """Build the next tick and wake every subscriber at once"""
+        if self.tick() and self.event is not None:
+            self.event.set()
+            self.event = asyncio.Event()
+
+    async def run(self):
+        while self.subscribers:
+            await asyncio.sleep(self.interval)
+            self.notify()
+
+    @asynccontextmanager
+    async def subscription(self):
+        """Count a subscriber in, starting the ticker on this event loop if needed"""
+        loop = asyncio.get_running_loop()
+        self.subscribers += 1
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.event = asyncio.Event()
+            self.task = loop.create_task(self.run())
+        try:
+            yield self
+        finally:
+            self.subscribers -= 1
+
+    def since(self, seq):
+        return [tick for tick in self.ticks if tick.seq > seq]
+
+    async def wait(self, seq, timeout):
+        """Ticks after seq, waiting up to timeout seconds for one"""
+        ticks = self.since(seq)
+        if ticks:
+            return ticks
+        event = self.event
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        return self.since(seq)
+
+
+hub = LiveHub(getattr(settings, "LIVE_TICK", 1.0))
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class Subscriber:
+    """What one open page wants: counts of the posts it shows, new posts of its feed"""
+
+    def __init__(self, viewer_id, authors, post_ids):
+        self.viewer_id = viewer_id
+        self.authors = authors # None for the global feed
+        self.post_ids = post_ids
+
+    def events(self, ticks):
+        likes = {}
+        new = 0
+        for tick in ticks:
+            # A page shows a handful of posts, so look those up rather than scan the tick
+            likes.update((post_id, tick.likes[post_id]) for post_id in self.post_ids if post_id in tick.likes)
+            if self.authors is None:
+                new += len(tick.posts) - tick.authors.get(self.viewer_id, 0)
+            else:
+                # Per-author counts are made once per tick; walk whichever side is smaller
+                small, large = sorted((self.authors, tick.authors.keys()), key=len)
+                new += sum(tick.authors[author] for author in small if author in large and author != self.viewer_id)
+        events = []
+        if likes:
+            events.append(sse("likes", likes))
+        if new:
+            events.append(sse("posts", {"new": new}))
+        return "".join(events)
+
+
+def load_subscriber(session_key, feed, post_ids):
+    """Subscriber for ?feed=all|following|user:<username> -> it, or None if not allowed"""
+    viewer_id = None
+    if session_key:
+        session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+        viewer_id = get_user(SimpleNamespace(session=session)).pk
+
+    if feed == "following":
+        if viewer_id is None:
+            return None
+        authors = set(UserFollowing.objects.filter(user_id=viewer_id).values_list("following_user_id", flat=True))
+    elif feed.startswith("user:"):
+        authors = set(User.objects.filter(username=feed[5:]).values_list("id", flat=True))
+    else:
+        authors = None
+    return Subscriber(viewer_id, authors, post_ids)
+
+
+@request_thread
+async def subscribe(scope):
+    query = parse_qs(scope["query_string"].decode())
+    try:
+        post_ids = {int(pk) for pk in query.get("posts", [""])[0].split(",") if pk}
+    except ValueError:
+        post_ids = set()
+    cookies = SimpleCookie()
+    for name, value in scope["headers"]:
+        if name == b"cookie":
+            cookies.load(value.decode("latin-1"))
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    return await sync_to_async(load_subscriber)(morsel.value if morsel else None,
+                                                query.get("feed", ["all"])[0], post_ids)
+
+
+async def stream(scope, receive, send):
+    subscriber = await subscribe(scope)
+    if subscriber is None:
+        await send({"type": "http.response.start", "status": 403, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": b"Log in to follow this feed."})
+        return
+
+    async def disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    await send({"type": "http.response.start", "status": 200, "headers": [
+        (b"content-type", b"text/event-stream"),
+        (b"cache-control", b"no-cache"),
+        (b"x-accel-buffering", b"no"), # nginx: don't buffer the stream
+    ]})
+    await send({"type": "http.response.body", "body": b"retry: 5000\n\n", "more_body": True})
+
+    gone = asyncio.ensure_future(disconnect())
+    try:
+        async with hub.subscription():
+            seq = hub.seq
+            while True:
+                waiting = asyncio.ensure_future(hub.wait(seq, KEEPALIVE))
+                await asyncio.wait({waiting, gone}, return_when=asyncio.FIRST_COMPLETED)
+                if gone.done():
+                    waiting.cancel()
+                    return
+                ticks = waiting.result()
+                if ticks:
+                    seq = ticks[-1].seq
+                body = subscriber.events(ticks) if ticks else ": keepalive\n\n"
+                if body:
+                    await send({"type": "http.response.body", "body": body.encode(), "more_body": True})
+    finally:
+        gone.cancel()
+
+
+def live_app(application, path="/live"):
+    """
+    Wrap the ASGI application so that path is served as an event stream.
+
+    Django 3.2 can only stream from sync iterators, which would block the
+    event loop for the lifetime of each stream.
+    """
+    async def app(scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == path:
+            return await stream(scope, receive, send)
+        return await application(scope, receive, send)
+    return app
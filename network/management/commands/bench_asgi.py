@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.backends.signals import connection_created
+from django.test import Client
+
+from network.models import User
+
+from .loadtest import percentile
+
+
+class Command(BaseCommand):
+    help = ("Compare the WSGI deployment (sync views on a fixed pool of worker threads) with the ASGI one "
+            "(coroutine views) under the same closed-loop load, driving the real handlers in-process")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", default="16,64,256",
+                            help="Comma-separated numbers of simultaneous clients to try")
+        parser.add_argument("--requests", type=int, default=1000, help="Requests per concurrency level")
+        parser.add_argument("--threads", type=int, default=8,
+                            help="WSGI worker threads, like gunicorn --threads")
+        parser.add_argument("--paths", default="/,/following", help="Comma-separated paths the clients cycle through")
+        parser.add_argument("--db-latency", type=float, default=0.0,
+                            help="Milliseconds added to every query, to model a database across the network")
+        parser.add_argument("--user", help="Username to browse as (default: one that follows somebody)")
+        parser.add_argument("--mode", choices=("wsgi", "asgi"), help="Run one side only and print its JSON")
+        parser.add_argument("--session", help="Session cookie to send (set by the parent run)")
+
+    def handle(self, *args, **options):
+        levels = [int(c) for c in options["concurrency"].split(",")]
+        paths = options["paths"].split(",")
+
+        if options["mode"]:
+            if options["db_latency"]:
+                delay = options["db_latency"] / 1000
+                connection_created.connect(lambda connection, **kwargs: connection.execute_wrappers.append(
+                    lambda execute, *args: time.sleep(delay) or execute(*args)), weak=False)
+            cookie = f"{settings.SESSION_COOKIE_NAME}={options['session']}"
+            if options["mode"] == "wsgi":
+                report = [self.run_wsgi(level, options["requests"], paths, cookie, options["threads"])
+                          for level in levels]
+            else:
+                report = [self.run_asgi(level, options["requests"], paths, cookie) for level in levels]
+            self.stdout.write(json.dumps(report))
+            return
+
+        user = (User.objects.filter(username=options["user"]) if options["user"]
+                else User.objects.filter(following__isnull=False)).first()
+        if user is None:
+            raise CommandError("No user to browse as: run seed_network first")
+        client = Client()
+        client.force_login(user)
+        session = client.cookies[settings.SESSION_COOKIE_NAME].value
+
+        results = {}
+        for mode in ("wsgi", "asgi"):
+            argv = [sys.executable, sys.argv[0], "bench_asgi", "--mode", mode, "--session", session,
+                    "--concurrency", options["concurrency"], "--requests", str(options["requests"]),
+                    "--threads", str(options["threads"]), "--paths", options["paths"],
+                    "--db-latency", str(options["db_latency"])]
+            env = dict(os.environ, DJANGO_ASYNC_VIEWS="1" if mode == "asgi" else "0")
+            done = subprocess.run(argv, env=env, capture_output=True, text=True)
+            if done.returncode:
+                raise CommandError(f"{mode} run failed:\n{done.stderr}")
+            results[mode] = json.loads(done.stdout.strip().splitlines()[-1])
+
+        self.stdout.write(f"{'':6} {'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+                          f"{'errors':>6} {'threads':>7}")
+        for i, level in enumerate(levels):
+            for mode in ("wsgi", "asgi"):
+                row = results[mode][i]
+                self.stdout.write(f"{mode:6} {level:>7} {row['requests_per_second']:>8} {row['p50_ms']:>8} "
+                                  f"{row['p95_ms']:>8} {row['p99_ms']:>8} {row['errors']:>6} {row['peak_threads']:>7}")
+
+    def sample_threads(self, stop, peak):
+        """Record the most threads alive at once until stop is set"""
+        while not stop.wait(0.005):
+            peak[0] = max(peak[0], threading.active_count())
+
+    def report(self, level, samples, errors, elapsed, peak_threads):
+        return {
+            "clients": level,
+            "requests_per_second": round(len(samples) / elapsed, 1),
+            "p50_ms": round(percentile(samples, 50) or 0, 1),
+            "p95_ms": round(percentile(samples, 95) or 0, 1),
+            "p99_ms": round(percentile(samples, 99) or 0, 1),
+            "errors": errors,
+            "peak_threads": peak_threads,
+        }
+
+    def run_wsgi(self, level, total, paths, cookie, threads):
+        """level client threads queue requests for a pool of `threads` workers, like a threaded WSGI server"""
+        from django.core.wsgi import get_wsgi_application
+        app = get_wsgi_application()
+
+        def call(path):
+            environ = {"PATH_INFO": path, "REQUEST_METHOD": "GET", "HTTP_HOST": "localhost", "HTTP_COOKIE": cookie}
+            setup_testing_defaults(environ)
+            status = []
+            body = app(environ, lambda s, headers, exc_info=None: status.append(s))
+            try:
+                for _ in body:
+                    pass
+            finally:
+                body.close()
+            return int(status[0].split()[0])
+
+        samples, errors, peak = [], [0], [0]
+        lock = threading.Lock()
+        remaining = [total]
+
+        with ThreadPoolExecutor(max_workers=threads) as workers:
+            def client(n):
+                while True:
+                    with lock:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                        path = paths[remaining[0] % len(paths)]
+                    start = time.perf_counter()
+                    status = workers.submit(call, path).result()
+                    elapsed = (time.perf_counter() - start) * 1000
+                    with lock:
+                        samples.append(elapsed)
+                        errors[0] += status >= 400
+
+            clients = [threading.Thread(target=client, args=(n,)) for n in range(level)]
+            stop = threading.Event()
+            threading.Thread(target=self.sample_threads, args=(stop, peak), daemon=True).start()
+            start = time.perf_counter()
+            for t in clients:
+                t.start()
+            for t in clients:
+                t.join()
+            elapsed = time.perf_counter() - start
+            stop.set()
+        # Client threads and the sampler belong to the harness, not the server
+        return self.report(level, samples, errors[0], elapsed, peak[0] - level - 2)
+
+    def run_asgi(self, level, total, paths, cookie):
+        """level client coroutines on one event loop, like connections to an ASGI server"""
+        from django.core.asgi import get_asgi_application
+        app = get_asgi_application()
+
+        async def call(path):
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+                "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+                "query_string": b"", "root_path": "", "client": ("127.0.0.1", 0), "server": ("localhost", 80),
+                "headers": [(b"host", b"localhost"), (b"cookie", cookie.encode())],
+            }
+            sent = asyncio.Event()
+            status = []
+
+            async def receive():
+                if not sent.is_set():
+                    sent.set()
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                await asyncio.Future() # the client never disconnects early
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    status.append(message["status"])
+
+            await app(scope, receive, send)
+            return status[0]
+
+        samples, errors, peak = [], [0], [0]
+        remaining = [total]
+
+        async def client():
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                path = paths[remaining[0] % len(paths)]
+                start = time.perf_counter()
+                status = await call(path)
+                samples.append((time.perf_counter() - start) * 1000)
+                errors[0] += status >= 400
+
+        async def main():
+            await asyncio.gather(*(client() for _ in range(level)))
+
+        stop = threading.Event()
+        threading.Thread(target=self.sample_threads, args=(stop, peak), daemon=True).start()
+        start = time.perf_counter()
+        asyncio.run(main())
+        elapsed = time.perf_counter() - start
+        stop.set()
+        return self.report(level, samples, errors[0], elapsed, peak[0] - 2)
@@ -0,0 +1,64 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from network.graph import FollowGraph
+from network.models import UserFollowing
+
+from .loadtest import percentile
+
+
+class Command(BaseCommand):
+    help = ("Load the follow graph (seed_network --follows builds a million-edge one) and time its queries "
+            "for random and for the most followed users, against the same suggestions in SQL")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--queries", type=int, default=200, help="Users queried per kind")
+        parser.add_argument("--baseline", type=int, default=5, help="SQL suggestion queries to compare with")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        start = time.perf_counter()
+        graph = FollowGraph.load()
+        elapsed = time.perf_counter() - start
+        memory = sum(len(a) * a.itemsize for side in (graph.follows, graph.followed) for a in (side.offsets, side.targets))
+        edges = len(graph.follows.targets)
+        if not edges:
+            raise CommandError("No follows to load: run seed_network first")
+        self.stdout.write(f"{edges:,} edges loaded in {elapsed:.1f}s, {memory / 2 ** 20:.1f} MiB of arrays")
+
+        users = list(UserFollowing.objects.values_list("user_id", flat=True).distinct())
+        groups = {
+            "random": [random.choice(users) for _ in range(options["queries"])],
+            "popular": graph.popular[:options["queries"]],
+        }
+        queries = {
+            "mutuals": graph.mutuals,
+            "followers_of_followers": graph.followers_of_followers,
+            "suggestions": graph.suggestions,
+        }
+        self.stdout.write(f"{'query':24} {'users':8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for name, query in queries.items():
+            for group, ids in groups.items():
+                samples = []
+                for user_id in ids:
+                    start = time.perf_counter()
+                    query(user_id)
+                    samples.append((time.perf_counter() - start) * 1000)
+                self.stdout.write(f"{name:24} {group:8} {percentile(samples, 50):>8.2f} "
+                                  f"{percentile(samples, 95):>8.2f} {percentile(samples, 99):>8.2f}")
+
+        samples = []
+        for user_id in random.sample(users, min(options["baseline"], len(users))):
+            start = time.perf_counter()
+            following = UserFollowing.objects.filter(user_id=user_id).values("following_user_id")
+            list(UserFollowing.objects.filter(user_id__in=following)
+                 .exclude(following_user_id__in=following).exclude(following_user_id=user_id)
+                 .values("following_user_id").annotate(n=Count("*")).order_by("-n")[:10])
+            samples.append((time.perf_counter() - start) * 1000)
+        if samples:
+            self.stdout.write(f"{'suggestions in SQL':24} {'random':8} {percentile(samples, 50):>8.2f} "
+                              f"{percentile(samples, 95):>8.2f} {percentile(samples, 99):>8.2f}")
@@ -0,0 +1,70 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.utils import timezone
+
+from network.models import Post, User
+from network.pagination import CursorPaginator, encode_cursor
+
+
+class Command(BaseCommand):
+    help = "Compare OFFSET and keyset page latency on the Post table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Insert this many posts before measuring")
+        parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+        parser.add_argument("--per-page", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            self.seed(options["seed"])
+
+        per_page = options["per_page"]
+        posts = Post.objects.all().order_by("-created_on")
+        self.stdout.write(f"{'page':>8} {'offset ms':>12} {'cursor ms':>12}")
+
+        for number in options["pages"]:
+            # Locate the row just above the page once, outside the timed section,
+            # the same way a client would hold it from the previous response
+            anchor = (Post.objects.order_by("-created_on", "-id")
+                      .values_list("created_on", "id")[(number - 1) * per_page - 1:(number - 1) * per_page]
+                      if number > 1 else [])
+            cursor = encode_cursor(*anchor[0]) if anchor else None
+
+            offset_ms = self.timed(lambda: list(Paginator(posts, per_page).get_page(number)), options["repeat"])
+            cursor_ms = self.timed(lambda: list(CursorPaginator(posts, per_page).get_page(cursor)), options["repeat"])
+            self.stdout.write(f"{number:>8} {offset_ms:>12.2f} {cursor_ms:>12.2f}")
+
+    def timed(self, fn, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def seed(self, count):
+        author, _ = User.objects.get_or_create(username="bench")
+        start = timezone.now() - datetime.timedelta(seconds=count)
+        table = Post._meta.db_table
+        batch = 10000
+
+        # Raw executemany so every row gets its own created_on (auto_now_add would flatten them)
+        with transaction.atomic(), connection.cursor() as cursor:
+            for offset in range(0, count, batch):
+                rows = [
+                    ("bench post", author.id,
+                     connection.ops.adapt_datetimefield_value(start + datetime.timedelta(seconds=i)))
+                    for i in range(offset, min(offset + batch, count))
+                ]
+                cursor.executemany(
+                    f"INSERT INTO {table} (content, created_by_id, created_on) VALUES (%s, %s, %s)",
+                    rows,
+                )
+        self.stdout.write(f"Seeded {count} posts")
@@ -0,0 +1,89 @@
+import random
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from network import search
+from network.models import Post
+
+from .loadtest import percentile
+
+
+class Command(BaseCommand):
+    help = ("Time ranked full-text search over the posts already in the database (seed_network builds a "
+            "million-post corpus) for common, rare, two-word and prefix queries, against an icontains scan")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--queries", type=int, default=200, help="Searches per query kind")
+        parser.add_argument("--page", type=int, default=1, help="Result page to fetch")
+        parser.add_argument("--sample", type=int, default=2000, help="Posts sampled to pick query words from")
+        parser.add_argument("--baseline", type=int, default=3,
+                            help="icontains scans per query kind to compare with (0 to skip)")
+        parser.add_argument("--rebuild", action="store_true", help="Rebuild the index first and time it")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        total = Post.objects.count()
+        if not total:
+            raise CommandError("No posts to search: run seed_network first")
+        backend = "fts5" if search.uses_fts() else "terms"
+        self.stdout.write(f"{total:,} posts, {backend} index")
+
+        if options["rebuild"]:
+            start = time.perf_counter()
+            search.rebuild()
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"rebuild: {elapsed:.1f}s ({total / elapsed:,.0f} posts/s)")
+
+        kinds = self.query_kinds(options["sample"])
+        self.stdout.write(f"{'query':10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'hits/page':>9} "
+                          f"{'icontains ms':>13}")
+        for kind, queries in kinds.items():
+            samples, hits = [], []
+            for _ in range(options["queries"]):
+                query = random.choice(queries)
+                start = time.perf_counter()
+                page = search.find(query, options["page"])
+                samples.append((time.perf_counter() - start) * 1000)
+                hits.append(len(page))
+
+            scans = []
+            for query in random.sample(queries, min(options["baseline"], len(queries))):
+                # What searching looked like without an index: newest 10 rows containing the text
+                start = time.perf_counter()
+                list(Post.objects.filter(content__icontains=query.rstrip("*"))
+                     .order_by("-created_on").values_list("id", flat=True)[:10])
+                scans.append((time.perf_counter() - start) * 1000)
+
+            baseline = f"{sum(scans) / len(scans):>13.1f}" if scans else f"{'-':>13}"
+            self.stdout.write(f"{kind:10} {percentile(samples, 50):>8.2f} {percentile(samples, 95):>8.2f} "
+                              f"{percentile(samples, 99):>8.2f} {sum(hits) / len(hits):>9.1f} {baseline}")
+
+    def query_kinds(self, sample):
+        """Query words by how often they occur in a sample of posts"""
+        last = Post.objects.order_by("-id").values_list("id", flat=True).first()
+        ids = random.sample(range(1, last + 1), min(sample, last))
+        contents = list(Post.objects.filter(id__in=ids).values_list("content", flat=True))
+        counts = Counter(word for content in contents for word in set(search.terms(content)))
+        ranked = [word for word, _ in counts.most_common()]
+        if len(ranked) < 20:
+            raise CommandError("Too few distinct words in the posts to build queries")
+
+        common = ranked[:10]
+        middle = ranked[len(ranked) // 10:len(ranked) // 5] or ranked[10:20]
+        rare = [word for word, n in counts.items() if n == 1] or ranked[-10:]
+        pairs = []
+        for content in contents:
+            words = list(set(search.terms(content)))
+            if len(words) >= 2:
+                pairs.append(" ".join(random.sample(words, 2)))
+        prefixes = [word[:search.MIN_PREFIX + 1] for word in middle if len(word) > search.MIN_PREFIX + 1]
+        return {
+            "common": common,
+            "middle": middle,
+            "rare": rare,
+            "two-word": pairs,
+            "prefix": prefixes or middle,
+        }
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from network.images import get_executor, make_thumbnails
+from network.models import Profile
+from network.profiles import DEFAULT_IMAGE, forget_avatars
+
+
+class Command(BaseCommand):
+    help = "Build missing avatar thumbnails for existing profiles on the image worker pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Rebuild even profiles already marked ready")
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.all() if options["all"] else Profile.objects.filter(thumbnails_ready=False)
+        # Many profiles share one file (default.jpg), so work per distinct image
+        names = list(profiles.order_by().values_list("image", flat=True).distinct())
+
+        done = failed = 0
+        for name, future in [(name, get_executor().submit(make_thumbnails, name, options["all"])) for name in names]:
+            try:
+                future.result()
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"{name}: {e}")
+                continue
+            marked = Profile.objects.filter(image=name)
+            if name != DEFAULT_IMAGE: # everybody's default picture is not looked up per user
+                forget_avatars(marked.values_list("user_id", flat=True))
+            done += marked.update(thumbnails_ready=True)
+
+        self.stdout.write(f"Thumbnails built for {len(names) - failed} images ({done} profiles), {failed} failed")
@@ -0,0 +1,84 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from network.feeds import feed_posts
+from network.likes import Like
+from network.models import Post, TimelineEntry, User, UserFollowing
+from network.pagination import CursorPaginator
+from network.timeline import TimelinePaginator
+
+# Plan lines that mean "read the whole table" or "sort outside an index"
+BAD_PLAN = {
+    "sqlite": [
+        (re.compile(r"\bSCAN (TABLE )?\w+(?! USING)( AS \w+)?\s*$", re.M), "full scan"),
+        (re.compile(r"USE TEMP B-TREE"), "temp b-tree sort"),
+    ],
+    "postgresql": [
+        (re.compile(r"Seq Scan"), "full scan"),
+        (re.compile(r"^\s*(->\s*)?Sort\b", re.M), "sort"),
+    ],
+    "mysql": [
+        (re.compile(r"\bALL\b"), "full scan"),
+        (re.compile(r"Using (temporary|filesort)"), "temp table / filesort"),
+    ],
+}
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the main queries behind each feed, follow and like path; fail on full scans or sorts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--analyze", action="store_true", help="Refresh planner statistics first")
+
+    def handle(self, *args, **options):
+        if options["analyze"]:
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+        failures = []
+        for name, queryset in self.queries():
+            plan = queryset.explain()
+            problems = [label for pattern, label in BAD_PLAN.get(connection.vendor, [])
+                        if pattern.search(plan)]
+            status = "FAIL " + ", ".join(problems) if problems else "ok"
+            self.stdout.write(f"{name}: {status}")
+            if options["verbosity"] > 1 or problems:
+                self.stdout.write("    " + plan.replace("\n", "\n    "))
+            if problems:
+                failures.append(name)
+
+        if failures:
+            raise CommandError(f"{len(failures)} access path(s) not served by an index: {', '.join(failures)}")
+
+    def queries(self):
+        """(name, queryset) for every hot query, bound to sample rows from the current data"""
+        user = (User.objects.filter(following__isnull=False).first()
+                or User.objects.first())
+        post = (Post.objects.order_by("-created_on", "-id")[100:101].first()
+                or Post.objects.first())
+        if user is None or post is None:
+            raise CommandError("Seed some users, posts and follows first")
+        author = post.created_by
+        bare = Post.objects.only("id", "created_on")
+
+        index = CursorPaginator(bare, 10)
+        profile = CursorPaginator(bare.filter(created_by=author), 10)
+        timeline = TimelinePaginator(user, 10)
+        page = [p.id for p in index.rows("n", post.created_on, post.id, 10)] or [post.id]
+
+        return [
+            ("index first page", index.seek("n", None, None)[:11]),
+            ("index next page", index.seek("n", post.created_on, post.id)[:11]),
+            ("index previous page", index.seek("p", post.created_on, post.id)[:11]),
+            ("profile next page", profile.seek("n", post.created_on, post.id)[:11]),
+            ("following next page", timeline.seek("n", post.created_on, post.id)[:11]),
+            ("feed hydration", feed_posts(user).filter(id__in=page)),
+            ("like membership", Like.objects.filter(post_id=post.id, user_id=user.id)),
+            ("follow lookup", UserFollowing.objects.filter(user_id=user, following_user_id=author)),
+            ("fan-out followers", UserFollowing.objects.filter(following_user_id=author).values_list("user_id")),
+            ("follow backfill", Post.objects.filter(created_by=author).order_by("-created_on", "-id")
+                                .values_list("id", "created_on")[:500]),
+            ("unfollow prune", TimelineEntry.objects.filter(owner=user, post__created_by=author).values_list("id")),
+        ]
@@ -0,0 +1,64 @@
+import os
+import time
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from network.images import thumbnail_name, thumbnail_sizes
+from network.models import Profile
+from network.profiles import forget_avatars
+from network.storage import avatar_storage, is_content_addressed
+
+UPLOAD_DIR = Profile._meta.get_field("image").upload_to
+
+
+class Command(BaseCommand):
+    help = "Delete profile pictures and thumbnails no profile references; optionally move legacy files to content-addressed names first"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rehash", action="store_true",
+                            help="Re-store legacy uploads under their content hash so duplicates collapse")
+        parser.add_argument("--grace", type=int, default=3600,
+                            help="Keep unreferenced files younger than this many seconds (in-flight uploads)")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["rehash"]:
+            self.rehash(options["dry_run"])
+
+        referenced = set(Profile.objects.order_by().values_list("image", flat=True).distinct())
+        keep = set(referenced)
+        for name in referenced:
+            keep.update(thumbnail_name(name, size) for size in thumbnail_sizes())
+
+        root = avatar_storage.path(UPLOAD_DIR)
+        cutoff = time.time() - options["grace"]
+        deleted = freed = 0
+        for folder, _, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(folder, filename)
+                name = os.path.relpath(path, avatar_storage.location).replace(os.sep, "/")
+                if name in keep or os.path.getmtime(path) > cutoff:
+                    continue
+                size = os.path.getsize(path)
+                if not options["dry_run"]:
+                    avatar_storage.delete(name)
+                deleted += 1
+                freed += size
+
+        action = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(f"{action} {deleted} orphaned files ({freed / 1024:.0f} KB)")
+
+    def rehash(self, dry_run):
+        moved = 0
+        for name in Profile.objects.order_by().values_list("image", flat=True).distinct():
+            if not name.startswith(UPLOAD_DIR + "/") or is_content_addressed(name) or not avatar_storage.exists(name):
+                continue
+            if dry_run:
+                moved += 1
+                continue
+            with avatar_storage.open(name, "rb") as f:
+                hashed = avatar_storage.save(name, File(f))
+            moved += Profile.objects.filter(image=name).update(image=hashed, thumbnails_ready=False)
+            forget_avatars(Profile.objects.filter(image=hashed).values_list("user_id", flat=True))
+        self.stdout.write(f"Moved {moved} profiles to content-addressed images (run build_thumbnails next)")
@@ -0,0 +1,38 @@
+import csv
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from network.accounts import BATCH_SIZE, import_users
+
+
+class Command(BaseCommand):
+    help = ("Create users in bulk from a CSV (username,email,password or password_hash "
+            "columns) or JSON lines file, hashing raw passwords in a process pool")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="A .csv or .jsonl file, or - for CSV on stdin")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--processes", type=int, help="Hashing processes (default: one per CPU, 0: none)")
+        parser.add_argument("--every", type=int, default=100000, help="Print progress every this many rows")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        try:
+            f = sys.stdin if path == "-" else open(path, newline="")
+        except OSError as e:
+            raise CommandError(e)
+        rows = (json.loads(line) for line in f if line.strip()) if path.endswith(".jsonl") else csv.DictReader(f)
+        reported = [0]
+
+        def progress(result):
+            if result.rows - reported[0] >= options["every"]:
+                reported[0] = result.rows
+                self.stdout.write(f"{result.rows:,} rows ({result.rows_per_second:,.0f} rows/s)")
+
+        with f:
+            result = import_users(rows, options["batch_size"], options["processes"], progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.rows:,} rows: {result.created:,} users created, {result.skipped:,} skipped "
+            f"in {result.seconds:.1f}s ({result.rows_per_second:,.0f} rows/s)"))
@@ -0,0 +1,147 @@
+import json
+import random
+import statistics
+import subprocess
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from network.models import Post, User
+
+DEFAULT_MIX = "index=4,following=3,profile=2,like=1"
+
+
+def percentile(samples, p):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = ("Drive /, /following, /profile/<user> and PUT /post in-process at a given concurrency "
+            "and report p50/p95/p99 latency and queries per request as JSON")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=2000, help="Total requests across all workers")
+        parser.add_argument("--mix", default=DEFAULT_MIX, help="Relative weight of each endpoint")
+        parser.add_argument("--users", type=int, default=100, help="Distinct logged-in users to act as")
+        parser.add_argument("--output", default="loadtest.json")
+        parser.add_argument("--compare", help="Earlier report to print the difference against")
+
+    def handle(self, *args, **options):
+        mix = {}
+        for part in options["mix"].split(","):
+            name, _, weight = part.partition("=")
+            if name not in ("index", "following", "profile", "like"):
+                raise CommandError(f"Unknown endpoint in --mix: {name}")
+            mix[name] = float(weight or 1)
+
+        actors = list(User.objects.filter(following__isnull=False).distinct()
+                      .order_by("?").values_list("username", flat=True)[:options["users"]])
+        # Profile visits go mostly to popular accounts, like real traffic
+        profiles = list(User.objects.order_by("-profile__follower_count")
+                        .values_list("username", flat=True)[:100])
+        posts = list(Post.objects.order_by("-created_on").values_list("id", flat=True)[:500])
+        if not actors or not posts:
+            raise CommandError("Nothing to load test: run seed_network first")
+
+        samples = {name: [] for name in mix}
+        queries = {name: [] for name in mix}
+        errors = {name: 0 for name in mix}
+        lock = threading.Lock()
+        remaining = [options["requests"]]
+
+        def request(client, name):
+            if name == "index":
+                return client.get("/")
+            if name == "following":
+                return client.get("/following")
+            if name == "profile":
+                return client.get(f"/profile/{random.choice(profiles)}")
+            return client.put("/post", json.dumps({"post_id": random.choice(posts), "clicked": True}),
+                              content_type="application/json")
+
+        def worker(username):
+            client = Client(HTTP_HOST="localhost")
+            client.force_login(User.objects.get(username=username))
+            names, weights = list(mix), list(mix.values())
+            try:
+                while True:
+                    with lock:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                    name = random.choices(names, weights)[0]
+                    with CaptureQueriesContext(connection) as ctx:
+                        start = time.perf_counter()
+                        response = request(client, name)
+                        elapsed = (time.perf_counter() - start) * 1000
+                    with lock:
+                        samples[name].append(elapsed)
+                        queries[name].append(len(ctx))
+                        if response.status_code >= 400:
+                            errors[name] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(actors[i % len(actors)],))
+                   for i in range(options["concurrency"])]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        report = {
+            "commit": self.commit(),
+            "vendor": connection.vendor,
+            "concurrency": options["concurrency"],
+            "requests": sum(len(s) for s in samples.values()),
+            "seconds": round(elapsed, 2),
+            "requests_per_second": round(sum(len(s) for s in samples.values()) / elapsed, 1),
+            "endpoints": {
+                name: {
+                    "requests": len(samples[name]),
+                    "errors": errors[name],
+                    "p50_ms": round(percentile(samples[name], 50) or 0, 2),
+                    "p95_ms": round(percentile(samples[name], 95) or 0, 2),
+                    "p99_ms": round(percentile(samples[name], 99) or 0, 2),
+                    "queries_per_request": round(statistics.mean(queries[name]), 2) if queries[name] else 0,
+                }
+                for name in mix
+            },
+        }
+        with open(options["output"], "w") as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(json.dumps(report, indent=2))
+
+        if options["compare"]:
+            self.compare(options["compare"], report)
+
+    def compare(self, path, report):
+        with open(path) as f:
+            before = json.load(f)
+        self.stdout.write(f"\nvs {path} ({before.get('commit') or 'unknown commit'}):")
+        for name, now in report["endpoints"].items():
+            then = before.get("endpoints", {}).get(name)
+            if not then:
+                continue
+            cells = []
+            for key in ("p50_ms", "p95_ms", "p99_ms", "queries_per_request"):
+                change = (now[key] - then[key]) / then[key] * 100 if then[key] else 0
+                cells.append(f"{key} {then[key]} -> {now[key]} ({change:+.0f}%)")
+            self.stdout.write(f"  {name}: " + ", ".join(cells))
+
+    def commit(self):
+        try:
+            return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
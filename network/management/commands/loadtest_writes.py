@@ -0,0 +1,98 @@
+import json
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.test.utils import override_settings
+
+from network.likes import toggle_like
+from network.models import Post, User
+
+# SQLite's out-of-the-box behaviour, for comparison with settings.SQLITE_PRAGMAS
+UNTUNED_PRAGMAS = {
+    "journal_mode": "DELETE",
+    "synchronous": "FULL",
+    "mmap_size": 0,
+}
+
+
+class Command(BaseCommand):
+    help = "Hammer the database with concurrent like and post writers and report throughput and lock errors"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--likers", type=int, default=8)
+        parser.add_argument("--posters", type=int, default=4)
+        parser.add_argument("--seconds", type=float, default=10)
+        parser.add_argument("--untuned", action="store_true",
+                            help="Run with SQLite's default pragmas and lock timeout")
+        parser.add_argument("--output", help="Also write the report to this JSON file")
+
+    def handle(self, *args, **options):
+        if options["untuned"]:
+            # Connections opened from here on get the defaults instead of the tuned profile
+            settings_dict = connection.settings_dict
+            settings_dict["OPTIONS"] = {k: v for k, v in settings_dict["OPTIONS"].items() if k != "timeout"}
+            with override_settings(SQLITE_PRAGMAS=UNTUNED_PRAGMAS):
+                connection.close()
+                return self.load_test(options)
+        return self.load_test(options)
+
+    def load_test(self, options):
+        users = list(User.objects.values_list("id", flat=True)[:200])
+        if not users:
+            users = [User.objects.create_user(username="loadtest", password="loadtest").id]
+        posts = list(Post.objects.order_by("-id").values_list("id", flat=True)[:50])
+        if not posts:
+            posts = [Post.objects.create(created_by_id=users[0], content="load test").id]
+        # Journal mode is switched by the first connection; let that be this one
+        vendor = connection.vendor
+        connection.close()
+
+        counters = {"likes": 0, "posts": 0, "locked": 0, "other_errors": 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options["seconds"]
+
+        def worker(write):
+            try:
+                while time.monotonic() < deadline:
+                    try:
+                        kind = write()
+                    except OperationalError as e:
+                        kind = "locked" if "locked" in str(e) else "other_errors"
+                    with lock:
+                        counters[kind] += 1
+            finally:
+                connection.close()
+
+        def like():
+            toggle_like(random.choice(posts), random.choice(users))
+            return "likes"
+
+        def post():
+            Post.objects.create(created_by_id=random.choice(users), content="load test")
+            return "posts"
+
+        threads = ([threading.Thread(target=worker, args=(like,)) for _ in range(options["likers"])] +
+                   [threading.Thread(target=worker, args=(post,)) for _ in range(options["posters"])])
+        start = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - start
+
+        writes = counters["likes"] + counters["posts"]
+        report = {
+            "vendor": vendor,
+            "tuned": not options["untuned"],
+            "seconds": round(elapsed, 2),
+            **counters,
+            "writes_per_second": round(writes / elapsed, 1),
+            "locked_ratio": round(counters["locked"] / max(writes + counters["locked"], 1), 4),
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from network import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of every post (after bulk loads or a SEARCH_BACKEND change)"
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        total = search.rebuild()
+        elapsed = time.perf_counter() - start
+        backend = "fts5" if search.uses_fts() else "terms"
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {total} posts ({backend}) in {elapsed:.1f}s ({total / elapsed if elapsed else 0:,.0f} posts/s)"))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from network.likes import actual_like_count, recount_likes
+from network.models import Post
+
+
+class Command(BaseCommand):
+    help = "Repair Post.like_count wherever it drifted from the liker table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--dry-run", action="store_true", help="Only report drifted posts")
+
+    def handle(self, *args, **options):
+        batch = options["batch_size"]
+        checked = drifted = 0
+        last_id = 0
+
+        # Walk the table by primary key so each batch is a bounded range scan
+        while True:
+            ids = list(Post.objects.filter(id__gt=last_id).order_by("id")
+                       .values_list("id", flat=True)[:batch])
+            if not ids:
+                break
+            last_id = ids[-1]
+            checked += len(ids)
+
+            wrong = list(Post.objects.filter(id__in=ids)
+                         .annotate(actual=actual_like_count())
+                         .exclude(like_count=F("actual"))
+                         .values_list("id", flat=True))
+            drifted += len(wrong)
+            if wrong and not options["dry_run"]:
+                recount_likes(wrong)
+
+        action = "Found" if options["dry_run"] else "Repaired"
+        self.stdout.write(f"{action} {drifted} of {checked} posts with a drifted like_count")
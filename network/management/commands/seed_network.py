@@ -0,0 +1,190 @@
+import datetime
+import random
+import time
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from network import search, tags
+from network.likes import Like, actual_like_count
+from network.models import Post, Profile, TimelineEntry, User, UserFollowing
+
+
+class Command(BaseCommand):
+    help = "Seed a synthetic social graph (power-law followers) with posts and likes using bulk inserts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument("--follows", type=int, default=50, help="Average accounts followed per user")
+        parser.add_argument("--posts", type=int, default=1000000)
+        parser.add_argument("--likes", type=int, default=2000000)
+        parser.add_argument("--alpha", type=float, default=1.1,
+                            help="Zipf exponent of account popularity; higher is more skewed")
+        parser.add_argument("--days", type=int, default=365, help="Spread posts over this many days")
+        parser.add_argument("--words", type=int, default=20000, help="Vocabulary size of the post texts")
+        parser.add_argument("--tags", type=int, default=1000, help="Distinct #tags; about one post in three has one")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--password", default="password", help="Password of every seeded user")
+        parser.add_argument("--prefix", default="seed", help="Seeded usernames are <prefix><n>")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed, for repeatable datasets")
+
+    def handle(self, *args, **options):
+        self.batch = options["batch_size"]
+        random.seed(options["seed"])
+        started = time.perf_counter()
+
+        users = self.step("users", self.seed_users, options)
+        # Rank r gets weight 1 / r^alpha: a few accounts collect most follows and likes
+        popularity = list(accumulate(1 / (rank ** options["alpha"]) for rank in range(1, len(users) + 1)))
+        self.step("follows", self.seed_follows, users, popularity, options["follows"])
+        # Everybody posts at about the same rate; popularity shows in follows and likes
+        posts = self.step("posts", self.seed_posts, users, options["posts"], options["days"], options["words"],
+                          options["tags"])
+        self.step("likes", self.seed_likes, users, posts, options["likes"])
+        self.step("counters", self.rebuild_counters)
+        self.step("timelines", self.rebuild_timelines)
+        self.step("search", search.rebuild)
+        self.step("tags", tags.rebuild)
+
+        self.stdout.write(self.style.SUCCESS(f"Seeded in {time.perf_counter() - started:.1f}s"))
+
+    def step(self, name, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        rows = len(result) if isinstance(result, (list, range)) else result
+        rate = f" ({rows / elapsed:,.0f} rows/s)" if isinstance(rows, int) and elapsed else ""
+        self.stdout.write(f"{name}: {rows if rows is not None else 'done'} in {elapsed:.1f}s{rate}")
+        return result
+
+    def seed_users(self, options):
+        # One hash for everybody: hashing per user would dominate the whole seed
+        password = make_password(options["password"])
+        prefix = options["prefix"]
+        start = User.objects.filter(username__startswith=prefix).count()
+        last_id = User.objects.order_by("-id").values_list("id", flat=True).first() or 0
+        with transaction.atomic():
+            User.objects.bulk_create(
+                [User(username=f"{prefix}{n}", password=password) for n in range(start, start + options["users"])],
+                batch_size=self.batch)
+            ids = list(User.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True))
+            # bulk_create skips post_save, so the profiles the signal would make are made here
+            Profile.objects.bulk_create([Profile(user_id=pk) for pk in ids], batch_size=self.batch)
+        return ids
+
+    def seed_follows(self, users, popularity, average):
+        total = 0
+        rows = []
+        with transaction.atomic():
+            for follower in users:
+                count = min(int(random.expovariate(1 / average)) + 1, len(users) - 1)
+                targets = set(random.choices(users, cum_weights=popularity, k=count))
+                targets.discard(follower)
+                rows.extend(UserFollowing(user_id_id=follower, following_user_id_id=t) for t in targets)
+                if len(rows) >= self.batch:
+                    UserFollowing.objects.bulk_create(rows, ignore_conflicts=True)
+                    total += len(rows)
+                    rows = []
+            UserFollowing.objects.bulk_create(rows, ignore_conflicts=True)
+        return total + len(rows)
+
+    def vocabulary(self, size):
+        """Made-up words and their cumulative weights: the word of rank r is used 1 / r as often (Zipf's law)"""
+        syllables = [c + v for c in "bdfgklmnprstvz" for v in "aeiou"]
+        words = set()
+        while len(words) < size:
+            words.add("".join(random.choices(syllables, k=random.randint(1, 4))))
+        words = sorted(words)
+        random.shuffle(words)
+        return words, list(accumulate(1 / rank for rank in range(1, size + 1)))
+
+    def text(self, words, weights, hashtags, tag_weights, usernames):
+        """Zipf-distributed words, sometimes a #tag (also Zipf) or an @mention"""
+        text = random.choices(words, cum_weights=weights, k=random.randint(5, 30))
+        if hashtags and random.random() < 0.3:
+            text.append("#" + random.choices(hashtags, cum_weights=tag_weights)[0])
+        if usernames and random.random() < 0.1:
+            text.insert(0, "@" + random.choice(usernames))
+        return " ".join(text)
+
+    def seed_posts(self, users, count, days, vocabulary, tag_count):
+        # Raw inserts so each row keeps its own created_on (auto_now_add would flatten them)
+        table = Post._meta.db_table
+        now = timezone.now()
+        span = days * 24 * 60 * 60
+        moments = sorted(random.random() * span for _ in range(count))
+        words, weights = self.vocabulary(vocabulary)
+        hashtags, tag_weights = self.vocabulary(tag_count) if tag_count else ([], [])
+        usernames = list(User.objects.filter(id__gte=users[0]).values_list("username", flat=True)) if users else []
+        adapt = connection.ops.adapt_datetimefield_value
+        with transaction.atomic(), connection.cursor() as cursor:
+            for offset in range(0, count, self.batch):
+                rows = [
+                    (self.text(words, weights, hashtags, tag_weights, usernames),
+                     random.choice(users),
+                     adapt(now - datetime.timedelta(seconds=span - moments[n])))
+                    for n in range(offset, min(offset + self.batch, count))
+                ]
+                cursor.executemany(
+                    f"INSERT INTO {table} (content, created_by_id, created_on, like_count) VALUES (%s, %s, %s, 0)",
+                    rows,
+                )
+        last = Post.objects.order_by("-id").values_list("id", flat=True).first() or 0
+        return range(last - count + 1, last + 1)
+
+    def seed_likes(self, users, posts, count):
+        if not posts:
+            return 0
+        total = 0
+        with transaction.atomic():
+            for offset in range(0, count, self.batch):
+                n = min(self.batch, count - offset)
+                # Newer posts collect more likes
+                rows = {(random.choice(users), posts[int(len(posts) * random.random() ** 0.5)]) for _ in range(n)}
+                Like.objects.bulk_create([Like(user_id=u, post_id=p) for u, p in rows], ignore_conflicts=True)
+                total += len(rows)
+        return total
+
+    def rebuild_counters(self):
+        """Set-based recount of every denormalized counter the bulk inserts bypassed"""
+        def follow_count(field):
+            rows = (UserFollowing.objects.filter(**{field: OuterRef("user_id")}).order_by()
+                    .values(field).annotate(n=Count("*")).values("n"))
+            return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+        with transaction.atomic():
+            Post.objects.update(like_count=actual_like_count())
+            Profile.objects.update(following_count=follow_count("user_id"),
+                                   follower_count=follow_count("following_user_id"))
+            Profile.objects.filter(follower_count__gt=getattr(settings, "TIMELINE_FANOUT_LIMIT", 5000)) \
+                .update(fanout_on_read=True)
+
+    def rebuild_timelines(self):
+        """
+        Materialize timelines in one INSERT ... SELECT: each follow gets the
+        followed author's newest TIMELINE_BACKFILL posts, like a live follow
+        would, and fanout_on_read authors are left to the read path.
+        """
+        entry = TimelineEntry._meta.db_table
+        post = Post._meta.db_table
+        follow = UserFollowing._meta.db_table
+        profile = Profile._meta.db_table
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {entry}")
+            cursor.execute(
+                f"INSERT INTO {entry} (owner_id, post_id, created_on) "
+                f"SELECT f.user_id_id, p.id, p.created_on FROM {follow} f "
+                f"JOIN (SELECT id, created_by_id, created_on, ROW_NUMBER() OVER "
+                f"(PARTITION BY created_by_id ORDER BY created_on DESC, id DESC) AS n FROM {post}) p "
+                f"ON p.created_by_id = f.following_user_id_id "
+                f"JOIN {profile} a ON a.user_id = f.following_user_id_id "
+                f"WHERE p.n <= %s AND a.fanout_on_read = %s",
+                [getattr(settings, "TIMELINE_BACKFILL", 500), False],
+            )
+            return cursor.rowcount
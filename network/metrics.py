@@ -0,0 +1,246 @@
+"""
+Per-request performance instrumentation.
+
+PerformanceMiddleware times every request and, for a METRICS_SAMPLE_RATE
+fraction of them, also its database queries (count, time, duplicates) and
+template rendering. Sampled requests get the breakdown in a Server-Timing
+header; every request gets its total.
+
+The measurements go into per-view histograms with fixed buckets, served by
+views.request_metrics, and requests slower than METRICS_SLOW_MS are written to
+the "network.slow" logger as one JSON object each, with their slowest and
+repeated SQL when they were sampled.
+
+Queries are seen through an execute wrapper put on every connection when it
+opens (signals), templates through a wrapper around the Django template
+backend (apps.ready). Both look up the current request's Recorder in a
+context variable, which follows the request into sync_to_async threads, and
+cost one lookup when it is unset.
+"""
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template.backends.django import Template
+
+logger = logging.getLogger("network.slow")
+
+_recorder = ContextVar("network_metrics_recorder", default=None)
+
+# Upper bounds of the histogram buckets, in ms (or queries); the last bucket is open-ended
+BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+SLOW_SQL = 5 # statements shown in a slow log entry
+
+
+class Recorder:
+    """What one sampled request spent on queries and templates"""
+
+    def __init__(self):
+        self.db = 0.0
+        self.queries = []          # (sql, seconds)
+        self.statements = Counter() # (sql, params) -> times run
+        self.template = 0.0
+        self.rendering = False
+
+    def query(self, sql, params, many, seconds):
+        self.db += seconds
+        self.queries.append((sql, seconds))
+        if not many:
+            self.statements[sql, repr(params)] += 1
+
+    @property
+    def duplicates(self):
+        """Queries that repeated an earlier one of the same request, parameters and all"""
+        return sum(n - 1 for n in self.statements.values())
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.query(sql, params, many, time.perf_counter() - start)
+
+
+def instrument_connection(sender, connection, **kwargs):
+    """connection_created receiver: time this connection's queries for sampled requests"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def instrument_templates():
+    """Time template rendering for sampled requests; Django has no hook for it outside tests"""
+    render = Template.render
+    if getattr(render, "instrumented", False):
+        return
+
+    def timed_render(self, context=None, request=None):
+        recorder = _recorder.get()
+        if recorder is None or recorder.rendering:
+            return render(self, context, request) # not sampled, or an include of a timed render
+        recorder.rendering = True
+        start, db = time.perf_counter(), recorder.db
+        try:
+            return render(self, context, request)
+        finally:
+            recorder.rendering = False
+            # Lazy queries run by the template are counted as database time only
+            recorder.template += time.perf_counter() - start - (recorder.db - db)
+
+    timed_render.instrumented = True
+    Template.render = timed_render
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def add(self, value):
+        self.counts[bisect_left(BOUNDS, value)] += 1
+        self.total += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (None for the open-ended bucket)"""
+        rank = q * self.total
+        seen = 0
+        for bound, count in zip(BOUNDS + (None,), self.counts):
+            seen += count
+            if seen >= rank and count:
+                return bound
+        return None
+
+    def snapshot(self):
+        return {
+            "count": self.total,
+            "mean": self.sum / self.total if self.total else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(bound) for bound in BOUNDS] + ["inf"], self.counts)),
+        }
+
+
+class Metrics:
+    """Histograms per view, per process"""
+
+    FIELDS = ("wall_ms", "db_ms", "template_ms", "queries", "duplicates")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(lambda: {field: Histogram() for field in self.FIELDS})
+        self.slow = 0
+
+    def record(self, view, wall_ms, recorder):
+        with self.lock:
+            histograms = self.views[view]
+            histograms["wall_ms"].add(wall_ms)
+            if recorder is not None:
+                histograms["db_ms"].add(recorder.db * 1000)
+                histograms["template_ms"].add(recorder.template * 1000)
+                histograms["queries"].add(len(recorder.queries))
+                histograms["duplicates"].add(recorder.duplicates)
+
+    def snapshot(self):
+        with self.lock:
+            return {view: {field: histogram.snapshot() for field, histogram in histograms.items()}
+                    for view, histograms in sorted(self.views.items())}
+
+
+metrics = Metrics()
+
+
+def server_timing(wall_ms, recorder):
+    parts = [f"total;dur={wall_ms:.1f}"]
+    if recorder is not None:
+        db_ms, template_ms = recorder.db * 1000, recorder.template * 1000
+        parts += [
+            f'db;dur={db_ms:.1f};desc="{len(recorder.queries)} queries, {recorder.duplicates} duplicates"',
+            f"tpl;dur={template_ms:.1f}",
+            f"app;dur={max(wall_ms - db_ms - template_ms, 0):.1f}",
+        ]
+    return ", ".join(parts)
+
+
+def log_slow(request, response, view, wall_ms, recorder):
+    entry = {
+        "view": view,
+        "method": request.method,
+        "path": request.get_full_path(),
+        "status": response.status_code,
+        "wall_ms": round(wall_ms, 1),
+        "sampled": recorder is not None,
+    }
+    if recorder is not None:
+        entry.update({
+            "db_ms": round(recorder.db * 1000, 1),
+            "template_ms": round(recorder.template * 1000, 1),
+            "queries": len(recorder.queries),
+            "duplicates": recorder.duplicates,
+            "slowest_sql": [{"ms": round(seconds * 1000, 2), "sql": sql}
+                            for sql, seconds in sorted(recorder.queries, key=lambda q: -q[1])[:SLOW_SQL]],
+            "repeated_sql": [{"times": n, "sql": sql}
+                             for (sql, _), n in recorder.statements.most_common(SLOW_SQL) if n > 1],
+        })
+    with metrics.lock:
+        metrics.slow += 1
+    logger.warning(json.dumps(entry))
+
+
+class PerformanceMiddleware:
+    """Times requests, samples their query and template time, and feeds the histograms and slow log"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.rate = getattr(settings, "METRICS_SAMPLE_RATE", 0.1)
+        self.slow_ms = getattr(settings, "METRICS_SLOW_MS", 500)
+        if asyncio.iscoroutinefunction(get_response):
+            # Tell the handler this instance is a coroutine function, as MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        recorder, token, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.finish(request, response, recorder, start)
+
+    async def __acall__(self, request):
+        recorder, token, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.finish(request, response, recorder, start)
+
+    def start(self):
+        recorder = Recorder() if random.random() < self.rate else None
+        return recorder, _recorder.set(recorder), time.perf_counter()
+
+    def finish(self, request, response, recorder, start):
+        wall_ms = (time.perf_counter() - start) * 1000
+        match = request.resolver_match
+        view = match.view_name if match else "unresolved"
+        metrics.record(view, wall_ms, recorder)
+        response["Server-Timing"] = server_timing(wall_ms, recorder)
+        if wall_ms >= self.slow_ms:
+            log_slow(request, response, view, wall_ms, recorder)
+        return response
@@ -0,0 +1,54 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_timelines(apps, schema_editor):
+    """Materialize existing follows so /following is complete right after migrating"""
+    UserFollowing = apps.get_model('network', 'UserFollowing')
+    Post = apps.get_model('network', 'Post')
+    TimelineEntry = apps.get_model('network', 'TimelineEntry')
+    for follow in UserFollowing.objects.all():
+        recent = (Post.objects.filter(created_by_id=follow.following_user_id_id)
+                  .exclude(created_on=None)
+                  .order_by('-created_on', '-id')
+                  .values_list('id', 'created_on')[:500])
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(owner_id=follow.user_id_id, post_id=pk, created_on=created_on) for pk, created_on in recent],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0011_post_created_on_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='fanout_on_read',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_on', models.DateTimeField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='network.post')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['owner', 'created_on', 'post'], name='timeline_owner_created_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='timelineentry',
+            unique_together={('owner', 'post')},
+        ),
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:20
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_like_counts(apps, schema_editor):
+    Post = apps.get_model('network', 'Post')
+    Like = Post.liker.through
+    count = (Like.objects.filter(post_id=OuterRef('pk')).order_by()
+             .values('post_id').annotate(n=Count('*')).values('n'))
+    Post.objects.update(like_count=Coalesce(Subquery(count, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0012_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_like_counts, migrations.RunPython.noop),
+    ]
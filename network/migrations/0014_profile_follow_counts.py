@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:23
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_follow_counts(apps, schema_editor):
+    Profile = apps.get_model('network', 'Profile')
+    UserFollowing = apps.get_model('network', 'UserFollowing')
+
+    def count(field):
+        rows = (UserFollowing.objects.filter(**{field: OuterRef('user_id')}).order_by()
+                .values(field).annotate(n=Count('*')).values('n'))
+        return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+    Profile.objects.update(following_count=count('user_id'), follower_count=count('following_user_id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0013_post_like_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_follow_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0014_profile_follow_counts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['created_by', 'created_on', 'id'], name='post_author_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userfollowing',
+            index=models.Index(fields=['following_user_id', 'user_id'], name='following_follower_idx'),
+        ),
+    ]
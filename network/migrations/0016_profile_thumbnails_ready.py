@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0015_feed_access_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='thumbnails_ready',
+            field=models.BooleanField(default=False),
+        ),
+    ]
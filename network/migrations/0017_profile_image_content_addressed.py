@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:37
+
+from django.db import migrations, models
+import network.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0016_profile_thumbnails_ready'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='image',
+            field=models.ImageField(default='default.jpg', storage=network.storage.ContentAddressedStorage(), upload_to='profile_pics'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:02
+
+from collections import Counter
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+FTS_TABLE = 'network_post_fts'
+
+
+def build_index(apps, schema_editor):
+    """FTS5 table on SQLite, PostTerm rows elsewhere, filled from the existing posts"""
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(content)")
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE} (rowid, content) SELECT id, content FROM network_post")
+        return
+
+    from network.search import terms
+    Post = apps.get_model('network', 'Post')
+    PostTerm = apps.get_model('network', 'PostTerm')
+    last = 0
+    while True:
+        posts = list(Post.objects.filter(id__gt=last).order_by('id').values_list('id', 'content')[:5000])
+        if not posts:
+            return
+        PostTerm.objects.bulk_create([
+            PostTerm(post_id=pk, term=term, frequency=n)
+            for pk, content in posts for term, n in Counter(terms(content)).items()
+        ], batch_size=1000)
+        last = posts[-1][0]
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0017_profile_image_content_addressed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('frequency', models.PositiveSmallIntegerField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='network.post')),
+            ],
+            options={
+                'unique_together': {('term', 'post')},
+            },
+        ),
+        migrations.RunPython(build_index, drop_index),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill(apps, schema_editor):
+    """Tags and mentions of the existing dated posts; trending counts start empty"""
+    from network.tags import extract
+    Post = apps.get_model('network', 'Post')
+    Hashtag = apps.get_model('network', 'Hashtag')
+    PostTag = apps.get_model('network', 'PostTag')
+    Mention = apps.get_model('network', 'Mention')
+    User = apps.get_model('network', 'User')
+    last = 0
+    while True:
+        posts = list(Post.objects.filter(id__gt=last).exclude(created_on=None).order_by('id').values_list('id', 'content', 'created_on')[:5000])
+        if not posts:
+            return
+        found = {pk: extract(content) for pk, content, _ in posts}
+        names = set().union(*(tags for tags, _ in found.values()))
+        Hashtag.objects.bulk_create([Hashtag(name=name) for name in names], ignore_conflicts=True)
+        tag_ids = dict(Hashtag.objects.filter(name__in=names).values_list('name', 'id'))
+        user_ids = dict(User.objects.filter(username__in=set().union(*(users for _, users in found.values())))
+                        .values_list('username', 'id'))
+        PostTag.objects.bulk_create([
+            PostTag(post_id=pk, tag_id=tag_ids[name], created_on=created_on)
+            for pk, _, created_on in posts for name in found[pk][0]
+        ], batch_size=1000)
+        Mention.objects.bulk_create([
+            Mention(post_id=pk, user_id=user_ids[name], created_on=created_on)
+            for pk, _, created_on in posts for name in found[pk][1] if name in user_ids
+        ], batch_size=1000)
+        last = posts[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0018_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hashtag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('window_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TagBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='network.hashtag')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_on', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tags', to='network.post')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='posts', to='network.hashtag')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Mention',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_on', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to='network.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='hashtag',
+            index=models.Index(fields=['-window_count', 'name'], name='hashtag_trending_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tagbucket',
+            unique_together={('start', 'tag')},
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['tag', 'created_on', 'post'], name='posttag_tag_created_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='posttag',
+            unique_together={('post', 'tag')},
+        ),
+        migrations.AddIndex(
+            model_name='mention',
+            index=models.Index(fields=['user', 'created_on', 'post'], name='mention_user_created_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='mention',
+            unique_together={('post', 'user')},
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -2,12 +2,21 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.core.exceptions import ValidationError
 
+from .storage import avatar_storage
+
 class User(AbstractUser):
     pass
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    image = models.ImageField(default="default.jpg", upload_to="profile_pics")
+    image = models.ImageField(default="default.jpg", upload_to="profile_pics", storage=avatar_storage)
+    # Set by network.images once the resized WebP copies of image exist
+    thumbnails_ready = models.BooleanField(default=False)
+    # Too many followers to push every post: followers pull these posts at read time
+    fanout_on_read = models.BooleanField(default=False)
+    # Denormalized UserFollowing counts, kept by network.follows
+    following_count = models.PositiveIntegerField(default=0)
+    follower_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f'{self.user.username} Profile'
@@ -24,6 +33,10 @@ class UserFollowing(models.Model):
             
     class Meta:
         unique_together = ['user_id', 'following_user_id']
+        indexes = [
+            # Followers of a user without touching the table (fan-out, follower lists)
+            models.Index(fields=['following_user_id', 'user_id'], name='following_follower_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user_id} followed {self.following_user_id}"
@@ -33,7 +46,114 @@ class Post(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, null=True, related_name='created_by')
     created_on = models.DateTimeField(auto_now_add = True, null=True)
     liker = models.ManyToManyField(User, blank=True, related_name='like')
+    # Denormalized liker count, moved with F() increments (see views.post)
+    like_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Keyset pagination walks (created_on, id) in both directions
+        indexes = [
+            models.Index(fields=['created_on', 'id'], name='post_created_on_id_idx'),
+            # Profile feed and timeline backfill: one author's posts, newest first
+            models.Index(fields=['created_by', 'created_on', 'id'], name='post_author_created_idx'),
+        ]
     
     def __str__(self):
         return f"A post by {self.created_by}"
 
+
+class PostTerm(models.Model):
+    """Inverted index entry: post contains term frequency times (search on non-SQLite backends)"""
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="terms")
+    frequency = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = [["term", "post"]] # also the index a lookup by term reads
+
+    def __str__(self):
+        return f"{self.term} in post {self.post_id}"
+
+
+class Hashtag(models.Model):
+    name = models.CharField(max_length=64, unique=True) # lower-cased, without the #
+    # Posts tagged in the trending window, kept by network.tags from TagBucket
+    window_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Top tags are the head of this index
+            models.Index(fields=['-window_count', 'name'], name='hashtag_trending_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.name}"
+
+
+class PostTag(models.Model):
+    """post uses #tag"""
+    tag = models.ForeignKey(Hashtag, on_delete=models.CASCADE, related_name="posts")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="tags")
+    created_on = models.DateTimeField() # copy of post.created_on so a tag's feed is one index range
+
+    class Meta:
+        unique_together = ['post', 'tag']
+        indexes = [
+            models.Index(fields=['tag', 'created_on', 'post'], name='posttag_tag_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tag} in post {self.post_id}"
+
+
+class Mention(models.Model):
+    """post mentions @user"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="mentions")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="mentions")
+    created_on = models.DateTimeField() # copy of post.created_on
+
+    class Meta:
+        unique_together = ['post', 'user']
+        indexes = [
+            models.Index(fields=['user', 'created_on', 'post'], name='mention_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} mentioned in post {self.post_id}"
+
+
+class TagBucket(models.Model):
+    """Posts tagged with tag that were created in the TRENDING_BUCKET seconds from start"""
+    tag = models.ForeignKey(Hashtag, on_delete=models.CASCADE, related_name="buckets")
+    start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['start', 'tag'] # also the index that finds the buckets leaving the window
+
+    def __str__(self):
+        return f"{self.tag} x{self.count} from {self.start}"
+
+
+class TimelineEntry(models.Model):
+    """A post materialized into a follower's Following feed when it is written"""
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="timeline")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="timeline_entries")
+    created_on = models.DateTimeField() # copy of post.created_on so the feed is one index range
+
+    class Meta:
+        unique_together = ['owner', 'post']
+        indexes = [
+            models.Index(fields=['owner', 'created_on', 'post'], name='timeline_owner_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.post} in {self.owner}'s timeline"
+
+
+class FeedVersion(models.Model):
+    """When something feed pages show last changed (network.conditional), shared by all workers"""
+    name = models.CharField(max_length=64, unique=True)
+    stamp = models.BigIntegerField() # time.time_ns() of the change
+
+    def __str__(self):
+        return f"{self.name} changed at {self.stamp}"
@@ -0,0 +1,128 @@
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(created_on, pk, direction="n"):
+    """Pack a (created_on, id) position into an opaque url-safe token"""
+    raw = f"{direction}|{created_on.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Unpack a token made by encode_cursor -> (direction, created_on, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        direction, created_on, pk = base64.urlsafe_b64decode(padded).decode().split("|")
+        created_on = parse_datetime(created_on)
+        pk = int(pk)
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        raise InvalidCursor(cursor)
+    if direction not in ("n", "p") or created_on is None:
+        raise InvalidCursor(cursor)
+    return direction, created_on, pk
+
+
+class CursorPage:
+    """One page of a keyset-paginated feed, newest first"""
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def next_cursor(self):
+        if not self.has_next:
+            return None
+        last = self.object_list[-1]
+        return encode_cursor(last.created_on, last.pk, "n")
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous:
+            return None
+        first = self.object_list[0]
+        return encode_cursor(first.created_on, first.pk, "p")
+
+
+class CursorPaginator:
+    """
+    Keyset paginator over a Post queryset ordered by (-created_on, -id).
+
+    Unlike django's Paginator it never runs COUNT(*) and never uses OFFSET,
+    so every page costs one indexed range read of per_page + 1 rows. The
+    redundant created_on bound keeps the OR inside an index range scan.
+
+    key names the (timestamp, tie-breaker) columns to seek on, for querysets
+    whose rows mirror a post's position under other names.
+    """
+
+    def __init__(self, queryset, per_page, key=("created_on", "id")):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.key = key
+
+    def rows(self, direction, created_on, pk, limit):
+        """Up to limit rows past (created_on, pk), newest first for "n", oldest first for "p" """
+        return list(self.seek(direction, created_on, pk)[:limit])
+
+    def newest(self):
+        """created_on of the feed's newest row, or None when it is empty"""
+        rows = self.rows("n", None, None, 1)
+        return rows[0].created_on if rows else None
+
+    def seek(self, direction, created_on, pk):
+        """The ordered, unsliced queryset behind rows()"""
+        field, tie = self.key
+        queryset = self.queryset
+        if direction == "n":
+            if created_on is not None:
+                queryset = queryset.filter(
+                    Q(**{f"{field}__lt": created_on}) | Q(**{f"{tie}__lt": pk}),
+                    **{f"{field}__lte": created_on})
+            queryset = queryset.order_by(f"-{field}", f"-{tie}")
+        else:
+            queryset = queryset.filter(
+                Q(**{f"{field}__gt": created_on}) | Q(**{f"{tie}__gt": pk}),
+                **{f"{field}__gte": created_on})
+            queryset = queryset.order_by(field, tie)
+        return queryset
+
+    def get_page(self, cursor=None):
+        """Return the page after/before cursor; a bad, empty or exhausted cursor gives the first page"""
+        try:
+            direction, created_on, pk = decode_cursor(cursor) if cursor else ("n", None, None)
+        except InvalidCursor:
+            direction, created_on, pk = "n", None, None
+
+        if direction == "p":
+            rows = self.rows("p", created_on, pk, self.per_page + 1)
+            if rows:
+                has_previous = len(rows) > self.per_page
+                rows = rows[:self.per_page]
+                rows.reverse()
+                return CursorPage(rows, True, has_previous)
+            created_on = pk = None
+
+        rows = self.rows("n", created_on, pk, self.per_page + 1)
+        if not rows and created_on is not None:
+            # Past the last row (a stale or edited cursor): start over from the top
+            created_on = pk = None
+            rows = self.rows("n", None, None, self.per_page + 1)
+        return CursorPage(rows[:self.per_page], len(rows) > self.per_page, created_on is not None)
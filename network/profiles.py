@@ -0,0 +1,82 @@
+"""
+Profiles on demand, and cached avatar lookups.
+
+A user gets a Profile row the first time one is needed: a picture upload, or a
+follow to count. Most accounts never change the default picture, so signing up
+no longer writes one. profile_of answers for users who have none yet with an
+unsaved Profile holding the defaults, which saving creates.
+
+Avatars are drawn from (image name, thumbnails_ready) pairs looked up per user
+through the cache, which also remembers users with the default picture. A
+page's authors are looked up together (attach_avatars) in at most one query
+for those the cache is missing, and the answer is kept on each User for the
+rest of the request, so cards no longer join or fetch profiles. The cache
+entry is dropped whenever the profile is saved or its thumbnails finish,
+which also marks the feed pages showing the avatar as changed.
+"""
+from django.core.cache import cache
+from django.db.models import F
+
+from .conditional import cards_changed
+from .models import Profile
+
+AVATAR_TTL = 24 * 60 * 60
+DEFAULT_IMAGE = Profile._meta.get_field("image").default
+DEFAULT_AVATAR = (DEFAULT_IMAGE, False)
+
+
+def avatar_key(user_id):
+    return f"network:avatar:{user_id}"
+
+
+def profile_of(user):
+    """user's Profile, or an unsaved one with the defaults if they never needed one"""
+    try:
+        return user.profile
+    except Profile.DoesNotExist:
+        return Profile(user=user)
+
+
+def increment(user_id, field):
+    """F() +1 on a profile counter; a first follow creates the profile that counts it"""
+    if Profile.objects.filter(user_id=user_id).update(**{field: F(field) + 1}):
+        return
+    profile, created = Profile.objects.get_or_create(user_id=user_id, defaults={field: 1})
+    if not created: # made by someone else in between
+        Profile.objects.filter(user_id=user_id).update(**{field: F(field) + 1})
+
+
+def avatars(user_ids):
+    """{user_id: (image name, thumbnails_ready)} from the cache, with one query for the users it misses"""
+    keys = {avatar_key(pk): pk for pk in set(user_ids)}
+    found = {keys[key]: value for key, value in cache.get_many(keys).items()}
+    missing = [pk for pk in keys.values() if pk not in found]
+    if missing:
+        custom = {pk: (image, ready) for pk, image, ready in Profile.objects
+                  .filter(user_id__in=missing).exclude(image=DEFAULT_IMAGE)
+                  .values_list("user_id", "image", "thumbnails_ready")}
+        fresh = {pk: custom.get(pk, DEFAULT_AVATAR) for pk in missing}
+        cache.set_many({avatar_key(pk): avatar for pk, avatar in fresh.items()}, AVATAR_TTL)
+        found.update(fresh)
+    return found
+
+
+def attach_avatars(users):
+    """Look the avatars of users up together and keep each on its User for user_avatar"""
+    users = [user for user in users if getattr(user, "_avatar", None) is None]
+    if users:
+        found = avatars(user.pk for user in users)
+        for user in users:
+            user._avatar = found[user.pk]
+
+
+def user_avatar(user):
+    """(image name, thumbnails_ready) of user, looked up once per instance"""
+    if getattr(user, "_avatar", None) is None:
+        attach_avatars([user])
+    return user._avatar
+
+
+def forget_avatars(user_ids):
+    cache.delete_many([avatar_key(pk) for pk in user_ids])
+    cards_changed() # feed pages show the old picture
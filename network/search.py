@@ -0,0 +1,175 @@
+"""
+Full-text search over Post.content.
+
+SQLite uses an FTS5 table keyed by post id and ranked with bm25. Other
+backends use PostTerm, a plain inverted index ranked by tf-idf.
+settings.SEARCH_BACKEND ("auto", "fts5" or "terms") picks one; switching
+needs a `manage.py rebuild_search`.
+
+Both are updated incrementally, in the writing transaction, from Post saves
+(signals.post_indexed) and from the bulk edits of views.post_batch.
+"""
+import math
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, Sum, Value, When
+
+from .models import Post, PostTerm
+
+FTS_TABLE = "network_post_fts"
+WORD = re.compile(r"\w+")
+MAX_TERM = 64        # PostTerm.term length; longer "words" are not searchable
+MIN_PREFIX = 3       # the last word is a prefix match once it is this long
+MAX_QUERY_TERMS = 8
+
+
+def terms(text):
+    """Lower-cased words of a text, as the index stores them"""
+    return [word for word in WORD.findall(text.lower()) if len(word) <= MAX_TERM]
+
+
+def uses_fts():
+    backend = getattr(settings, "SEARCH_BACKEND", "auto")
+    if backend == "auto":
+        return connection.vendor == "sqlite"
+    return backend == "fts5"
+
+
+def index_posts(posts):
+    """(Re)index posts that were just created or edited"""
+    rows = [(post.pk, post.content) for post in posts]
+    if not rows:
+        return
+    ids = [pk for pk, _ in rows]
+    with transaction.atomic():
+        if uses_fts():
+            with connection.cursor() as cursor:
+                cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in ids])
+                cursor.executemany(f"INSERT INTO {FTS_TABLE} (rowid, content) VALUES (%s, %s)", rows)
+        else:
+            PostTerm.objects.filter(post_id__in=ids).delete()
+            PostTerm.objects.bulk_create([
+                PostTerm(post_id=pk, term=term, frequency=n)
+                for pk, content in rows for term, n in Counter(terms(content)).items()
+            ], batch_size=1000)
+
+
+def unindex_posts(post_ids):
+    if uses_fts():
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(pk,) for pk in post_ids])
+    else:
+        PostTerm.objects.filter(post_id__in=post_ids).delete()
+
+
+def rebuild(batch_size=5000):
+    """Index every post from scratch -> number of posts indexed"""
+    with transaction.atomic():
+        if uses_fts():
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {FTS_TABLE}")
+                cursor.execute(f"INSERT INTO {FTS_TABLE} (rowid, content) "
+                               f"SELECT id, content FROM {Post._meta.db_table}")
+                total = cursor.rowcount
+                # Merge the b-trees the bulk insert left behind into one
+                cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+                return total
+        PostTerm.objects.all().delete()
+        total = 0
+        last = 0
+        while True:
+            posts = list(Post.objects.filter(id__gt=last).order_by("id").only("id", "content")[:batch_size])
+            if not posts:
+                return total
+            index_posts(posts)
+            total += len(posts)
+            last = posts[-1].pk
+
+
+class SearchPage:
+    """One page of ranked results; search is paged by number since rank has no index to seek on"""
+
+    def __init__(self, object_list, number, has_next):
+        self.object_list = object_list
+        self.number = number
+        self.has_next = has_next
+        self.has_previous = number > 1
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+
+def fts_query(words):
+    """FTS5 MATCH expression: every word quoted (no operator injection), the last one as a prefix"""
+    quoted = [f'"{word}"' for word in words]
+    if len(words[-1]) >= MIN_PREFIX:
+        quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def ranked_ids(words, offset, limit):
+    """
+    Ids of the posts containing every word, best match first.
+
+    Ranking scores every match, which for a word in most posts means most of
+    the table; only the newest settings.SEARCH_MAX_RANKED matches are ranked.
+    """
+    newest = getattr(settings, "SEARCH_MAX_RANKED", 5000)
+    if uses_fts():
+        match = fts_query(words)
+        with connection.cursor() as cursor:
+            # Matches come out of the index in rowid order, so finding the oldest one to rank is cheap
+            cursor.execute(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                           f"ORDER BY rowid DESC LIMIT 1 OFFSET %s", [match, newest - 1])
+            oldest = cursor.fetchone()
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid >= %s "
+                f"ORDER BY rank LIMIT %s OFFSET %s",
+                [match, oldest[0] if oldest else 0, limit, offset])
+            return [row[0] for row in cursor.fetchall()]
+
+    words = set(words)
+    frequency = dict(PostTerm.objects.filter(term__in=words).order_by()
+                     .values_list("term").annotate(n=Count("*")))
+    if len(frequency) < len(words):
+        return []
+    posts = cache.get_or_set("network:search:posts", Post.objects.count, 600)
+    # Every match contains the rarest word, so the newest posts with it bound the ranked set
+    rarest = min(frequency, key=frequency.get)
+    oldest = list(PostTerm.objects.filter(term=rarest).order_by("-post_id")
+                  .values_list("post_id", flat=True)[newest - 1:newest])
+    # tf-idf: a match on a rare word counts for more than one on a common word
+    score = Sum(Case(
+        *[When(term=term, then=ExpressionWrapper(F("frequency") * Value(math.log(1 + posts / n)),
+                                                 output_field=FloatField()))
+          for term, n in frequency.items()],
+        output_field=FloatField()))
+    rows = (PostTerm.objects.filter(term__in=words, post_id__gte=oldest[0] if oldest else 0).values("post_id")
+            .annotate(matched=Count("term"), score=score).filter(matched=len(words))
+            .order_by("-score", "-post_id").values_list("post_id", flat=True))
+    return list(rows[offset:offset + limit])
+
+
+def find(query, page=1, per_page=10):
+    """
+    A SearchPage of bare Post(id=...) stand-ins for the posts matching every
+    word of query; hydrate it with feeds.load_page.
+    """
+    words = terms(query)[:MAX_QUERY_TERMS]
+    if not words:
+        return SearchPage([], 1, False)
+    ids = ranked_ids(words, (page - 1) * per_page, per_page + 1)
+    return SearchPage([Post(id=pk) for pk in ids[:per_page]], page, len(ids) > per_page)
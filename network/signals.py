@@ -1,13 +1,115 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
 from .models import *
+from . import conditional, db, follows, graph, likes, live, metrics, profiles, search, tags, timeline
 
-def customer_profile(sender, instance, created, **kwargs):
-	"""After a user is created, create its user profile"""
+def profile_avatar_changed(sender, instance, **kwargs):
+	"""After a profile is saved (a new picture, most likely), look its avatar up again"""
+	transaction.on_commit(lambda: profiles.forget_avatars([instance.user_id]))
+
+post_save.connect(profile_avatar_changed, sender=Profile)
+
+
+def post_fan_out(sender, instance, created, **kwargs):
+	"""After a post is created, push it into its author's followers' timelines"""
+	if created:
+		timeline.fan_out_post(instance)
+
+post_save.connect(post_fan_out, sender=Post)
+
+def post_live_notice(sender, instance, created, **kwargs):
+	"""After a post is committed, count it in the "new posts" notices of open feeds"""
 	if created:
-		Profile.objects.create(
-			user=instance,
-			)
-		# print('Profile created!')
+		transaction.on_commit(lambda: live.hub.publish_post(instance.pk, instance.created_by_id))
+
+post_save.connect(post_live_notice, sender=Post)
+
+def post_indexed(sender, instance, created, update_fields, **kwargs):
+	"""After a post is created or its content edited, (re)index it for search"""
+	if created or update_fields is None or "content" in update_fields:
+		search.index_posts([instance])
+
+post_save.connect(post_indexed, sender=Post)
+
+def post_unindexed(sender, instance, **kwargs):
+	"""After a post is deleted, drop it from the search index"""
+	search.unindex_posts([instance.pk])
+
+post_delete.connect(post_unindexed, sender=Post)
+
+def post_card_changed(sender, instance, created=False, **kwargs):
+	"""After a post is edited or deleted, stop answering 304 for the feed pages that showed it"""
+	if not created:
+		transaction.on_commit(conditional.cards_changed)
+
+post_save.connect(post_card_changed, sender=Post)
+post_delete.connect(post_card_changed, sender=Post)
+
+def post_tagged(sender, instance, created, update_fields, **kwargs):
+	"""After a post is created or its content edited, store its #tags and @mentions and count them as trending"""
+	if created or update_fields is None or "content" in update_fields:
+		tags.tag_posts([instance])
+
+post_save.connect(post_tagged, sender=Post)
+
+def post_untagged(sender, instance, **kwargs):
+	"""Before a post is deleted, uncount its tags while they can still be found"""
+	tags.untag_posts([instance])
+
+pre_delete.connect(post_untagged, sender=Post)
+
+def follow_backfill(sender, instance, created, **kwargs):
+	"""After a follow, count it and copy the followed user's recent posts into the follower's timeline"""
+	if created:
+		follows.record_follow(instance)
+		timeline.backfill_follow(instance.user_id, instance.following_user_id)
+
+post_save.connect(follow_backfill, sender=UserFollowing)
+
+def unfollow_prune(sender, instance, **kwargs):
+	"""After an unfollow, uncount it and remove the unfollowed user's posts from the follower's timeline"""
+	follows.record_unfollow(instance)
+	timeline.prune_follow(instance.user_id, instance.following_user_id)
+
+post_delete.connect(unfollow_prune, sender=UserFollowing)
+
+def follow_graph_add(sender, instance, created, **kwargs):
+	"""After a follow is committed, add it to this process's follow graph"""
+	if created:
+		transaction.on_commit(lambda: graph.record_follow(instance.user_id_id, instance.following_user_id_id))
+
+post_save.connect(follow_graph_add, sender=UserFollowing)
+
+def follow_graph_remove(sender, instance, **kwargs):
+	"""After an unfollow is committed, remove it from this process's follow graph"""
+	transaction.on_commit(lambda: graph.record_unfollow(instance.user_id_id, instance.following_user_id_id))
+
+post_delete.connect(follow_graph_remove, sender=UserFollowing)
+
+def follow_pages_changed(sender, instance, created=True, **kwargs):
+	"""After a follow or unfollow is committed, stop answering 304 for the pages that show it"""
+	if created:
+		transaction.on_commit(lambda: conditional.follows_changed(instance.user_id_id, instance.following_user_id_id))
+
+post_save.connect(follow_pages_changed, sender=UserFollowing)
+post_delete.connect(follow_pages_changed, sender=UserFollowing)
+
+def liker_changed(sender, instance, action, reverse, pk_set, **kwargs):
+	"""Keep like_count right when likers change outside views.post (admin, shell, tests)"""
+	if reverse and action == "pre_clear":
+		# Remember which posts the user liked before the rows are gone
+		instance._cleared_likes = list(likes.Like.objects.filter(user_id=instance.pk).values_list("post_id", flat=True))
+	if action not in ("post_add", "post_remove", "post_clear"):
+		return
+	if not reverse:
+		likes.recount_likes([instance.pk])
+	elif action == "post_clear":
+		likes.recount_likes(getattr(instance, "_cleared_likes", []))
+	elif pk_set:
+		likes.recount_likes(pk_set)
 
-post_save.connect(customer_profile, sender=User)
+m2m_changed.connect(liker_changed, sender=Post.liker.through)
 
+connection_created.connect(db.tune_sqlite)
+connection_created.connect(metrics.instrument_connection)
@@ -0,0 +1,28 @@
+// Live like counts and "N new posts" for the feed on screen, pushed over
+// Server-Sent Events by the ASGI app. Under WSGI /live is a 404, and
+// EventSource gives up on a non-200 answer without retrying.
+document.addEventListener("DOMContentLoaded", function() {
+    const notice = document.querySelector("#live");
+    if (!notice || !window.EventSource) {
+        return;
+    }
+    const posts = Array.from(document.querySelectorAll('span[id^="likes"]'), span => span.id.slice(5));
+    const source = new EventSource(`/live?feed=${encodeURIComponent(notice.dataset.feed)}&posts=${posts.join(",")}`);
+    let unseen = 0;
+
+    source.addEventListener("likes", function(event) {
+        Object.entries(JSON.parse(event.data)).forEach(function([post_id, count]) {
+            // Leave alone counts this page has clicks queued for (post.js)
+            if (typeof queue !== "undefined" && queue.has(post_id)) {
+                return;
+            }
+            document.querySelector(`#likes${post_id}`).innerHTML = count;
+        });
+    });
+
+    source.addEventListener("posts", function(event) {
+        unseen += JSON.parse(event.data).new;
+        notice.innerHTML = `${unseen} new post${unseen === 1 ? "" : "s"}`;
+        notice.style.display = "block";
+    });
+});
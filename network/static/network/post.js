@@ -1,9 +1,92 @@
+// Likes and edits are queued and sent together to /post/batch, so a burst
+// of clicks costs one request (and clicking twice cancels out locally).
+const BATCH_DELAY = 300; // ms of quiet before the queue is sent
+let queue = new Map(); // post_id -> {post_id, clicks, editedpost}
+let timer = null;
+
+function enqueue(post_id, change) {
+    const action = queue.get(post_id) || {post_id, clicks: 0};
+    if (change.clicked) {
+        action.clicks += 1;
+    }
+    if (change.editedpost) {
+        action.editedpost = change.editedpost;
+    }
+    queue.set(post_id, action);
+    clearTimeout(timer);
+    timer = setTimeout(flush, BATCH_DELAY);
+}
+
+function takeActions() {
+    const actions = [];
+    queue.forEach(function(action) {
+        const item = {post_id: action.post_id};
+        if (action.clicks % 2) {
+            item.clicked = true;
+        }
+        if (action.editedpost) {
+            item.editedpost = action.editedpost;
+        }
+        if (item.clicked || item.editedpost) {
+            actions.push(item);
+        }
+    });
+    queue = new Map();
+    clearTimeout(timer);
+    timer = null;
+    return actions;
+}
+
+function flush() {
+    const actions = takeActions();
+    if (!actions.length) {
+        return;
+    }
+    fetch('/post/batch', {
+        method: 'POST',
+        body: JSON.stringify({actions})
+    })
+    .then(response => response.json())
+    .then(result => {
+        (result.results || []).forEach(showResult);
+    })
+    .catch(err => {
+        console.log(err)
+    })
+}
+
+function showLiked(post_id, liked) {
+    const likebtn = document.querySelector(`.likebtn[data-postid="${post_id}"]`);
+    if (likebtn) {
+        likebtn.dataset.liked = liked ? "1" : "";
+        likebtn.innerHTML = liked
+            ? "<div style='color: red;'><i class='fa fa-heart'></i></div>"
+            : "<i class='far fa-heart'></i>";
+    }
+}
+
+function showResult(result) {
+    if (result.error) {
+        console.log(result.post_id, result.error);
+        return;
+    }
+    // Clicks made while this batch was in flight still show optimistically
+    if (queue.has(String(result.post_id))) {
+        return;
+    }
+    if (result.liked !== undefined) {
+        showLiked(result.post_id, result.liked);
+    }
+    if (result.likes_number !== undefined) {
+        document.querySelector(`#likes${result.post_id}`).innerHTML = result.likes_number;
+    }
+}
+
 document.addEventListener("DOMContentLoaded", function() {
 
     document.querySelectorAll("#editbtn").forEach(function(editbtn) {
         editbtn.onclick = function() {
             postid = editbtn.dataset.postid;
-            console.log(postid)
             editbtn.style.display = 'none';
             content = document.querySelector(`#content${editbtn.dataset.postid}`);
             content.innerHTML = `
@@ -16,49 +99,33 @@ document.addEventListener("DOMContentLoaded", function() {
 
             document.querySelector("#editform").onsubmit = function() {
                 const editedpost = document.querySelector("#editedpost").value;
-                const post_id = editbtn.dataset.postid;
-                console.log(editedpost)
-
-                fetch('/post', {
-                    method: "PUT", 
-                    body: JSON.stringify({editedpost, post_id})
-                })
-                .then(response => response.json())
-                .then(result => {
-                    content.innerHTML = editedpost;
-                    editbtn.style.display = 'block'
-                })
-                .catch(err => {
-                    console.log(err)
-                })
+                enqueue(editbtn.dataset.postid, {editedpost});
+                content.innerHTML = editedpost;
+                editbtn.style.display = 'block'
                 return false;
             }
         }
     });
 
     document.querySelectorAll(".likebtn").forEach(function(likebtn) {
+        likebtn.dataset.liked = likebtn.querySelector(".fa-heart.fa") ? "1" : "";
         likebtn.onclick = function() {
-            fetch('/post', {
-                method: 'PUT',
-                body: JSON.stringify({clicked: true, post_id: likebtn.dataset.postid})
-            })
-            .then(response => response.json())
-            .then(result => {
-                let likes_count = document.querySelector(`#likes${likebtn.dataset.postid}`);
-
-                if(parseInt(likes_count.innerHTML, 10) > parseInt(result.likes_number, 10)){
-                    likebtn.innerHTML = "<i class='far fa-heart'></i>"
-                }else if(parseInt(likes_count.innerHTML, 10) < parseInt(result.likes_number, 10)){
-                    likebtn.innerHTML = "<div style='color: red;'><i class='fa fa-heart'></i></div>"
-                }
-
-                document.querySelector(`#likes${likebtn.dataset.postid}`).innerHTML = result.likes_number;
-            })
-            .catch(err => {
-                console.log(err)
-            })
+            // Show the new state right away; the batch reply corrects it if needed
+            const post_id = likebtn.dataset.postid;
+            const liked = !likebtn.dataset.liked;
+            const likes_count = document.querySelector(`#likes${post_id}`);
+            likes_count.innerHTML = Math.max(parseInt(likes_count.innerHTML, 10) + (liked ? 1 : -1), 0);
+            showLiked(post_id, liked);
+            enqueue(post_id, {clicked: true});
             return false;
         }
     });
-    
-});
\ No newline at end of file
+
+    // Don't lose queued clicks when the user navigates away
+    document.addEventListener("visibilitychange", function() {
+        if (document.visibilityState === "hidden" && queue.size) {
+            navigator.sendBeacon('/post/batch', JSON.stringify({actions: takeActions()}));
+        }
+    });
+
+});
@@ -0,0 +1,136 @@
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+try:
+    import brotli
+except ImportError: # .br copies are only written when the brotli package is installed
+    brotli = None
+
+# Names written by ContentAddressedStorage: <dir>/<2 hex>/<64 hex>.<ext>
+HASHED_NAME = re.compile(r"(^|/)[0-9a-f]{2}/(thumbs/)?[0-9a-f]{64}(_\d+)?\.\w+$")
+
+
+def is_content_addressed(name):
+    """Whether a stored name embeds its content hash, i.e. can never change"""
+    return bool(HASHED_NAME.search(name.replace(os.sep, "/")))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores each upload under the SHA-256 of its bytes.
+
+    Identical uploads map to the same name and are written once, and since a
+    name can never point at different bytes the files can be cached forever.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # _save picks the final name from the content; never add a collision suffix
+        return name
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+
+        folder, filename = os.path.split(name)
+        ext = os.path.splitext(filename)[1].lower()
+        hexdigest = digest.hexdigest()
+        name = os.path.join(folder, hexdigest[:2], hexdigest + ext)
+        full_path = self.path(name)
+        if self.exists(name) and self._reuse(full_path):
+            return name
+
+        # Write a temporary file, then link it in under the final name: the
+        # link fails if the name exists, and readers never see a partial file.
+        # FileSystemStorage._save would retry an existing name forever.
+        directory = os.path.dirname(full_path)
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+            try:
+                os.makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in content.chunks():
+                    f.write(chunk)
+            # mkstemp makes the file 0600; give it what a plain save would
+            os.chmod(temp_path, 0o644 if self.file_permissions_mode is None else self.file_permissions_mode)
+            try:
+                os.link(temp_path, full_path)
+            except FileExistsError:
+                # same bytes uploaded concurrently; either copy is the right one
+                self._reuse(full_path)
+        finally:
+            os.unlink(temp_path)
+        return name
+
+    def _reuse(self, full_path):
+        """
+        Touch a stored file a new upload maps to -> whether it is still there.
+        It may be an orphan about to be collected; gc_media keeps files modified
+        within its grace period, which then covers the row about to point at it.
+        """
+        try:
+            os.utime(full_path)
+        except FileNotFoundError:
+            return False
+        return True
+
+
+avatar_storage = ContentAddressedStorage()
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    collectstatic storage: every file is also stored under a name with its
+    content hash (post.3f2a9c1e8b7d.js), which {% static %} links to, and text
+    files get .gz and .br copies so that network.files never compresses on a
+    request. Files not collected yet (tests, a fresh checkout) are linked
+    under their own name instead of failing the page.
+    """
+
+    COMPRESSIBLE = (".css", ".js", ".json", ".map", ".svg", ".txt", ".xml", ".html")
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # Files with url()s are hashed over several passes; only the last names are kept
+        for name in sorted({*paths, *self.hashed_files.values()}):
+            if name.endswith(self.COMPRESSIBLE):
+                self.compress(name)
+
+    def compress(self, name):
+        """Write name.gz (and name.br) when they come out smaller than name"""
+        with self.open(name) as f:
+            data = f.read()
+        encoders = [(".gz", lambda data: gzip.compress(data, 9, mtime=0))]
+        if brotli is not None:
+            encoders.append((".br", lambda data: brotli.compress(data, quality=11)))
+        for suffix, encode in encoders:
+            compressed = encode(data)
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            if len(compressed) < len(data) * 0.95:
+                self._save(name + suffix, ContentFile(compressed))
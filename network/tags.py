@@ -0,0 +1,198 @@
+"""
+#hashtags and @mentions of posts, and trending tags.
+
+Tags and mentions are extracted when a post is saved (signals.post_tagged,
+views.post_batch) into PostTag and Mention, which carry the post's
+created_on so that "posts with #tag" is one index range, like a timeline.
+
+Trending counts live in TagBucket rows, one per tag per TRENDING_BUCKET
+seconds, and in Hashtag.window_count, their sum over the TRENDING_WINDOW.
+Tagging a post adds one to its bucket and to the window count; once a
+bucket leaves the window, roll() subtracts it and drops it. Each bucket is
+rolled once, and the top tags are the head of an index on window_count:
+neither reads Post.
+"""
+import datetime
+import re
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .models import Hashtag, Mention, Post, PostTag, TagBucket, User
+from .pagination import CursorPaginator
+
+TAG = re.compile(r"(?<![\w#])#(\w{1,64})(?!\w)")
+MENTION = re.compile(r"(?<![\w@])@(\w{1,150})(?!\w)")
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+ROLLED_KEY = "network:tags:rolled"
+
+
+def window():
+    return getattr(settings, "TRENDING_WINDOW", 3600)
+
+
+def bucket_size():
+    return getattr(settings, "TRENDING_BUCKET", 300)
+
+
+def extract(text):
+    """-> ({lower-cased tag names}, {mentioned usernames})"""
+    return {tag.lower() for tag in TAG.findall(text)}, set(MENTION.findall(text))
+
+
+def bucket_start(moment):
+    size = bucket_size()
+    return EPOCH + datetime.timedelta(seconds=(moment - EPOCH).total_seconds() // size * size)
+
+
+def window_start(now=None):
+    """Start of the oldest bucket in the window; the window is up to one bucket short of TRENDING_WINDOW"""
+    return bucket_start(now or timezone.now()) + datetime.timedelta(seconds=bucket_size() - window())
+
+
+def hashtag_ids(names):
+    """{name: id} of the hashtags, creating the new ones"""
+    if not names:
+        return {}
+    Hashtag.objects.bulk_create([Hashtag(name=name) for name in names], ignore_conflicts=True)
+    return dict(Hashtag.objects.filter(name__in=names).values_list("name", "id"))
+
+
+def count(deltas):
+    """Apply {(bucket start, tag id): change} to the buckets still in the window and their window counts"""
+    cutoff = window_start()
+    deltas = {key: n for key, n in deltas.items() if n and key[0] >= cutoff}
+    if not deltas:
+        return
+    with transaction.atomic():
+        TagBucket.objects.bulk_create([TagBucket(start=start, tag_id=tag) for (start, tag), n in deltas.items() if n > 0],
+                                      ignore_conflicts=True)
+        by_start = defaultdict(list)
+        for start, tag in deltas:
+            by_start[start].append(tag)
+        windowed = Counter()
+        for start, tags in by_start.items():
+            # A bucket roll() has taken out of the window is gone: leave it out
+            present = (TagBucket.objects.select_for_update().filter(start=start, tag_id__in=tags)
+                       .values_list("tag_id", flat=True))
+            by_change = defaultdict(list)
+            for tag in present:
+                by_change[deltas[start, tag]].append(tag)
+                windowed[tag] += deltas[start, tag]
+            for n, changed in by_change.items():
+                TagBucket.objects.filter(start=start, tag_id__in=changed).update(count=F("count") + n)
+        by_change = defaultdict(list)
+        for tag, n in windowed.items():
+            by_change[n].append(tag)
+        for n, changed in by_change.items():
+            if n:
+                Hashtag.objects.filter(id__in=changed).update(window_count=F("window_count") + n)
+
+
+def tag_posts(posts):
+    """(Re)extract the tags and mentions of posts that were just created or edited"""
+    # Legacy posts without a created_on have no place in the (created_on) ordered indexes
+    posts = [post for post in posts if post.created_on is not None]
+    if not posts:
+        return
+    found = {post.pk: extract(post.content) for post in posts}
+    ids = list(found)
+    with transaction.atomic():
+        tag_ids = hashtag_ids(set().union(*(tags for tags, _ in found.values())))
+        user_ids = dict(User.objects.filter(username__in=set().union(*(users for _, users in found.values())))
+                        .values_list("username", "id"))
+        old_tags, old_mentions = defaultdict(set), defaultdict(set)
+        for pk, tag in PostTag.objects.filter(post_id__in=ids).values_list("post_id", "tag_id"):
+            old_tags[pk].add(tag)
+        for pk, user in Mention.objects.filter(post_id__in=ids).values_list("post_id", "user_id"):
+            old_mentions[pk].add(user)
+
+        new_tags, new_mentions, deltas = [], [], Counter()
+        for post in posts:
+            names, usernames = found[post.pk]
+            tags = {tag_ids[name] for name in names}
+            users = {user_ids[name] for name in usernames if name in user_ids}
+            start = bucket_start(post.created_on)
+            new_tags.extend(PostTag(post_id=post.pk, tag_id=tag, created_on=post.created_on)
+                            for tag in tags - old_tags[post.pk])
+            new_mentions.extend(Mention(post_id=post.pk, user_id=user, created_on=post.created_on)
+                                for user in users - old_mentions[post.pk])
+            deltas.update({(start, tag): 1 for tag in tags - old_tags[post.pk]})
+            deltas.subtract({(start, tag): 1 for tag in old_tags[post.pk] - tags})
+            if old_tags[post.pk] - tags:
+                PostTag.objects.filter(post_id=post.pk, tag_id__in=old_tags[post.pk] - tags).delete()
+            if old_mentions[post.pk] - users:
+                Mention.objects.filter(post_id=post.pk, user_id__in=old_mentions[post.pk] - users).delete()
+
+        PostTag.objects.bulk_create(new_tags, batch_size=1000)
+        Mention.objects.bulk_create(new_mentions, batch_size=1000)
+        count(deltas)
+
+
+def untag_posts(posts):
+    """Take posts about to be deleted out of the trending counts; their rows go with them"""
+    created = {post.pk: post.created_on for post in posts}
+    rows = PostTag.objects.filter(post_id__in=list(created)).values_list("post_id", "tag_id")
+    count(Counter({(bucket_start(created[pk]), tag): -1 for pk, tag in rows}))
+
+
+def roll():
+    """Take the buckets that have left the window out of the window counts; once per bucket boundary"""
+    cutoff = window_start()
+    if cache.get(ROLLED_KEY) == cutoff:
+        return
+    with transaction.atomic():
+        expired = list(TagBucket.objects.select_for_update().filter(start__lt=cutoff).values_list("id", "tag_id"))
+        if expired:
+            ids = [pk for pk, _ in expired]
+            buckets = TagBucket.objects.filter(id__in=ids)
+            leaving = (buckets.filter(tag=OuterRef("pk")).order_by().values("tag")
+                       .annotate(n=Sum("count")).values("n"))
+            Hashtag.objects.filter(id__in={tag for _, tag in expired}) \
+                .update(window_count=F("window_count") - Subquery(leaving))
+            buckets.delete()
+    cache.set(ROLLED_KEY, cutoff, None)
+
+
+def trending(limit=10):
+    """[(tag name, posts in the window)] of the most used tags"""
+    roll()
+    return list(Hashtag.objects.filter(window_count__gt=0).order_by("-window_count", "name")
+                .values_list("name", "window_count")[:limit])
+
+
+def rebuild(batch_size=5000):
+    """Extract the tags and mentions of every post from scratch -> number of posts read"""
+    with transaction.atomic():
+        PostTag.objects.all().delete()
+        Mention.objects.all().delete()
+        TagBucket.objects.all().delete()
+        Hashtag.objects.update(window_count=0)
+        cache.delete(ROLLED_KEY)
+        total = 0
+        last = 0
+        while True:
+            posts = list(Post.objects.filter(id__gt=last).order_by("id")
+                         .only("id", "content", "created_on")[:batch_size])
+            if not posts:
+                return total
+            tag_posts(posts)
+            total += len(posts)
+            last = posts[-1].pk
+
+
+class TagPaginator(CursorPaginator):
+    """Cursor pages of the posts with one tag, newest first"""
+
+    def __init__(self, tag, per_page):
+        rows = PostTag.objects.filter(tag=tag).only("post", "created_on")
+        super().__init__(rows, per_page, key=("created_on", "post_id"))
+
+    def rows(self, direction, created_on, pk, limit):
+        # Bare stand-ins carrying just the key; feeds.load_page fetches the posts
+        return [Post(id=row.post_id, created_on=row.created_on)
+                for row in super().rows(direction, created_on, pk, limit)]
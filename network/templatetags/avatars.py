@@ -0,0 +1,27 @@
+from django import template
+from django.core.files.storage import default_storage
+
+from network.images import thumbnail_name, thumbnail_sizes
+from network.profiles import user_avatar
+from network.storage import avatar_storage
+
+register = template.Library()
+
+
+def avatar_for(image_name, thumbnails_ready, size):
+    """avatar_url for a bare image name, e.g. from a values() row"""
+    if not image_name:
+        return ""
+    if thumbnails_ready:
+        fitting = [s for s in sorted(thumbnail_sizes()) if s >= size]
+        if fitting:
+            return default_storage.url(thumbnail_name(image_name, fitting[0]))
+    return avatar_storage.url(image_name)
+
+
+@register.simple_tag
+def avatar_url(user, size):
+    """URL of the user's smallest thumbnail at least size px wide, the original until they exist, or the default picture"""
+    if not user or user.pk is None:
+        return ""
+    return avatar_for(*user_avatar(user), size)
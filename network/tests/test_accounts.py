@@ -0,0 +1,79 @@
+import json
+import tempfile
+from io import StringIO
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.test import TestCase
+from network.models import *
+from network.accounts import import_users
+
+class TestImportUsers(TestCase):
+    def setUp(self):
+        User.objects.create_user(username="taken")
+
+    def test_import(self):
+        """ Users are made in bulk, without profiles; taken, repeated and invalid usernames are skipped """
+        result = import_users([
+            {"username": "a", "email": "a@EXAMPLE.com", "password": "pw-a"},
+            {"username": "b", "password_hash": make_password("pw-b")},
+            {"username": "c"},
+            {"username": "a", "password": "again"},
+            {"username": "taken"},
+            {"username": "no spaces"},
+        ], batch_size=2, processes=0)
+
+        self.assertEqual((result.rows, result.created, result.skipped), (6, 3, 3))
+        a, b, c = (User.objects.get(username=name) for name in "abc")
+        self.assertTrue(a.check_password("pw-a"))
+        self.assertEqual(a.email, "a@example.com")
+        self.assertTrue(b.check_password("pw-b"))
+        self.assertFalse(c.has_usable_password())
+        self.assertFalse(Profile.objects.filter(user__in=[a, b, c]).exists())
+
+    def test_process_pool(self):
+        """ Raw passwords can be hashed by other processes """
+        result = import_users(({"username": f"p{n}", "password": f"pw{n}"} for n in range(4)),
+                              batch_size=2, processes=2)
+
+        self.assertEqual(result.created, 4)
+        self.assertTrue(User.objects.get(username="p3").check_password("pw3"))
+
+    def test_command(self):
+        """ The command reads CSV and JSON lines and reports rows per second """
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl") as f:
+            f.write(json.dumps({"username": "j", "email": "j@example.com"}) + "\n")
+            f.flush()
+            out = StringIO()
+            call_command("import_users", f.name, processes=0, stdout=out)
+
+        self.assertIn("1 users created", out.getvalue())
+        self.assertIn("rows/s", out.getvalue())
+        self.assertEqual(User.objects.get(username="j").email, "j@example.com")
+
+    def test_api(self):
+        """ Staff can import through the API, up to max_rows users at a time """
+        staff = User.objects.create_user(username="staff", password="test", is_staff=True)
+        payload = {"users": [{"username": "x", "password": "pw"}, {"username": "taken"}]}
+
+        self.assertEqual(self.client.post("/api/v1/users/import", payload, content_type="application/json").status_code, 403)
+        self.client.login(username="staff", password="test")
+        response = self.client.post("/api/v1/users/import", payload, content_type="application/json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["created"], 1)
+        self.assertEqual(response.json()["skipped"], 1)
+        too_many = {"users": [{"username": f"u{n}"} for n in range(1001)]}
+        self.assertEqual(self.client.post("/api/v1/users/import", too_many, content_type="application/json").status_code, 400)
+        hashing = {"users": [{"username": f"h{n}", "password": "pw"} for n in range(21)]}
+        self.assertEqual(self.client.post("/api/v1/users/import", hashing, content_type="application/json").status_code, 400)
+
+    def test_bad_rows(self):
+        """ Rows with values of the wrong type are a 400 over the API and skipped by import_users """
+        User.objects.create_user(username="staff", password="test", is_staff=True)
+        self.client.login(username="staff", password="test")
+        for row in ({"username": ["x"]}, {"username": "x", "email": {}}, {"username": "x", "password": []}, "x"):
+            response = self.client.post("/api/v1/users/import", {"users": [row]}, content_type="application/json")
+            self.assertEqual(response.status_code, 400)
+
+        result = import_users([{"username": 5}, {"username": "y", "email": 7}, {"username": "z", "password": 12}], processes=0)
+        self.assertEqual((result.created, result.skipped), (0, 3))
@@ -0,0 +1,70 @@
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from network.models import *
+
+class TestFeedApi(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="test", password="test")
+        self.author = User.objects.create_user(username="author", password="test")
+        UserFollowing.objects.create(user_id=self.user, following_user_id=self.author)
+        self.posts = [Post.objects.create(created_by=self.author, content=f"post {i}") for i in range(15)]
+        self.posts[-1].liker.add(self.user)
+        self.c = Client()
+        self.c.login(username="test", password="test")
+
+    def test_rows(self):
+        """ Rows carry the author and the viewer's like, newest first """
+        response = self.c.get("/api/v1/posts")
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+
+        self.assertEqual(len(results), 10)
+        self.assertEqual(results[0]["id"], self.posts[-1].id)
+        self.assertTrue(results[0]["liked"])
+        self.assertEqual(results[0]["like_count"], 1)
+        self.assertEqual(results[0]["author"]["username"], "author")
+        self.assertTrue(results[0]["author"]["avatar"].endswith("default.jpg"))
+        self.assertFalse(results[1]["liked"])
+
+    def test_cursor_pages(self):
+        """ next/previous links walk the feed without gaps or repeats """
+        first = self.c.get("/api/v1/following?limit=10").json()
+        second = self.c.get(first["next"]).json()
+        back = self.c.get(second["previous"]).json()
+
+        ids = [row["id"] for row in first["results"] + second["results"]]
+        self.assertEqual(ids, [p.id for p in reversed(self.posts)])
+        self.assertIsNone(second["next"])
+        self.assertEqual(back["results"], first["results"])
+
+    def test_user_feed(self):
+        """ Per-user feed, 404 for an unknown user """
+        self.assertEqual(len(self.c.get("/api/v1/users/test/posts").json()["results"]), 0)
+        self.assertEqual(len(self.c.get("/api/v1/users/author/posts?limit=20").json()["results"]), 15)
+        self.assertEqual(self.c.get("/api/v1/users/nobody/posts").status_code, 404)
+
+    def test_following_requires_login(self):
+        """ The following feed is for logged-in users only """
+        self.assertEqual(Client().get("/api/v1/following").status_code, 403)
+
+    def test_etag(self):
+        """ A matching If-None-Match gets a 304 until the page changes """
+        etag = self.c.get("/api/v1/posts")["ETag"]
+
+        self.assertEqual(self.c.get("/api/v1/posts", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Post.objects.create(created_by=self.author, content="new")
+        self.assertEqual(self.c.get("/api/v1/posts", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_gzip(self):
+        """ Pages are gzipped for clients that accept it """
+        response = self.c.get("/api/v1/posts", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+    def test_query_count(self):
+        """ A page is a fixed number of queries, whatever its size """
+        with CaptureQueriesContext(connection) as small:
+            self.c.get("/api/v1/posts?limit=1")
+        with CaptureQueriesContext(connection) as full:
+            self.c.get("/api/v1/posts?limit=15")
+        self.assertEqual(len(small), len(full))
@@ -0,0 +1,69 @@
+import json
+from unittest import mock
+from django.test import AsyncClient, Client, TestCase, override_settings
+from django.urls import path
+from network import async_views
+from network.models import *
+from network.urls import urlpatterns as network_urls
+
+# network.urls as routed under ASGI
+ASYNC_ROUTES = {name: getattr(async_views, name) for name in ("index", "profile", "following", "post")}
+urlpatterns = [path(str(p.pattern), ASYNC_ROUTES.get(p.name, p.callback), name=p.name) for p in network_urls]
+
+@override_settings(ROOT_URLCONF=__name__)
+class TestAsyncViews(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="test", password="test")
+        self.author = User.objects.create_user(username="author", password="test")
+        UserFollowing.objects.create(user_id=self.user, following_user_id=self.author)
+        self.post = Post.objects.create(created_by=self.author, content="hello async")
+        self.c = Client()
+        self.c.login(username="test", password="test")
+        self.ac = AsyncClient()
+        self.ac.cookies = self.c.cookies
+
+    async def test_feeds(self):
+        """ Feeds render on the event loop with no lazy queries left in the templates """
+        for url in ("/", "/following", "/profile/author"):
+            response = await self.ac.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, "hello async")
+
+    def test_not_modified(self):
+        """ Conditional GETs are answered with a 304 before the coroutine view runs """
+        self.c.get("/") # sets the CSRF cookie
+        for url in ("/", "/following", "/profile/author"):
+            etag = self.c.get(url)["ETag"]
+            with mock.patch("network.async_views.render") as render:
+                response = self.c.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response["ETag"], etag)
+            self.assertFalse(render.called)
+
+    async def test_login_required(self):
+        """ Anonymous users are sent to the login page """
+        response = await AsyncClient().get("/following")
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, "/login?next=/following")
+
+    async def test_like(self):
+        """ PUT /post toggles the like without a CSRF token """
+        response = await self.ac.put("/post", json.dumps({"post_id": self.post.id, "clicked": True}),
+                                     content_type="application/json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["likes_number"], "1")
+
+    def test_wsgi_fallback(self):
+        """ The same coroutine views also run behind the sync (WSGI) handler """
+        self.assertContains(self.c.get("/profile/author"), "hello async")
+        response = self.c.put("/post", json.dumps({"post_id": self.post.id, "clicked": True}))
+        self.assertEqual(response.json()["likes_number"], "1")
+
+    def test_form_posts_use_sync_views(self):
+        """ Posting a new post goes through the sync view """
+        response = self.c.post("/", {"content": "from a form"})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Post.objects.filter(content="from a form").exists())
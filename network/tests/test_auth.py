@@ -0,0 +1,102 @@
+import threading
+from types import SimpleNamespace
+from unittest import mock
+from django.contrib import auth
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from network.models import *
+from network import auth as network_auth
+
+class TestAuthFastPath(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username="test", password="test")
+        Profile.objects.create(user=user)
+
+    def test_one_query(self):
+        """ The signed-in user comes with their profile in one query """
+        self.client.login(username="test", password="test")
+        request = SimpleNamespace(session=self.client.session)
+        request.session[auth.SESSION_KEY] # the session itself is read before
+
+        with self.assertNumQueries(1):
+            user = auth.get_user(request)
+            user.profile.follower_count
+
+    def test_model_backend_sessions(self):
+        """ Sessions signed in through ModelBackend stay signed in; new sign-ins use ProfileBackend """
+        user = User.objects.get(username="test")
+        self.client.force_login(user, backend="django.contrib.auth.backends.ModelBackend")
+        self.assertEqual(self.client.get("/following").status_code, 200)
+        self.assertEqual(self.client.session[auth.BACKEND_SESSION_KEY], "network.auth.ProfileBackend")
+
+        self.client.logout()
+        self.client.login(username="test", password="test")
+        self.assertEqual(self.client.session[auth.BACKEND_SESSION_KEY], "network.auth.ProfileBackend")
+
+    def test_failed_login_hashed_once(self):
+        """ A wrong password or an unknown user costs one password hash, like a good login """
+        for username, password in (("test", "wrong"), ("nobody", "test"), ("test", "test")):
+            with mock.patch("network.auth.run_hash", side_effect=network_auth.run_hash) as run_hash:
+                self.client.post("/login", {"username": username, "password": password})
+            self.assertEqual(run_hash.call_count, 1, username)
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.cached_db") # with DJANGO_SESSION_CACHE
+    def test_cached_session(self):
+        """ Sessions are written through to the database but read from the cache """
+        self.client.login(username="test", password="test")
+        self.assertEqual(Session.objects.count(), 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/")
+        self.assertEqual(response.context["user"].username, "test")
+        self.assertFalse(any("django_session" in q["sql"] for q in ctx.captured_queries))
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.cache")
+    def test_memory_sessions(self):
+        """ Without write-through, sessions live in the cache only """
+        self.client.post("/login", {"username": "test", "password": "test"})
+
+        self.assertEqual(auth.get_user(self.client).username, "test")
+        self.assertEqual(Session.objects.count(), 0)
+
+class TestPooledHashing(TestCase):
+    def setUp(self):
+        self.addCleanup(self.reset_pool)
+        self.reset_pool()
+        User.objects.create_user(username="test", password="test")
+
+    def reset_pool(self):
+        if network_auth._pool is not None:
+            network_auth._pool.shutdown()
+        network_auth._pool = network_auth._slots = None
+
+    def test_pool(self):
+        """ Hashes are made on the pool and are django's usual PBKDF2 ones """
+        name = network_auth.run_hash(lambda: threading.current_thread().name)
+        encoded = make_password("secret")
+
+        self.assertTrue(name.startswith("password-hash"))
+        self.assertTrue(encoded.startswith("pbkdf2_sha256$"))
+        self.assertTrue(check_password("secret", encoded))
+        self.assertTrue(check_password("secret", make_password("secret", hasher="pbkdf2_sha256")))
+
+    @override_settings(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE=0, PASSWORD_HASH_WAIT=0)
+    def test_busy(self):
+        """ With every hashing slot taken, logins and sign-ups answer 503 instead of queueing """
+        self.reset_pool() # setUp made it with the default sizes
+        _, slots = network_auth.get_hashing_pool()
+        slots.acquire()
+        try:
+            login = self.client.post("/login", {"username": "test", "password": "test"})
+            register = self.client.post("/register", {
+                "username": "new", "email": "new@example.com", "password": "pw", "confirmation": "pw"})
+        finally:
+            slots.release()
+
+        self.assertEqual(login.status_code, 503)
+        self.assertEqual(register.status_code, 503)
+        self.assertFalse(User.objects.filter(username="new").exists())
+        self.assertEqual(self.client.post("/login", {"username": "test", "password": "test"}).status_code, 302)
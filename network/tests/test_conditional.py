@@ -0,0 +1,112 @@
+import json
+import time
+from unittest import mock
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.utils.http import parse_http_date
+from network.models import *
+from network.likes import toggle_like
+from network import conditional
+
+class TestConditionalFeeds(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="test", password="test")
+        self.author = User.objects.create_user(username="author", password="test")
+        UserFollowing.objects.create(user_id=self.user, following_user_id=self.author)
+        self.post = Post.objects.create(created_by=self.author, content="hello")
+        self.client.login(username="test", password="test")
+        self.client.get("/") # the first page sets the CSRF cookie, which is part of the ETag
+
+    def revalidate(self, url, client=None):
+        client = client or self.client
+        etag = client.get(url)["ETag"]
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_not_modified(self):
+        """ A page the client already has gets a 304 without loading the feed or rendering """
+        for url in ("/", "/following", "/profile/author"):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["Cache-Control"], "private, no-cache")
+
+            with mock.patch("network.views.load_page") as load_page, mock.patch("network.views.render") as render:
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(response.status_code, 304)
+            self.assertFalse(load_page.called or render.called)
+
+    def test_changes(self):
+        """ Likes, new posts, unfollows and edits each make the pages showing them render again """
+        pages = {url: self.client.get(url)["ETag"] for url in ("/", "/following", "/profile/author")}
+        def changed():
+            return {url for url, etag in pages.items() if self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            toggle_like(self.post.id, self.user.id)
+        self.assertEqual(changed(), set(pages))
+
+        pages = {url: self.client.get(url)["ETag"] for url in pages}
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(created_by=self.user, content="new")
+        self.assertEqual(changed(), {"/"})
+
+        pages = {url: self.client.get(url)["ETag"] for url in pages}
+        with self.captureOnCommitCallbacks(execute=True):
+            UserFollowing.objects.filter(user_id=self.user).delete()
+        self.assertEqual(changed(), {"/following", "/profile/author"})
+
+        pages = {url: self.client.get(url)["ETag"] for url in pages}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.content = "edited"
+            self.post.save(update_fields=["content"])
+        self.assertEqual(changed(), set(pages))
+
+    def test_batch_edit(self):
+        """ Edits sent through /post/batch (bulk_update, no post_save) make the pages render again """
+        Post.objects.filter(pk=self.post.pk).update(created_by=self.user)
+        etag = self.client.get("/")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/post/batch", json.dumps({"actions": [{"post_id": self.post.id, "editedpost": "NEW"}]}),
+                             content_type="application/json")
+
+        response = self.client.get("/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "NEW")
+
+    def test_per_viewer(self):
+        """ Another viewer's copy of the same page never matches """
+        etag = self.client.get("/")["ETag"]
+        other = Client()
+        other.login(username="author", password="test")
+
+        self.assertEqual(other.get("/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_anonymous_index(self):
+        """ The anonymous index is cacheable by a shared proxy, apart from signed-in viewers """
+        anonymous = Client()
+        response = anonymous.get("/")
+
+        self.assertEqual(response["Cache-Control"], "public, max-age=0, s-maxage=10")
+        self.assertIn("Cookie", response["Vary"])
+        self.assertFalse(response.cookies)
+        self.assertEqual(self.revalidate("/", anonymous).status_code, 304)
+
+    def test_stamps_shared(self):
+        """ Stamps are read from the database, so a worker with an empty cache sees the same ones """
+        etag = self.client.get("/")["ETag"]
+        cache.clear()
+        self.assertEqual(self.client.get("/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        conditional.likes_changed() # as another worker would, on commit
+        self.assertEqual(self.client.get("/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_last_modified(self):
+        """ Last-Modified is rounded up, and left off until the second of the last change is over """
+        changed = Post.objects.get(pk=self.post.pk).created_on.timestamp()
+        with mock.patch("time.time", return_value=changed):
+            self.assertNotIn("Last-Modified", self.client.get("/"))
+
+        with mock.patch("time.time", return_value=changed + 1):
+            modified = self.client.get("/")["Last-Modified"]
+        self.assertGreaterEqual(parse_http_date(modified), changed)
+        self.assertEqual(self.client.get("/", HTTP_IF_MODIFIED_SINCE=modified).status_code, 304)
@@ -0,0 +1,14 @@
+from django.db import connection
+from django.test import TestCase
+
+class TestSqliteTuning(TestCase):
+    def test_pragmas_applied(self):
+        """ New SQLite connections run with the tuned pragmas """
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            synchronous = cursor.fetchone()[0]
+            cursor.execute("PRAGMA busy_timeout")
+            busy_timeout = cursor.fetchone()[0]
+
+        self.assertEqual(synchronous, 1) # NORMAL
+        self.assertEqual(busy_timeout, 20000)
@@ -0,0 +1,54 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from network.models import *
+from network.feeds import *
+
+class TestFeedQueries(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="test", password="test")
+        self.c = Client()
+        self.c.login(username="test", password="test")
+
+    def make_posts(self, n):
+        """ n posts by n distinct followed authors plus one by the viewer, all liked """
+        Post.objects.create(created_by=self.user, content="own").liker.add(self.user)
+        for i in range(n):
+            author = User.objects.create_user(username=f"author{Post.objects.count()}", password="x")
+            UserFollowing.objects.create(user_id=self.user, following_user_id=author)
+            post = Post.objects.create(created_by=author, content="test")
+            post.liker.add(self.user, author)
+
+    def count_queries(self, url):
+        cache.clear() # avatars and follows looked up cold every time
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.c.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def test_query_count_independent_of_page_size(self):
+        """ Every feed costs the same number of queries for 1 post or a full page """
+        urls = ['/', '/following', f'/profile/{self.user.username}']
+        for url in urls:
+            self.c.get(url) # loads the follow graph
+        self.make_posts(1)
+        small = [self.count_queries(url) for url in urls]
+        self.make_posts(8)
+        full = [self.count_queries(url) for url in urls]
+
+        self.assertEqual(small, full)
+        # user and profile, keyset read, hydration, every author's avatar + per-view lookups
+        self.assertLessEqual(max(full), 10)
+
+    def test_annotations(self):
+        """ like_count and liked_by_viewer come back on the post itself """
+        post = Post.objects.create(created_by=self.user, content="test")
+        other = User.objects.create_user(username="other", password="other")
+        post.liker.add(other)
+
+        loaded = feed_posts(self.user).get(pk=post.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(loaded.like_count, 1)
+            self.assertFalse(loaded.liked_by_viewer)
+            loaded.created_by.username
@@ -0,0 +1,117 @@
+import gzip
+import os
+import shutil
+import tempfile
+from asgiref.sync import async_to_sync
+from io import StringIO
+from wsgiref.util import setup_testing_defaults
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from network import files
+
+def fallback(environ, start_response):
+    start_response("404 Not Found", [])
+    return [b"django"]
+
+class TestFiles(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, root)
+        cls.static, cls.media = os.path.join(root, "static"), os.path.join(root, "media")
+        os.makedirs(os.path.join(cls.media, "profile_pics", "ab"))
+        override = override_settings(STATIC_ROOT=cls.static, MEDIA_ROOT=cls.media, DEBUG=False)
+        override.enable()
+        cls.addClassCleanup(override.disable)
+        call_command("collectstatic", interactive=False, verbosity=0, stdout=StringIO())
+        cls.hashed = staticfiles_storage.stored_name("network/post.js")
+
+    def setUp(self):
+        files._fingerprinted = None
+        self.addCleanup(setattr, files, "_fingerprinted", None)
+
+    def get(self, path, **headers):
+        environ = {"PATH_INFO": path, **{"HTTP_" + k.upper(): v for k, v in headers.items()}}
+        setup_testing_defaults(environ)
+        started = {}
+        body = files.wsgi_files(fallback)(environ, lambda status, headers: started.update(status=status, headers=dict(headers)))
+        return started["status"], started["headers"], b"".join(body)
+
+    def test_collect(self):
+        """ collectstatic fingerprints the assets and writes gzip copies next to them """
+        self.assertRegex(self.hashed, r"^network/post\.[0-9a-f]{12}\.js$")
+        with open(os.path.join(self.static, "network", "post.js"), "rb") as f:
+            source = f.read()
+        with gzip.open(os.path.join(self.static, self.hashed + ".gz")) as f:
+            self.assertEqual(f.read(), source)
+
+    def test_static(self):
+        """ Fingerprinted names are immutable and sent precompressed to clients that take it """
+        status, headers, body = self.get("/static/" + self.hashed, accept_encoding="br;q=0, gzip, deflate")
+        self.assertEqual(status, "200 OK")
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(headers["Vary"], "Accept-Encoding")
+        self.assertEqual(headers["Cache-Control"], files.IMMUTABLE)
+        self.assertEqual(int(headers["Content-Length"]), len(body))
+
+        status, plain, body = self.get("/static/" + self.hashed)
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertIn(b"function", body)
+        # The unfingerprinted name may change, so it is cached briefly
+        self.assertEqual(self.get("/static/network/post.js")[1]["Cache-Control"], "public, max-age=60")
+
+    def test_conditional(self):
+        """ A matching ETag gets a 304 without a body """
+        etag = self.get("/static/" + self.hashed)[1]["ETag"]
+        status, headers, body = self.get("/static/" + self.hashed, if_none_match=etag)
+
+        self.assertEqual(status, "304 Not Modified")
+        self.assertEqual(body, b"")
+
+    def test_media(self):
+        """ Media goes to the server's file wrapper; content-addressed uploads are immutable """
+        name = "profile_pics/ab/" + "ab" * 32 + ".jpg"
+        with open(os.path.join(self.media, name), "wb") as f:
+            f.write(b"jpeg")
+        wrapped = []
+        environ = {"PATH_INFO": "/images/" + name, "wsgi.file_wrapper": lambda f, size: wrapped.append(f) or [f.read()]}
+        setup_testing_defaults(environ)
+        headers = {}
+        body = files.wsgi_files(fallback)(environ, lambda status, h: headers.update(h))
+
+        self.assertEqual(body, [b"jpeg"])
+        self.assertEqual(len(wrapped), 1)
+        self.assertEqual(headers["Cache-Control"], files.IMMUTABLE)
+        self.assertEqual(headers["Content-Type"], "image/jpeg")
+
+    def test_left_to_django(self):
+        """ Missing files, paths outside the roots, other methods and DEBUG go on to Django """
+        self.assertEqual(self.get("/static/network/missing.js")[2], b"django")
+        self.assertEqual(self.get("/static/../../etc/passwd")[2], b"django")
+        self.assertEqual(self.get("/")[2], b"django")
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.get("/static/" + self.hashed)[2], b"django")
+
+    def test_asgi(self):
+        """ Under ASGI the file is sent in chunks, or handed over whole with zero-copy send """
+        async def django(scope, receive, send):
+            raise AssertionError("reached Django")
+
+        def run(extensions):
+            sent = []
+            async def send(message):
+                if message["type"] == "http.response.zerocopysend":
+                    message = {**message, "body": message.pop("file").read()}
+                sent.append(message)
+            scope = {"type": "http", "method": "GET", "path": "/static/" + self.hashed,
+                     "headers": [(b"accept-encoding", b"gzip")], "extensions": extensions}
+            async_to_sync(files.asgi_files(django))(scope, None, send)
+            return sent
+
+        for extensions in ({}, {"http.response.zerocopysend": {}}):
+            sent = run(extensions)
+            self.assertEqual(sent[0]["status"], 200)
+            self.assertIn((b"content-encoding", b"gzip"), sent[0]["headers"])
+            self.assertTrue(gzip.decompress(b"".join(m.get("body", b"") for m in sent[1:])))
@@ -0,0 +1,124 @@
+import random
+import threading
+from unittest import mock
+from django.test import TestCase
+from network.models import *
+from network import graph
+
+class TestFollowGraph(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.u = {name: User.objects.create_user(username=name) for name in "abcdef"}
+        cls.u["c"].set_password("test")
+        cls.u["c"].save()
+        for follower, followed in ["ab", "ba", "ca", "ad", "be", "de", "cb", "fc"]:
+            UserFollowing.objects.create(user_id=cls.u[follower], following_user_id=cls.u[followed])
+
+    def setUp(self):
+        graph._graph = None
+        self.addCleanup(setattr, graph, "_graph", None)
+
+    def follow(self, follower, followed):
+        UserFollowing.objects.create(user_id=self.u[follower], following_user_id=self.u[followed])
+
+    def ids(self, names):
+        return {self.u[name].id for name in names}
+
+    def test_rows(self):
+        """ Following, followers and mutuals match the table """
+        g = graph.get_follow_graph()
+        a = self.u["a"].id
+
+        self.assertEqual(g.following(a), self.ids("bd"))
+        self.assertEqual(g.followers(a), self.ids("bc"))
+        self.assertEqual(g.mutuals(a), self.ids("b"))
+        self.assertEqual(g.known_followers(self.u["c"].id, a), self.ids("b"))
+
+    def test_two_hops(self):
+        """ Suggestions are accounts followed by the ones you follow; followers-of-followers the reverse """
+        g = graph.get_follow_graph()
+        a = self.u["a"].id
+
+        self.assertEqual(g.suggestions(a, 1), [(self.u["e"].id, 2)])
+        self.assertEqual(g.followers_of_followers(a), [(self.u["f"].id, 1)])
+        # Following nobody, the most followed accounts are suggested
+        self.assertEqual(g.suggestions(self.u["e"].id, 2), [(self.u["a"].id, 0), (self.u["b"].id, 0)])
+
+    def test_follow_unfollow(self):
+        """ Committed follows and unfollows show up without a reload """
+        g = graph.get_follow_graph()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.follow("e", "a")
+            UserFollowing.objects.get(user_id=self.u["b"], following_user_id=self.u["a"]).delete()
+
+        self.assertIs(graph.get_follow_graph(), g)
+        self.assertEqual(g.followers(self.u["a"].id), self.ids("ce"))
+        self.assertEqual(g.mutuals(self.u["a"].id), set())
+        self.assertEqual(g.followed.degree(self.u["a"].id), 2)
+
+    def test_matches_table(self):
+        """ A random graph loads into rows equal to the table's, in both directions """
+        users = [User.objects.create_user(username=f"r{n}") for n in range(30)]
+        random.seed(1)
+        UserFollowing.objects.bulk_create({
+            (f, t): UserFollowing(user_id=f, following_user_id=t)
+            for f, t in (random.sample(users, 2) for _ in range(200))
+        }.values())
+        g = graph.get_follow_graph()
+
+        for user in users:
+            self.assertEqual(g.following(user.id), set(user.following.values_list("following_user_id", flat=True)))
+            self.assertEqual(g.followers(user.id), set(user.followers.values_list("user_id", flat=True)))
+
+    def test_background_reload(self):
+        """ A stale graph is served while a new one loads; follows committed meanwhile carry over """
+        g = graph.get_follow_graph()
+        fresh = graph.FollowGraph.load()
+        started, release = threading.Event(), threading.Event()
+        def load():
+            started.set()
+            release.wait(5)
+            return fresh
+
+        g.loaded -= 3600
+        with mock.patch.object(graph.FollowGraph, "load", side_effect=load):
+            self.assertIs(graph.get_follow_graph(), g)
+            started.wait(5)
+            graph.record_follow(self.u["e"].id, self.u["f"].id) # does not wait for the load
+            self.assertIs(graph.get_follow_graph(), g)
+            reloader = graph._reloader
+            release.set()
+            reloader.join(5)
+
+        self.assertIs(graph.get_follow_graph(), fresh)
+        self.assertEqual(fresh.following(self.u["e"].id), self.ids("f"))
+
+    def test_newer_users(self):
+        """ Edges of users created after the id range was read still load """
+        newest = self.u["f"].id
+        g = graph.FollowGraph(newest - 1, [(self.u["a"].id, newest), (newest, self.u["a"].id)])
+
+        self.assertEqual(g.following(newest), self.ids("a"))
+        self.assertEqual(g.followers(newest), self.ids("a"))
+
+    def test_profile(self):
+        """ The profile shows mutuals, followers you know, and suggestions on your own page """
+        self.client.login(username="c", password="test")
+
+        response = self.client.get("/profile/a")
+        self.assertEqual(response.context["mutual_count"], 1)
+        self.assertEqual(response.context["known_followers"], ["b"])
+        self.assertContains(response, 'id="known-followers"')
+
+        response = self.client.get("/profile/c")
+        self.assertIn("e", response.context["suggestions"])
+
+    def test_api(self):
+        """ The graph endpoint answers by username, 404 for unknown users """
+        body = self.client.get("/api/v1/users/a/graph").json()
+
+        self.assertEqual(body["following"], 2)
+        self.assertEqual(body["mutuals"], {"count": 1, "results": ["b"]})
+        self.assertEqual(body["followers_of_followers"], [{"username": "f", "followers": 1}])
+        self.assertEqual(body["suggestions"][0], {"username": "e", "followed_by": 2})
+        self.assertEqual(self.client.get("/api/v1/users/nobody/graph").status_code, 404)
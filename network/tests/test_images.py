@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from PIL import Image
+from network.models import *
+from network.images import process_profile_image, thumbnail_name
+from network.storage import ContentAddressedStorage, is_content_addressed
+from network.templatetags.avatars import avatar_url
+from network.views import media
+
+class TestImages(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        os.makedirs(os.path.join(self.media, "profile_pics"))
+        shutil.copy(os.path.join(settings.MEDIA_ROOT, 'tests', 'test.jpg'),
+                    os.path.join(self.media, "profile_pics", "test.jpg"))
+        override = override_settings(MEDIA_ROOT=self.media, THUMBNAIL_SIZES=(64, 128))
+        override.enable()
+        self.addCleanup(override.disable)
+
+        cache.clear()
+        self.user = User.objects.create_user(username="test", password="test")
+        self.profile = Profile.objects.create(user=self.user, image="profile_pics/test.jpg")
+
+    def test_original_until_processed(self):
+        """ Before processing, avatars fall back to the original upload """
+        self.assertEqual(avatar_url(self.user, 100), self.profile.image.url)
+
+    def test_thumbnails_built(self):
+        """ Processing writes square, metadata-free WebP thumbnails and templates pick them """
+        avatar_url(self.user, 100) # caches the original's
+        process_profile_image(self.profile.pk)
+        profile = Profile.objects.get(pk=self.profile.pk)
+
+        self.assertTrue(profile.thumbnails_ready)
+        for size in (64, 128):
+            with default_storage.open(thumbnail_name(profile.image.name, size)) as f:
+                thumb = Image.open(f)
+                self.assertEqual(thumb.format, "WEBP")
+                self.assertEqual(thumb.size, (size, size))
+                self.assertNotIn("exif", thumb.info)
+        self.assertTrue(avatar_url(User.objects.get(pk=self.user.pk), 100).endswith("test_128.webp"))
+
+    def test_gc_media_rehash_and_delete_orphans(self):
+        """ gc_media --rehash moves legacy uploads to hashed names and drops what nothing references """
+        orphan = os.path.join(self.media, "profile_pics", "orphan.jpg")
+        open(orphan, "wb").close()
+
+        call_command("gc_media", rehash=True, grace=0, stdout=StringIO())
+        profile = Profile.objects.get(pk=self.profile.pk)
+
+        self.assertRegex(profile.image.name, r"^profile_pics/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$")
+        self.assertTrue(os.path.exists(profile.image.path))
+        self.assertFalse(os.path.exists(orphan))
+        self.assertFalse(os.path.exists(os.path.join(self.media, "profile_pics", "test.jpg")))
+
+    def test_hashed_media_cached_forever(self):
+        """ Content-addressed media is served with an immutable Cache-Control """
+        call_command("gc_media", rehash=True, grace=0, stdout=StringIO())
+        name = Profile.objects.get(pk=self.profile.pk).image.name
+
+        response = media(RequestFactory().get(settings.MEDIA_URL + name), name)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("immutable", response["Cache-Control"])
+
+class TestContentAddressedStorage(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.storage = ContentAddressedStorage(location=self.root)
+
+    def test_same_bytes_saved_once(self):
+        """ A second save of the same bytes returns the stored name, even when it raced the first """
+        name = self.storage.save("profile_pics/a.jpg", ContentFile(b"jpeg"))
+        self.assertTrue(is_content_addressed(name))
+
+        with mock.patch.object(ContentAddressedStorage, "exists", return_value=False):
+            again = self.storage.save("profile_pics/b.JPG", ContentFile(b"jpeg"))
+        self.assertEqual(again, name)
+        self.assertEqual(os.listdir(os.path.dirname(self.storage.path(name))), [os.path.basename(name)])
+
+    def test_reuse_restarts_grace_period(self):
+        """ Saving bytes already stored touches the file, so gc_media's grace period covers it """
+        name = self.storage.save("profile_pics/a.jpg", ContentFile(b"jpeg"))
+        path = self.storage.path(name)
+        os.utime(path, (0, 0))
+        self.storage.save("profile_pics/b.jpg", ContentFile(b"jpeg"))
+        self.assertGreater(os.path.getmtime(path), time.time() - 60)
+
+        os.utime(path, (0, 0))
+        with mock.patch.object(ContentAddressedStorage, "exists", return_value=False):
+            self.storage.save("profile_pics/c.jpg", ContentFile(b"jpeg"))
+        self.assertGreater(os.path.getmtime(path), time.time() - 60)
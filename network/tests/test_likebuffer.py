@@ -0,0 +1,95 @@
+import json
+from unittest import mock
+from django.test import TestCase, Client, override_settings
+from network.models import *
+from network.likebuffer import LikeBuffer
+from network import likebuffer
+
+class TestLikeBuffer(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="test", password="test")
+        self.other = User.objects.create_user(username="other", password="other")
+        self.post = Post.objects.create(created_by=self.user, content="test")
+        self.buffer = LikeBuffer(interval=3600) # never fires on its own during a test
+
+    def tearDown(self):
+        self.buffer.flush()
+
+    def test_toggle_is_buffered_until_flush(self):
+        """ A toggle returns an optimistic count but writes nothing until flush """
+        liked, count = self.buffer.toggle(self.post.id, self.user.id, 0)
+
+        self.assertTrue(liked)
+        self.assertEqual(count, 1)
+        self.assertEqual(self.post.liker.count(), 0)
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.post.liker.count(), 1)
+        self.assertEqual(Post.objects.get(id=self.post.id).like_count, 1)
+
+    def test_toggles_coalesce(self):
+        """ Like + unlike by the same user cancel out before reaching the db """
+        self.buffer.toggle(self.post.id, self.user.id, 0)
+        liked, count = self.buffer.toggle(self.post.id, self.user.id, 0)
+        self.buffer.toggle(self.post.id, self.other.id, 0)
+
+        self.assertFalse(liked)
+        self.assertEqual(count, 0)
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(list(self.post.liker.all()), [self.other])
+
+    def test_failed_flush_requeued(self):
+        """ A batch that fails to write keeps its optimistic counts and is flushed again later """
+        self.buffer.toggle(self.post.id, self.user.id, 0)
+        with mock.patch("network.likebuffer.apply_likes", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.buffer.flush()
+
+        self.assertIsNotNone(self.buffer.timer)
+        self.assertEqual(self.buffer.toggle(self.post.id, self.other.id, 0), (True, 2))
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(Post.objects.get(id=self.post.id).like_count, 2)
+
+    def test_toggle_during_flush(self):
+        """ A click while a batch is being written starts from that batch, not the uncommitted db """
+        from network.likes import apply_likes
+        self.buffer.toggle(self.post.id, self.user.id, 0)
+        clicked = []
+        def write(changes):
+            # The unlike arrives before the like is committed
+            clicked.append(self.buffer.toggle(self.post.id, self.user.id, 0))
+            apply_likes(changes)
+
+        with mock.patch("network.likebuffer.apply_likes", side_effect=write):
+            self.buffer.flush()
+
+        self.assertEqual(clicked, [(False, 0)])
+        self.assertEqual(self.post.liker.count(), 1)
+        self.assertEqual(self.buffer.toggle(self.post.id, self.other.id, 1), (True, 1))
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(list(self.post.liker.all()), [self.other])
+        self.assertEqual(Post.objects.get(id=self.post.id).like_count, 1)
+
+    def test_flush_is_idempotent(self):
+        """ Replaying a batch leaves the same rows and count """
+        from network.likes import apply_likes
+        apply_likes({(self.user.id, self.post.id): True, (self.other.id, self.post.id): True})
+        apply_likes({(self.user.id, self.post.id): True, (self.other.id, self.post.id): True})
+
+        self.assertEqual(self.post.liker.count(), 2)
+        self.assertEqual(Post.objects.get(id=self.post.id).like_count, 2)
+
+    @override_settings(LIKE_WRITE_BEHIND=True)
+    def test_like_endpoint_uses_buffer(self):
+        """ With LIKE_WRITE_BEHIND the endpoint answers from the buffer """
+        likebuffer._buffer = self.buffer
+        self.addCleanup(setattr, likebuffer, "_buffer", None)
+        c = Client()
+        c.login(username="other", password="other")
+
+        response = c.put('/post', json.dumps({"clicked": True, "post_id": self.post.id}))
+
+        self.assertEqual(response.json()["likes_number"], "1")
+        self.assertEqual(self.post.liker.count(), 0)
+        self.buffer.flush()
+        self.assertEqual(self.post.liker.count(), 1)
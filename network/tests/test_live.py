@@ -0,0 +1,98 @@
+import asyncio
+from unittest import mock
+from django.conf import settings
+from django.test import TestCase
+from network.models import *
+from network.live import LiveHub, Subscriber, live_app
+
+class TestLiveHub(TestCase):
+    def test_coalesced_per_tick(self):
+        """ A tick keeps only the latest count per post, and nothing is kept without subscribers """
+        hub = LiveHub(1)
+        hub.publish_like(1, 5)
+        self.assertIsNone(hub.tick())
+
+        hub.subscribers = 1
+        hub.publish_like(1, 5)
+        hub.publish_like(1, 6)
+        hub.publish_post(10, 2)
+        tick = hub.tick()
+
+        self.assertEqual(tick.likes, {1: 6})
+        self.assertEqual(tick.posts, [(10, 2)])
+        self.assertIsNone(hub.tick())
+
+    def test_subscriber_filters(self):
+        """ Subscribers get counts of the posts on their page and new posts of their feed """
+        hub = LiveHub(1)
+        hub.subscribers = 1
+        hub.publish_like(1, 3)
+        hub.publish_like(2, 4)
+        hub.publish_post(10, 7)
+        hub.publish_post(11, 8)
+        hub.publish_post(12, 9) # the viewer's own
+        ticks = [hub.tick()]
+
+        following = Subscriber(9, {7}, {2}).events(ticks)
+        everything = Subscriber(9, None, set()).events(ticks)
+
+        self.assertEqual(following, 'event: likes\ndata: {"2": 4}\n\nevent: posts\ndata: {"new": 1}\n\n')
+        self.assertEqual(everything, 'event: posts\ndata: {"new": 2}\n\n')
+
+class TestLiveStream(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="test", password="test")
+        self.author = User.objects.create_user(username="author", password="test")
+        UserFollowing.objects.create(user_id=self.user, following_user_id=self.author)
+        self.post = Post.objects.create(created_by=self.author, content="content")
+        self.client.login(username="test", password="test")
+        self.hub = LiveHub(60)
+        patcher = mock.patch("network.live.hub", self.hub)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def open(self, query, cookie=True):
+        """ Run /live until the first event arrives -> (status, body) """
+        sent = []
+        arrived = asyncio.Event()
+        closed = asyncio.Event()
+
+        async def receive():
+            await closed.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+            if b"event:" in message.get("body", b""):
+                arrived.set()
+
+        headers = [(b"cookie", f"{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}".encode())] if cookie else []
+        scope = {"type": "http", "path": "/live", "query_string": query.encode(), "headers": headers}
+        task = asyncio.ensure_future(live_app(None)(scope, receive, send))
+        while not self.hub.subscribers and not task.done():
+            await asyncio.sleep(0.01)
+        if not task.done():
+            self.hub.publish_like(self.post.id, 7)
+            self.hub.publish_post(self.post.id + 1, self.author.id)
+            self.hub.publish_post(self.post.id + 2, self.user.id)
+            self.hub.notify()
+            await asyncio.wait_for(arrived.wait(), 5)
+            closed.set()
+            await task
+        if self.hub.task:
+            self.hub.task.cancel()
+        return sent[0]["status"], b"".join(m.get("body", b"") for m in sent[1:]).decode()
+
+    async def test_stream(self):
+        """ The following feed gets its posts' like counts and notices of followed authors' posts """
+        status, body = await self.open(f"feed=following&posts={self.post.id}")
+
+        self.assertEqual(status, 200)
+        self.assertIn(f'event: likes\ndata: {{"{self.post.id}": 7}}\n\n', body)
+        self.assertIn('event: posts\ndata: {"new": 1}\n\n', body)
+
+    async def test_following_needs_login(self):
+        """ Anonymous users can't follow the following feed """
+        status, body = await self.open("feed=following", cookie=False)
+
+        self.assertEqual(status, 403)
@@ -0,0 +1,88 @@
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory, override_settings
+from network.models import *
+from network.metrics import Histogram, PerformanceMiddleware
+
+def twice(request):
+    """ A view with an N+1 in miniature """
+    for _ in range(2):
+        list(User.objects.filter(username="nobody"))
+    return HttpResponse()
+
+@override_settings(METRICS_SAMPLE_RATE=1, METRICS_SLOW_MS=60000)
+class TestPerformanceMiddleware(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="test", password="test")
+        Post.objects.create(created_by=self.user, content="content")
+
+    def test_server_timing(self):
+        """ Sampled requests break their time down into db, template and the rest """
+        response = self.client.get("/")
+        timing = response["Server-Timing"]
+
+        for part in ("total;dur=", "db;dur=", "queries", "tpl;dur=", "app;dur="):
+            self.assertIn(part, timing)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled(self):
+        """ Other requests only get their total """
+        response = self.client.get("/")
+
+        self.assertRegex(response["Server-Timing"], r"^total;dur=[\d.]+$")
+
+    def test_duplicates(self):
+        """ A query run again with the same parameters counts as a duplicate """
+        response = PerformanceMiddleware(twice)(RequestFactory().get("/"))
+
+        self.assertIn('desc="2 queries, 1 duplicates"', response["Server-Timing"])
+
+    @override_settings(METRICS_SLOW_MS=0)
+    def test_slow_log(self):
+        """ Slow requests are logged as JSON with their SQL """
+        with self.assertLogs("network.slow", "WARNING") as logs:
+            PerformanceMiddleware(twice)(RequestFactory().get("/slow"))
+        entry = json.loads(logs.records[0].getMessage())
+
+        self.assertEqual(entry["path"], "/slow")
+        self.assertEqual(entry["queries"], 2)
+        self.assertIn("network_user", entry["slowest_sql"][0]["sql"])
+        self.assertEqual(entry["repeated_sql"][0]["times"], 2)
+
+    async def test_async(self):
+        """ Under ASGI the middleware stays async and sees queries made in sync_to_async threads """
+        async def view(request):
+            await sync_to_async(twice)(request)
+            return HttpResponse()
+        middleware = PerformanceMiddleware(view)
+
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = await middleware(RequestFactory().get("/"))
+        self.assertIn("2 queries", response["Server-Timing"])
+
+    def test_metrics_endpoint(self):
+        """ Per-view histograms and card cache counters, for staff only """
+        self.client.get("/")
+        self.client.login(username="test", password="test")
+        self.assertEqual(self.client.get("/stats/metrics").status_code, 403)
+
+        User.objects.filter(id=self.user.id).update(is_staff=True)
+        body = self.client.get("/stats/metrics").json()
+
+        self.assertGreaterEqual(body["views"]["index"]["wall_ms"]["count"], 1)
+        self.assertGreaterEqual(body["views"]["index"]["queries"]["count"], 1)
+        self.assertIn("hit_rate", body["cards"])
+
+class TestHistogram(TestCase):
+    def test_quantiles(self):
+        """ Quantiles are the upper bound of their bucket """
+        histogram = Histogram()
+        for value in [0.5] * 90 + [30] * 9 + [9000]:
+            histogram.add(value)
+
+        self.assertEqual(histogram.quantile(0.5), 1)
+        self.assertEqual(histogram.quantile(0.95), 50)
+        self.assertIsNone(histogram.quantile(1))
+        self.assertEqual(histogram.snapshot()["buckets"]["50"], 9)
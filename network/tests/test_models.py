@@ -1,5 +1,6 @@
 from django.test import TestCase
 from network.models import *
+from network.profiles import profile_of
 
 class TestModels(TestCase):
     def setUp(self):
@@ -8,13 +9,17 @@ class TestModels(TestCase):
         self.post1 = Post.objects.create(created_by=self.user1, content="test1")
         self.post2 = Post.objects.create(created_by=self.user2, content="test2")
 
-    def test_auto_profile_create(self):
-        """ Create new user -> create new profile test """
+    def test_lazy_profile_create(self):
+        """ Create new user -> no profile until one is needed, e.g. by a follow """
+        self.assertEqual(Profile.objects.count(), 0)
+        UserFollowing.objects.create(user_id=self.user1, following_user_id=self.user2)
+
         self.assertEqual(Profile.objects.count(), 2)
+        self.assertEqual(Profile.objects.get(user=self.user2).follower_count, 1)
 
     def test_default_image_create(self):
         """ New profile created -> create default image test """
-        image_path = Profile.objects.first().image.path[-11:]
+        image_path = profile_of(self.user1).image.path[-11:]
         self.assertEqual(image_path, "default.jpg")
 
     def test_likes_a_post(self):
@@ -32,6 +37,13 @@ class TestModels(TestCase):
         Post.objects.first().liker.remove(self.user1)
         self.assertEquals(Post.objects.first().liker.count(), 0)
 
+    def test_like_count_follows_liker(self):
+        """ Adding / removing likers outside the like endpoint keeps like_count right """
+        self.post1.liker.add(self.user1, self.user2)
+        self.assertEqual(Post.objects.get(id=self.post1.id).like_count, 2)
+        self.user1.like.clear()
+        self.assertEqual(Post.objects.get(id=self.post1.id).like_count, 1)
+
     def test_user_follow_method(self):
         """ user1 can follows user2 """
         UserFollowing.objects.create(user_id=self.user1, following_user_id=self.user2)
@@ -0,0 +1,53 @@
+import datetime
+from django.test import TestCase
+from network.models import *
+from network.pagination import *
+
+class TestCursorPagination(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="test", password="test")
+        for i in range(25):
+            Post.objects.create(created_by=self.user, content=str(i))
+        self.paginator = CursorPaginator(Post.objects.all(), 10)
+
+    def test_first_page_newest_first(self):
+        """ First page holds the 10 most recent posts """
+        page = self.paginator.get_page(None)
+
+        self.assertEqual([p.content for p in page], [str(i) for i in range(24, 14, -1)])
+        self.assertTrue(page.has_next)
+        self.assertFalse(page.has_previous)
+
+    def test_walk_forward_and_back(self):
+        """ next_cursor / previous_cursor move one page at a time """
+        first = self.paginator.get_page(None)
+        second = self.paginator.get_page(first.next_cursor)
+        third = self.paginator.get_page(second.next_cursor)
+        back = self.paginator.get_page(third.previous_cursor)
+
+        self.assertEqual([p.content for p in second], [str(i) for i in range(14, 4, -1)])
+        self.assertEqual([p.content for p in third], [str(i) for i in range(4, -1, -1)])
+        self.assertFalse(third.has_next)
+        self.assertEqual([p.id for p in back], [p.id for p in second])
+        self.assertTrue(back.has_previous)
+
+    def test_invalid_cursor_gives_first_page(self):
+        """ A tampered cursor falls back to the first page """
+        page = self.paginator.get_page("not-a-cursor")
+
+        self.assertEqual(page[0].content, "24")
+
+    def test_cursor_past_the_end_gives_first_page(self):
+        """ A cursor older than the last post falls back to the first page """
+        oldest = Post.objects.order_by("created_on").first()
+        page = self.paginator.get_page(encode_cursor(oldest.created_on - datetime.timedelta(days=3650), 0))
+
+        self.assertEqual(page[0].content, "24")
+        self.assertFalse(page.has_previous)
+        self.assertIsNone(page.previous_cursor)
+
+    def test_single_query_no_count(self):
+        """ A page is one query, no COUNT(*) """
+        cursor = self.paginator.get_page(None).next_cursor
+        with self.assertNumQueries(1):
+            list(self.paginator.get_page(cursor))
@@ -0,0 +1,52 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import TestCase
+from network.models import *
+from network.feeds import feed_posts
+from network.templatetags.post_cards import stats
+
+CARD = Template("{% load post_cards %}{% post_card post viewer %}")
+
+def post_card(post, viewer):
+    return CARD.render(Context({"post": post, "viewer": viewer}))
+
+class TestPostCards(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author", password="author")
+        self.viewer = User.objects.create_user(username="viewer", password="viewer")
+        self.post = Post.objects.create(created_by=self.author, content="hello")
+
+    def load(self, viewer):
+        return feed_posts(viewer).get(pk=self.post.pk)
+
+    def test_second_render_is_a_hit(self):
+        """ The same card for another viewer comes from the cache """
+        hits = stats.snapshot()["hits"]
+        post_card(self.load(self.author), self.author)
+        post_card(self.load(self.viewer), self.viewer)
+
+        self.assertEqual(stats.snapshot()["hits"], hits + 1)
+
+    def test_per_viewer_parts(self):
+        """ Only the author gets Edit, the like button reflects the viewer """
+        self.post.liker.add(self.viewer)
+        author_html = post_card(self.load(self.author), self.author)
+        viewer_html = post_card(self.load(self.viewer), self.viewer)
+        anonymous_html = post_card(self.load(AnonymousUser()), AnonymousUser())
+
+        self.assertIn('id="editbtn"', author_html)
+        self.assertNotIn('id="editbtn"', viewer_html)
+        self.assertIn('class="fa fa-heart"', viewer_html)
+        self.assertIn('class="far fa-heart"', author_html)
+        self.assertNotIn('likebtn', anonymous_html)
+
+    def test_version_changes_with_content_and_likes(self):
+        """ Editing or liking a post renders a fresh card """
+        post_card(self.load(self.viewer), self.viewer)
+        Post.objects.filter(pk=self.post.pk).update(content="edited")
+        self.assertIn("edited", post_card(self.load(self.viewer), self.viewer))
+
+        self.post.liker.add(self.author)
+        self.assertIn(f'<span id="likes{self.post.pk}">1</span>', post_card(self.load(self.viewer), self.viewer))
@@ -0,0 +1,56 @@
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import TestCase
+from network.models import *
+from network.feeds import load_page
+from network.pagination import CursorPaginator
+from network.profiles import avatars, profile_of
+from network.templatetags.avatars import avatar_url
+
+class TestProfiles(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="test", password="test")
+        self.authors = [User.objects.create_user(username=f"author{n}") for n in range(5)]
+        Profile.objects.create(user=self.authors[0], image="profile_pics/custom.jpg")
+        for author in self.authors:
+            Post.objects.create(created_by=author, content="hello")
+
+    def test_default_without_db(self):
+        """ Users without a profile get the default picture, from the cache after the first lookup """
+        self.assertTrue(avatar_url(self.user, 96).endswith("default.jpg"))
+
+        with self.assertNumQueries(0):
+            self.assertTrue(avatar_url(User(pk=self.user.pk), 96).endswith("default.jpg"))
+
+    def test_page_avatars(self):
+        """ A page's authors are looked up in one query, however many there are, and none once cached """
+        with self.assertNumQueries(1):
+            found = avatars(author.pk for author in self.authors)
+        self.assertEqual(found[self.authors[0].pk], ("profile_pics/custom.jpg", False))
+        self.assertEqual(found[self.authors[1].pk], ("default.jpg", False))
+
+        cache.clear()
+        posts = Post.objects.only("id", "created_on")
+        with self.assertNumQueries(3): # keyset read, posts, avatars
+            page = load_page(CursorPaginator(posts, 10).get_page(None), self.user)
+            for post in page.object_list:
+                render_to_string("network/post_card_header.html", {"post": post})
+
+    def test_new_picture(self):
+        """ Saving a profile drops its cached avatar """
+        avatar_url(self.user, 96)
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = profile_of(self.user)
+            profile.image = "profile_pics/new.jpg"
+            profile.save()
+
+        self.assertTrue(avatar_url(User.objects.get(pk=self.user.pk), 96).endswith("profile_pics/new.jpg"))
+
+    def test_profile_page(self):
+        """ Viewing a profile that was never needed shows zero counts without creating it """
+        self.client.login(username="test", password="test")
+        response = self.client.get(f"/profile/{self.authors[1].username}")
+
+        self.assertContains(response, "0 followers")
+        self.assertFalse(Profile.objects.filter(user__in=[self.user, self.authors[1]]).exists())
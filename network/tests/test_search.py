@@ -0,0 +1,103 @@
+import json
+from django.test import TestCase, override_settings
+from network.models import *
+from network import search
+
+class TestSearch(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="test", password="test")
+        self.best = Post.objects.create(created_by=self.user, content="apple apple banana")
+        self.other = Post.objects.create(created_by=self.user, content="apple cherry")
+        self.none = Post.objects.create(created_by=self.user, content="cherry")
+
+    def ids(self, query, page=1, per_page=10):
+        return [post.id for post in search.find(query, page, per_page)]
+
+    def test_ranked(self):
+        """ Posts matching every word come back, the better match first """
+        self.assertEqual(self.ids("apple"), [self.best.id, self.other.id])
+        self.assertEqual(self.ids("apple cherry"), [self.other.id])
+        self.assertEqual(self.ids("durian"), [])
+        self.assertEqual(self.ids("  !! "), [])
+
+    def test_newest_ranked(self):
+        """ Only the newest matches are ranked """
+        with override_settings(SEARCH_MAX_RANKED=1):
+            self.assertEqual(self.ids("apple"), [self.other.id])
+
+    def test_prefix(self):
+        """ The last word matches as a prefix once it has 3 letters """
+        self.assertEqual(self.ids("banan"), [self.best.id])
+        self.assertEqual(self.ids("ba"), [])
+
+    def test_pages(self):
+        """ Pages are numbered and know whether another follows """
+        first = search.find("apple", 1, 1)
+        second = search.find("apple", 2, 1)
+
+        self.assertTrue(first.has_next)
+        self.assertFalse(first.has_previous)
+        self.assertEqual([post.id for post in second], [self.other.id])
+        self.assertFalse(second.has_next)
+        self.assertEqual(second.previous_page_number(), 1)
+
+    def test_edit_and_delete(self):
+        """ Edits are reindexed and deleted posts unindexed """
+        self.none.content = "durian"
+        self.none.save(update_fields=["content"])
+        self.other.delete()
+
+        self.assertEqual(self.ids("durian"), [self.none.id])
+        self.assertEqual(self.ids("cherry"), [])
+
+    def test_batch_edit(self):
+        """ Edits through /post/batch are reindexed too """
+        self.client.login(username="test", password="test")
+        self.client.post("/post/batch", json.dumps({"actions": [{"post_id": self.none.id, "editedpost": "durian"}]}),
+                         content_type="application/json")
+
+        self.assertEqual(self.ids("durian"), [self.none.id])
+
+    def test_rebuild(self):
+        """ A rebuild indexes every post """
+        self.assertEqual(search.rebuild(), 3)
+        self.assertEqual(set(self.ids("cherry")), {self.other.id, self.none.id})
+
+@override_settings(SEARCH_BACKEND="terms")
+class TestTermSearch(TestSearch):
+    """ The same, over the PostTerm index other databases use """
+    def setUp(self):
+        super().setUp()
+        search.rebuild()
+
+    def test_rebuild(self):
+        """ A rebuild indexes every post """
+        self.assertEqual(search.rebuild(), 3)
+        self.assertEqual(set(self.ids("cherry")), {self.other.id, self.none.id})
+        self.assertEqual(PostTerm.objects.get(post=self.best, term="apple").frequency, 2)
+
+    def test_prefix(self):
+        """ Whole words only """
+        self.assertEqual(self.ids("banana"), [self.best.id])
+        self.assertEqual(self.ids("banan"), [])
+
+class TestSearchView(TestCase):
+    def test_GET_search(self):
+        """ The search page shows matching posts as cards """
+        user = User.objects.create_user(username="test", password="test")
+        post = Post.objects.create(created_by=user, content="needle in a haystack")
+        Post.objects.create(created_by=user, content="hay")
+
+        response = self.client.get("/search", {"q": "needle"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p.id for p in response.context["page_obj"]], [post.id])
+        self.assertContains(response, "needle in a haystack")
+        self.assertNotContains(response, ">hay<")
+
+    def test_GET_search_empty(self):
+        """ Without a query there are no results to show """
+        response = self.client.get("/search")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context["page_obj"])
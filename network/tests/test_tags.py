@@ -0,0 +1,132 @@
+import datetime
+import json
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from network.models import *
+from network import tags
+
+class TestTags(TestCase):
+    def setUp(self):
+        cache.delete(tags.ROLLED_KEY)
+        self.user = User.objects.create_user(username="test", password="test")
+        self.bob = User.objects.create_user(username="bob", password="test")
+
+    def test_extract(self):
+        """ #tags are lower-cased, @mentions kept as written; emails and ## are not tags """
+        self.assertEqual(tags.extract("#Django and #django, @bob! mail a@b.com ##x #"),
+                         ({"django"}, {"bob"}))
+
+    def test_tagged_on_save(self):
+        """ Saving a post stores its tags and mentions; an edit replaces them """
+        post = Post.objects.create(created_by=self.user, content="#one #two hi @bob @nobody")
+
+        self.assertEqual(set(post.tags.values_list("tag__name", flat=True)), {"one", "two"})
+        self.assertEqual(list(post.mentions.values_list("user", flat=True)), [self.bob.id])
+
+        post.content = "#two #three"
+        post.save(update_fields=["content"])
+
+        self.assertEqual(set(post.tags.values_list("tag__name", flat=True)), {"two", "three"})
+        self.assertFalse(post.mentions.exists())
+        self.assertEqual(tags.trending(), [("three", 1), ("two", 1)])
+
+    def test_trending(self):
+        """ Posts count towards their tags until their bucket leaves the window """
+        Post.objects.create(created_by=self.user, content="#a #b")
+        Post.objects.create(created_by=self.user, content="#a")
+        deleted = Post.objects.create(created_by=self.user, content="#b #c")
+        deleted.delete()
+
+        self.assertEqual(tags.trending(), [("a", 2), ("b", 1)])
+        self.assertEqual(tags.trending(1), [("a", 2)])
+
+        later = timezone.now() + datetime.timedelta(hours=1)
+        with mock.patch("django.utils.timezone.now", return_value=later):
+            Post.objects.create(created_by=self.user, content="#b")
+            self.assertEqual(tags.trending(), [("b", 1)])
+        self.assertEqual(TagBucket.objects.count(), 1)
+
+    def test_old_posts_not_counted(self):
+        """ Tagging a post from before the window leaves the counts alone """
+        post = Post.objects.create(created_by=self.user, content="old")
+        Post.objects.filter(id=post.id).update(created_on=timezone.now() - datetime.timedelta(days=1))
+        post.refresh_from_db()
+        post.content = "#old"
+        post.save()
+
+        self.assertEqual(tags.trending(), [])
+        self.assertEqual(post.tags.count(), 1)
+
+    def test_trending_reads_no_posts(self):
+        """ Top tags are read from the counters, in one query once rolled """
+        Post.objects.create(created_by=self.user, content="#a")
+        tags.trending()
+
+        with CaptureQueriesContext(connection) as queries:
+            tags.trending()
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("network_post", queries[0]["sql"].replace("network_posttag", ""))
+
+    def test_batch_edit(self):
+        """ Edits through /post/batch are retagged """
+        post = Post.objects.create(created_by=self.user, content="hi")
+        self.client.login(username="test", password="test")
+        self.client.post("/post/batch", json.dumps({"actions": [{"post_id": post.id, "editedpost": "#new"}]}),
+                         content_type="application/json")
+
+        self.assertEqual(list(post.tags.values_list("tag__name", flat=True)), ["new"])
+
+    def test_batch_edit_queries(self):
+        """ Retagging a batch does not load each post's created_on on its own """
+        posts = [Post.objects.create(created_by=self.user, content="hi") for _ in range(5)]
+        self.client.login(username="test", password="test")
+        actions = [{"post_id": post.id, "editedpost": f"#t{post.id}"} for post in posts]
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post("/post/batch", json.dumps({"actions": actions}), content_type="application/json")
+        deferred = [q for q in queries if q["sql"].startswith('SELECT "network_post"."id", "network_post"."created_on" FROM')]
+        self.assertEqual(deferred, [])
+
+    def test_rebuild(self):
+        """ A rebuild finds the tags of posts bulk inserts skipped """
+        Post.objects.bulk_create([Post(created_by=self.user, content="#x", created_on=timezone.now())] * 2)
+
+        self.assertEqual(tags.rebuild(), 2)
+        self.assertEqual(tags.trending(), [("x", 2)])
+
+    def test_undated_post(self):
+        """ Legacy posts without a created_on are edited and rebuilt without being tagged """
+        post = Post.objects.create(created_by=self.user, content="old")
+        Post.objects.filter(pk=post.pk).update(created_on=None)
+        post.refresh_from_db()
+        post.content = "#x @bob"
+        post.save(update_fields=["content"])
+        tags.rebuild()
+
+        self.assertFalse(PostTag.objects.exists() or Mention.objects.exists())
+
+class TestTagApi(TestCase):
+    def setUp(self):
+        cache.delete(tags.ROLLED_KEY)
+        self.user = User.objects.create_user(username="test", password="test")
+        self.posts = [Post.objects.create(created_by=self.user, content=f"post {i} #Tag") for i in range(12)]
+        Post.objects.create(created_by=self.user, content="#other")
+
+    def test_tag_feed(self):
+        """ Posts with a tag, newest first, paged by cursor; 404 for an unused tag """
+        first = self.client.get("/api/v1/tags/tag/posts").json()
+        second = self.client.get(first["next"]).json()
+
+        ids = [row["id"] for row in first["results"] + second["results"]]
+        self.assertEqual(ids, [p.id for p in reversed(self.posts)])
+        self.assertEqual(self.client.get("/api/v1/tags/nope/posts").status_code, 404)
+
+    def test_trending(self):
+        """ Top tags of the window with their post counts """
+        response = self.client.get("/api/v1/tags/trending?limit=1").json()
+
+        self.assertEqual(response, {"window": 3600, "results": [{"tag": "tag", "posts": 12}]})
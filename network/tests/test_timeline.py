@@ -0,0 +1,57 @@
+from unittest import mock
+from django.test import TestCase, override_settings
+from network.models import *
+from network.timeline import *
+
+class TestTimeline(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username="reader", password="reader")
+        self.author = User.objects.create_user(username="author", password="author")
+
+    def test_post_fans_out_to_followers(self):
+        """ A new post lands in every follower's timeline """
+        UserFollowing.objects.create(user_id=self.reader, following_user_id=self.author)
+        post = Post.objects.create(created_by=self.author, content="hello")
+
+        self.assertTrue(TimelineEntry.objects.filter(owner=self.reader, post=post).exists())
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """ Following copies recent posts in, unfollowing removes them """
+        Post.objects.create(created_by=self.author, content="old")
+        f = UserFollowing.objects.create(user_id=self.reader, following_user_id=self.author)
+        self.assertEqual(self.reader.timeline.count(), 1)
+
+        f.delete()
+        self.assertEqual(self.reader.timeline.count(), 0)
+
+    def test_follow_skips_undated_posts(self):
+        """ Legacy posts without a created_on are left out of the backfill """
+        Post.objects.create(created_by=self.author, content="dated")
+        undated = Post.objects.create(created_by=self.author, content="undated")
+        Post.objects.filter(pk=undated.pk).update(created_on=None)
+        # SQLite's INSERT OR IGNORE would drop the NOT NULL violation that other databases raise
+        with mock.patch.object(TimelineEntry.objects, "bulk_create") as bulk_create:
+            backfill_follow(self.reader, self.author)
+
+        self.assertEqual([e.created_on is None for e in bulk_create.call_args[0][0]], [False])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_merged_on_read(self):
+        """ Authors over the fan-out limit are pulled at read time and merged by date """
+        other = User.objects.create_user(username="other", password="other")
+        fan = User.objects.create_user(username="fan", password="fan")
+        UserFollowing.objects.create(user_id=self.reader, following_user_id=self.author)
+        UserFollowing.objects.create(user_id=fan, following_user_id=self.author)
+        UserFollowing.objects.create(user_id=self.reader, following_user_id=other)
+
+        first = Post.objects.create(created_by=self.author, content="1")
+        second = Post.objects.create(created_by=other, content="2")
+        third = Post.objects.create(created_by=self.author, content="3")
+
+        self.assertTrue(Profile.objects.get(user=self.author).fanout_on_read)
+        self.assertFalse(TimelineEntry.objects.filter(post__created_by=self.author).exists())
+
+        page = TimelinePaginator(self.reader, 2).get_page(None)
+        rest = TimelinePaginator(self.reader, 2).get_page(page.next_cursor)
+        self.assertEqual([p.id for p in page], [third.id, second.id])
+        self.assertEqual([p.id for p in rest], [first.id])
@@ -31,4 +31,19 @@ class TestUrls(TestCase):
     def test_post_url_is_resolved(self):
         url = reverse('post')
         self.assertEquals(resolve(url).func, post)
-    
\ No newline at end of file
+
+    def test_card_cache_stats_url_is_resolved(self):
+        url = reverse('card_cache_stats')
+        self.assertEquals(resolve(url).func, card_cache_stats)
+
+    def test_post_batch_url_is_resolved(self):
+        url = reverse('post_batch')
+        self.assertEquals(resolve(url).func, post_batch)
+
+    def test_search_url_is_resolved(self):
+        url = reverse('search')
+        self.assertEquals(resolve(url).func, search)
+
+    def test_request_metrics_url_is_resolved(self):
+        url = reverse('request_metrics')
+        self.assertEquals(resolve(url).func, request_metrics)
@@ -1,14 +1,20 @@
 # Standard
+import hashlib
 import json
 import os
+from unittest import mock
 # Django
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.contrib import auth
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 # Local
 from network.models import *
 from network.forms import *
+from network.likes import Like, toggle_likes
 
 class TestViews(TestCase):
     """ 
@@ -179,7 +185,7 @@ class TestViews(TestCase):
         response = self.c.get('/')
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.context['page_obj'].paginator.num_pages, 1)
+        self.assertFalse(response.context['page_obj'].has_next)
 
     def test_index_2_pages(self):
         """ Make sure status code is correct and 2 pages are displayed """
@@ -189,7 +195,7 @@ class TestViews(TestCase):
         response = self.c.get('/')
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.context['page_obj'].paginator.num_pages, 2)
+        self.assertTrue(response.context['page_obj'].has_next)
 
 
     # 5. ==========Post view==========
@@ -226,6 +232,14 @@ class TestViews(TestCase):
         self.assertEqual(new_post.content, "new content")
         self.assertEqual(response.status_code, 201)
 
+    def test_PUT_missing_post(self):
+        """ Editing a post that does not exist -> 400 """
+        self.c.login(username="test", password="test")
+
+        response = self.c.put('/post', json.dumps({"post_id": 999, "clicked": True}))
+
+        self.assertEqual(response.status_code, 400)
+
     def test_POST_like_post(self):
         """ Test like a post """
         # Login user
@@ -242,6 +256,8 @@ class TestViews(TestCase):
         p_new = Post.objects.get(id=p_old.id)
 
         self.assertEqual(p_new.liker.count(), 1)
+        self.assertEqual(p_new.like_count, 1)
+        self.assertEqual(response.json()["likes_number"], "1")
         self.assertEqual(response.status_code, 201)
 
     def test_POST_unlike_post(self):
@@ -261,8 +277,81 @@ class TestViews(TestCase):
         p_new = Post.objects.get(id=p_old.id)
 
         self.assertEqual(p_new.liker.count(), 0)
+        self.assertEqual(p_new.like_count, 0)
         self.assertEqual(response.status_code, 201)
 
+
+    def test_POST_batch(self):
+        """ Likes and edits of several posts in one request, with per-item results """
+        self.c.login(username="test", password="test")
+        other = User.objects.create_user(username="other", password="other")
+        mine = Post.objects.create(created_by=self.user, content="content")
+        liked = Post.objects.create(created_by=other, content="content")
+        liked.liker.add(self.user)
+        theirs = Post.objects.create(created_by=other, content="content")
+
+        response = self.c.post('/post/batch', json.dumps({"actions": [
+            {"post_id": mine.id, "clicked": True, "editedpost": "new content"},
+            {"post_id": liked.id, "clicked": True},
+            {"post_id": theirs.id, "editedpost": "hijacked"},
+            {"post_id": 999, "clicked": True},
+        ]}), content_type="application/json")
+        results = response.json()["results"]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(results[0], {"post_id": mine.id, "liked": True, "likes_number": "1", "edited": True})
+        self.assertEqual(results[1], {"post_id": liked.id, "liked": False, "likes_number": "0", "edited": False})
+        self.assertIn("error", results[2])
+        self.assertIn("error", results[3])
+        self.assertEqual(Post.objects.get(id=mine.id).content, "new content")
+        self.assertEqual(Post.objects.get(id=theirs.id).content, "content")
+        self.assertEqual(Post.objects.get(id=mine.id).like_count, 1)
+        self.assertEqual(Post.objects.get(id=liked.id).like_count, 0)
+
+    def test_POST_batch_clicks_cancel_out(self):
+        """ Two clicks on one post in a batch leave the like as it was """
+        self.c.login(username="test", password="test")
+        p = Post.objects.create(created_by=self.user, content="content")
+
+        response = self.c.post('/post/batch', json.dumps({"actions": [
+            {"post_id": p.id, "clicked": True}, {"post_id": p.id, "clicked": True},
+        ]}), content_type="application/json")
+
+        self.assertEqual(response.json()["results"][0]["likes_number"], "0")
+        self.assertEqual(p.liker.count(), 0)
+
+    def test_POST_batch_concurrent_like(self):
+        """ A like another request inserted first is not counted twice """
+        p = Post.objects.create(created_by=self.user, content="content")
+        # The other request's toggle_like commits after this one's membership read
+        Like.objects.create(post_id=p.id, user_id=self.user.id)
+        Post.objects.filter(id=p.id).update(like_count=1)
+
+        with mock.patch.object(Like.objects, "filter", return_value=Like.objects.none()):
+            result = toggle_likes([p.id], self.user.id)
+
+        self.assertEqual(result[p.id], (True, 1))
+        self.assertEqual(Post.objects.get(id=p.id).like_count, 1)
+
+    def test_POST_batch_like_does_not_count(self):
+        """ Toggling a like in a batch moves the counter without reading the other likers """
+        p = Post.objects.create(created_by=self.user, content="content")
+        for i in range(3):
+            p.liker.add(User.objects.create_user(username=f"fan{i}", password="fan"))
+
+        with CaptureQueriesContext(connection) as queries:
+            result = toggle_likes([p.id], self.user.id)
+
+        self.assertEqual(result[p.id], (True, 4))
+        self.assertFalse([q for q in queries if "COUNT(" in q["sql"].upper()])
+
+    def test_POST_batch_bad_request(self):
+        """ A body without an actions list -> 400 """
+        self.c.login(username="test", password="test")
+
+        response = self.c.post('/post/batch', json.dumps({"post_id": 1}), content_type="application/json")
+
+        self.assertEqual(response.status_code, 400)
     
     # 6. ==========Profile view==========
     # User-profile view
@@ -288,7 +377,7 @@ class TestViews(TestCase):
 
         response = self.c.get(f'/profile/{self.user.username}')
 
-        self.assertEqual(response.context['page_obj'].paginator.num_pages, 1)
+        self.assertFalse(response.context['page_obj'].has_next)
 
     def test_user_profile_2_pages(self):
         """ Make sure status 2 pages of posts are displayed """
@@ -301,7 +390,7 @@ class TestViews(TestCase):
 
         response = self.c.get(f'/profile/{self.user.username}')
 
-        self.assertEqual(response.context['page_obj'].paginator.num_pages, 2)
+        self.assertTrue(response.context['page_obj'].has_next)
 
     def test_user_profile_show_only_users_posts(self):
         """ Make sure only posts created by the currently viewed user are visible """
@@ -369,6 +458,45 @@ class TestViews(TestCase):
 
         self.assertEqual(response.context["current_user"].following.count(), 3)
 
+    def test_user_profile_follow_unfollow(self):
+        """ Follow / unfollow through the profile page keeps counters and is_following right """
+        cache.clear()
+        self.c.login(username="test", password="test")
+        other = User.objects.create_user(username="other", password="other")
+
+        self.c.post(f'/profile/{other.username}', {"follow": "Follow"})
+        response = self.c.get(f'/profile/{other.username}')
+        self.assertTrue(response.context["is_following"])
+        self.assertEqual(response.context["profile_user"].profile.follower_count, 1)
+        self.assertEqual(Profile.objects.get(user=self.user).following_count, 1)
+
+        self.c.post(f'/profile/{other.username}', {"unfollow": "Following"})
+        response = self.c.get(f'/profile/{other.username}')
+        self.assertFalse(response.context["is_following"])
+        self.assertEqual(response.context["profile_user"].profile.follower_count, 0)
+        self.assertEqual(Profile.objects.get(user=self.user).following_count, 0)
+
+    def test_user_profile_follow_twice(self):
+        """ A follow or unfollow sent from a stale button is a no-op, not an error """
+        self.c.login(username="test", password="test")
+        other = User.objects.create_user(username="other", password="other")
+
+        self.assertEqual(self.c.post(f'/profile/{other.username}', {"unfollow": "Following"}).status_code, 302)
+        for _ in range(2):
+            self.assertEqual(self.c.post(f'/profile/{other.username}', {"follow": "Follow"}).status_code, 302)
+        self.assertEqual(UserFollowing.objects.filter(user_id=self.user).count(), 1)
+        self.assertEqual(Profile.objects.get(user=other).follower_count, 1)
+
+    def test_user_profile_follow_from_other_worker(self):
+        """ A follow this process did not see (no signal here) still shows on the profile """
+        self.c.login(username="test", password="test")
+        other = User.objects.create_user(username="other", password="other")
+        self.assertFalse(self.c.get(f'/profile/{other.username}').context["is_following"])
+
+        UserFollowing.objects.bulk_create([UserFollowing(user_id=self.user, following_user_id=other)])
+
+        self.assertTrue(self.c.get(f'/profile/{other.username}').context["is_following"])
+
     # Edit-profile view
     def test_edit_profile_login_required(self):
         """ Make sure login required restriction works -> redirect to login """
@@ -397,8 +525,9 @@ class TestViews(TestCase):
 
         # Open the image
         with open(test_img_path, "rb") as infile:
+            data = infile.read()
             # create SimpleUploadedFile object from the image
-            img_file = SimpleUploadedFile("test.jpg", infile.read())
+            img_file = SimpleUploadedFile("test.jpg", data)
  
             # Send the POST request
             response = self.c.post(f'/profile/{self.user.username}', {
@@ -411,15 +540,22 @@ class TestViews(TestCase):
         # Prepare image file path to comparison
         # 1. Normalize it
         new_img_path = os.path.normpath(new_user_profile.image.path)
-        # Get the last part of the path and discard django's additional chars
+        # Get the last part of the path: uploads are stored under their content hash
         img_name = os.path.basename(new_img_path)
 
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(img_name, "test.jpg")
+        self.assertEqual(img_name, hashlib.sha256(data).hexdigest() + ".jpg")
+
+        # Same bytes from another user -> same file, stored once
+        user_2 = User.objects.create_user(username="test_2", password="test_2")
+        self.c.login(username="test_2", password="test_2")
+        self.c.post(f'/profile/{user_2.username}', {"image": SimpleUploadedFile("copy.jpg", data)})
+        self.assertEqual(Profile.objects.get(user=user_2).image.name, new_user_profile.image.name)
 
         # Delete new image file
         if os.path.exists(new_img_path):
             os.remove(new_img_path)
+            os.rmdir(os.path.dirname(new_img_path))
 
 
     # 7. ==========Following view==========
@@ -453,7 +589,7 @@ class TestViews(TestCase):
 
         response = self.c.get('/following')
 
-        self.assertEqual(response.context['page_obj'].paginator.num_pages, 1)
+        self.assertFalse(response.context['page_obj'].has_next)
 
     def test_following_2_pages(self):
         """ Make sure status 2 pages of posts are displayed """
@@ -474,7 +610,7 @@ class TestViews(TestCase):
 
         response = self.c.get('/following')
 
-        self.assertEqual(response.context['page_obj'].paginator.num_pages, 2)
+        self.assertTrue(response.context['page_obj'].has_next)
 
     def test_following_show_only_users_posts(self):
         """ Make sure only posts created by the followed user are visible """
@@ -0,0 +1,90 @@
+import heapq
+from itertools import islice
+
+from django.conf import settings
+
+from .models import Post, Profile, TimelineEntry, UserFollowing
+from .pagination import CursorPaginator
+
+
+def fanout_limit():
+    return getattr(settings, "TIMELINE_FANOUT_LIMIT", 5000)
+
+
+def backfill_size():
+    return getattr(settings, "TIMELINE_BACKFILL", 500)
+
+
+def fan_out_post(post):
+    """Push a new post into the timeline of every follower of its author"""
+    author = post.created_by
+    if author is None or Profile.objects.filter(user=author, fanout_on_read=True).exists():
+        return
+
+    limit = fanout_limit()
+    followers = list(UserFollowing.objects.filter(following_user_id=author)
+                     .values_list("user_id", flat=True)[:limit + 1])
+    if len(followers) > limit:
+        switch_to_fanout_on_read(author)
+        return
+
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(owner_id=follower, post=post, created_on=post.created_on) for follower in followers],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def switch_to_fanout_on_read(author):
+    """Stop pushing an author's posts; followers merge them in when they read instead"""
+    Profile.objects.filter(user=author).update(fanout_on_read=True)
+    TimelineEntry.objects.filter(post__created_by=author).delete()
+
+
+def backfill_follow(follower, followed):
+    """Copy the newest posts of a newly followed user into the follower's timeline"""
+    if Profile.objects.filter(user=followed, fanout_on_read=True).exists():
+        return
+    recent = (Post.objects.filter(created_by=followed).exclude(created_on=None)
+              .order_by("-created_on", "-id")
+              .values_list("id", "created_on")[:backfill_size()])
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(owner=follower, post_id=pk, created_on=created_on) for pk, created_on in recent],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def prune_follow(follower, followed):
+    """Drop an unfollowed user's posts from the follower's timeline"""
+    TimelineEntry.objects.filter(owner=follower, post__created_by=followed).delete()
+
+
+class TimelinePaginator(CursorPaginator):
+    """
+    Cursor pages of a user's Following feed.
+
+    Pushed posts are one range read on (owner, created_on); posts of followed
+    fanout_on_read authors are pulled from Post and merged in by the same key.
+    """
+
+    def __init__(self, user, per_page):
+        entries = TimelineEntry.objects.filter(owner=user).only("post", "created_on")
+        super().__init__(entries, per_page, key=("created_on", "post_id"))
+        pulled_authors = list(UserFollowing.objects
+                              .filter(user_id=user, following_user_id__profile__fanout_on_read=True)
+                              .values_list("following_user_id", flat=True))
+        self.pulled = None
+        if pulled_authors:
+            self.pulled = CursorPaginator(
+                Post.objects.filter(created_by__in=pulled_authors).only("id", "created_on"), per_page)
+
+    def rows(self, direction, created_on, pk, limit):
+        # Bare stand-ins carrying just the key; feeds.load_page fetches the posts
+        pushed = [Post(id=entry.post_id, created_on=entry.created_on)
+                  for entry in super().rows(direction, created_on, pk, limit)]
+        if self.pulled is None:
+            return pushed
+        pulled = self.pulled.rows(direction, created_on, pk, limit)
+        merged = heapq.merge(pushed, pulled, key=lambda p: (p.created_on, p.id), reverse=direction == "n")
+        return list(islice(merged, limit))
@@ -1,14 +1,32 @@
 
+from django.conf import settings
 from django.urls import path
+from django.views.decorators.gzip import gzip_page
 
-from . import views
+from . import api, async_views, views
+
+# Under ASGI the feeds and the like endpoint are coroutine views (see async_views)
+feeds = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
-    path("", views.index, name="index"),
+    path("", feeds.index, name="index"),
     path("login", views.login_view, name="login"),
     path("logout", views.logout_view, name="logout"),
     path("register", views.register, name="register"),
-    path("profile/<str:user_name>", views.profile, name="profile"),
-    path("following", views.following, name="following"),
-    path("post", views.post, name="post")
+    path("profile/<str:user_name>", feeds.profile, name="profile"),
+    path("following", feeds.following, name="following"),
+    path("post", feeds.post, name="post"),
+    path("post/batch", views.post_batch, name="post_batch"),
+    path("search", views.search, name="search"),
+    path("stats/cards", views.card_cache_stats, name="card_cache_stats"),
+    path("stats/metrics", views.request_metrics, name="request_metrics"),
+
+    # Read-only JSON feeds
+    path("api/v1/posts", gzip_page(api.PostsFeed.as_view()), name="api_posts"),
+    path("api/v1/following", gzip_page(api.FollowingFeed.as_view()), name="api_following"),
+    path("api/v1/users/<str:username>/posts", gzip_page(api.UserFeed.as_view()), name="api_user_posts"),
+    path("api/v1/users/import", api.UserImport.as_view(), name="api_user_import"),
+    path("api/v1/users/<str:username>/graph", api.UserGraph.as_view(), name="api_user_graph"),
+    path("api/v1/tags/trending", api.TrendingTags.as_view(), name="api_trending_tags"),
+    path("api/v1/tags/<str:tag>/posts", gzip_page(api.TagFeed.as_view()), name="api_tag_posts"),
 ]
@@ -1,18 +1,38 @@
 import json
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
 from django.shortcuts import HttpResponse, HttpResponseRedirect, render
 from django.urls import reverse
-from django.core.paginator import Paginator
 from django.views.decorators.csrf import csrf_exempt
+from django.views.static import serve
 from django.contrib.auth.decorators import login_required
 import datetime
 
 from .models import *
 from .forms import *
+from .auth import HashingBusy
+from . import conditional
+from .conditional import conditional_feed, following_state, index_state, profile_state
+from .feeds import load_page
+from .follows import follows
+from .graph import profile_graph
+from .images import queue_profile_image
+from .likebuffer import get_like_buffer
+from .likes import toggle_like, toggle_likes
+from .live import hub
+from .metrics import metrics
+from .pagination import CursorPaginator
+from .profiles import profile_of
+from .search import find, index_posts
+from .storage import is_content_addressed
+from .tags import tag_posts
+from .templatetags import post_cards
+from .timeline import TimelinePaginator
 
 
+@conditional_feed(index_state)
 def index(request):
     form = PostModelForm()
     current_user = request.user
@@ -28,12 +48,12 @@ def index(request):
             p.save()       
         return HttpResponseRedirect(reverse("index"))
 
-    posts = Post.objects.all().order_by("-created_on")
+    posts = Post.objects.only("id", "created_on").order_by("-created_on")
 
     # pagination
-    paginator = Paginator(posts, 10) # Show 10 contacts per page.
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = CursorPaginator(posts, 10) # Show 10 posts per page.
+    cursor = request.GET.get('cursor')
+    page_obj = load_page(paginator.get_page(cursor), current_user) # authors, likes in one query
 
     # GET method: show blank form
     return render(request, "network/index.html", {
@@ -50,7 +70,12 @@ def login_view(request):
         # Attempt to sign user in
         username = request.POST["username"]
         password = request.POST["password"]
-        user = authenticate(request, username=username, password=password)
+        try:
+            user = authenticate(request, username=username, password=password)
+        except HashingBusy:
+            return render(request, "network/login.html", {
+                "message": "Too many sign-ins right now, please try again in a moment."
+            }, status=503)
 
         # Check if authentication successful
         if user is not None:
@@ -93,6 +118,10 @@ def register(request):
             return render(request, "network/register.html", {
                 "message": "Username already taken."
             })
+        except HashingBusy:
+            return render(request, "network/register.html", {
+                "message": "Too many sign-ups right now, please try again in a moment."
+            }, status=503)
         login(request, user)
         return HttpResponseRedirect(reverse("index"))
     else:
@@ -104,52 +133,125 @@ def post(request):
 
     # Update whether post is edited or the number of likes is changed
     if request.method == "PUT":
-        data = json.loads(request.body)
-        post_id = data.get("post_id")
-        post = Post.objects.get(id=post_id)
-        if not post:
-            return JsonResponse({
-                "error": "Post does not exist."
-            }, status=400)
-        content = data.get("editedpost")
+        return update_post(request.user, json.loads(request.body))
+    # Post must be via PUT
+    else:
+        return JsonResponse({
+            "error": "PUT request required."
+        }, status=400)
 
-        clicked = data.get("clicked")
+def update_post(user, data):
+    # Body of PUT /post (also used by async_views.post)
+    post_id = data.get("post_id")
+    post = Post.objects.filter(id=post_id).only("id", "created_on", "like_count").first()
+    if not post:
+        return JsonResponse({
+            "error": "Post does not exist."
+        }, status=400)
+    content = data.get("editedpost")
 
-        if content:
-            post.content = content
-        
-        if clicked:
-            if request.user in post.liker.all():
-                post.liker.remove(request.user)
-            else:
-                post.liker.add(request.user)
+    clicked = data.get("clicked")
 
-        post.save()
+    if content:
+        post.content = content
+        post.save(update_fields=["content"]) # only rewrite the edited column
+    
+    if clicked:
+        if settings.LIKE_WRITE_BEHIND:
+            liked, post.like_count = get_like_buffer().toggle(post.id, user.id, post.like_count)
+        else:
+            liked, post.like_count = toggle_like(post.id, user.id)
+        hub.publish_like(post.id, post.like_count) # other open pages see the new count
 
-        return JsonResponse({"message": "You edit the post successfully", "likes_number": str(post.liker.count())}, status=201) 
-    # Post must be via PUT
-    else:
+    return JsonResponse({"message": "You edit the post successfully", "likes_number": str(post.like_count)}, status=201) 
+
+@csrf_exempt
+@login_required
+def post_batch(request):
+    # Several like toggles and edits in one request, applied in one transaction
+    if request.method != "POST":
         return JsonResponse({
-            "error": "PUT request required."
+            "error": "POST request required."
+        }, status=400)
+    try:
+        actions = json.loads(request.body)["actions"]
+        post_ids = [int(action["post_id"]) for action in actions]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({
+            "error": "Expected {\"actions\": [{\"post_id\": ..., \"clicked\" or \"editedpost\": ...}]}."
+        }, status=400)
+    if len(actions) > settings.POST_BATCH_LIMIT:
+        return JsonResponse({
+            "error": f"At most {settings.POST_BATCH_LIMIT} actions per batch."
         }, status=400)
 
+    posts = Post.objects.only("id", "created_by_id", "created_on", "like_count").in_bulk(post_ids)
+    edited = {}
+    clicks = {}
+    results = []
+    for post_id, action in zip(post_ids, actions):
+        post = posts.get(post_id)
+        if not post:
+            results.append({"post_id": post_id, "error": "Post does not exist."})
+            continue
+        content = action.get("editedpost")
+        if content:
+            if post.created_by_id != request.user.id:
+                results.append({"post_id": post_id, "error": "You can only edit your own posts."})
+                continue
+            post.content = content
+            edited[post_id] = post
+        if action.get("clicked"):
+            clicks[post_id] = clicks.get(post_id, 0) + 1
+        results.append({"post_id": post_id})
+
+    # Two clicks on the same post cancel out
+    toggled = [post_id for post_id, n in clicks.items() if n % 2]
+    with transaction.atomic():
+        if edited:
+            Post.objects.bulk_update(edited.values(), ["content"])
+            # bulk_update sends no post_save
+            index_posts(edited.values())
+            tag_posts(edited.values())
+            transaction.on_commit(conditional.cards_changed)
+        if settings.LIKE_WRITE_BEHIND:
+            buffer = get_like_buffer()
+            likes = {post_id: buffer.toggle(post_id, request.user.id, posts[post_id].like_count) for post_id in toggled}
+        else:
+            likes = toggle_likes(toggled, request.user.id) if toggled else {}
+    for post_id, (liked, count) in likes.items():
+        hub.publish_like(post_id, count)
+
+    for result in results:
+        post_id = result["post_id"]
+        if "error" in result:
+            continue
+        if post_id in likes:
+            result["liked"], count = likes[post_id]
+            result["likes_number"] = str(count)
+        elif post_id in clicks:
+            result["likes_number"] = str(posts[post_id].like_count)
+        result["edited"] = post_id in edited
+    return JsonResponse({"results": results})
+
 @login_required(login_url="login")
+@conditional_feed(profile_state)
 def profile(request, user_name):
-    profile_user = User.objects.get(username = user_name)
+    profile_user = User.objects.select_related("profile").get(username = user_name)
     current_user = request.user
     
-    # Upload profile pic
-    profile = request.user.profile
+    # Upload profile pic (the first upload creates the profile)
+    profile = profile_of(request.user)
     form = ProfileForm(instance=profile)
 
     # [others]Follow / Unfollow
     if profile_user != current_user:
         if request.method == "POST":
+            # The button may have been rendered before a follow or unfollow in another tab
             if "unfollow" in request.POST:
-                UserFollowing.objects.get(user_id=current_user, following_user_id=profile_user).delete()
+                UserFollowing.objects.filter(user_id=current_user, following_user_id=profile_user).delete()
             elif "follow" in request.POST:
-                f = UserFollowing(user_id=current_user, following_user_id=profile_user)
-                f.save()
+                UserFollowing.objects.get_or_create(user_id=current_user, following_user_id=profile_user)
 
             return HttpResponseRedirect(reverse("profile", args=(user_name, )))
     # [self]Upload profile picture
@@ -157,19 +259,20 @@ def profile(request, user_name):
         if request.method == 'POST':
             form = ProfileForm(request.POST, request.FILES,instance=profile)
             if form.is_valid():
-                form.save()
+                profile = form.save(commit=False)
+                profile.thumbnails_ready = False # original is served until the workers finish
+                profile.save()
+                queue_profile_image(profile)
                 form = ProfileForm() # 清空 form
     
-    is_following = False
-    if profile_user.followers.filter(user_id=current_user, following_user_id=profile_user).exists():
-        is_following = True
+    is_following = follows(current_user, profile_user) # cached when workers share a cache
 
-    posts = Post.objects.filter(created_by = profile_user).order_by("-created_on")# the most recent posts first
+    posts = Post.objects.filter(created_by = profile_user).only("id", "created_on").order_by("-created_on")# the most recent posts first
 
     # pagination
-    paginator = Paginator(posts, 10) # Show 10 contacts per page.
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = CursorPaginator(posts, 10) # Show 10 posts per page.
+    cursor = request.GET.get('cursor')
+    page_obj = load_page(paginator.get_page(cursor), current_user) # authors, likes in one query
 
     return render(request, "network/profile.html", {
         "profile_user": profile_user,
@@ -179,9 +282,11 @@ def profile(request, user_name):
         "paginator": paginator,
         "page_obj": page_obj,
         "form": form,
+        **profile_graph(current_user, profile_user), # mutuals, followers you know, who to follow
     })
 
 @login_required(login_url="login")
+@conditional_feed(following_state)
 def following(request):
     # Behave just as the “All Posts”(index) page does
     form = PostModelForm()
@@ -198,19 +303,62 @@ def following(request):
             p.save()       
         return HttpResponseRedirect(reverse("index"))
 
-    following = [UserFollowing.following_user_id for UserFollowing in current_user.following.all()] # a list of following users
-    posts = Post.objects.filter(created_by__in=following).order_by("-created_on") # __in: usage when check if in list
-    
-    # pagination
-    paginator = Paginator(posts, 10) # Show 10 contacts per page.
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Posts of followed users are materialized into the user's timeline on write
+    paginator = TimelinePaginator(current_user, 10) # Show 10 posts per page.
+    cursor = request.GET.get('cursor')
+    page_obj = load_page(paginator.get_page(cursor), current_user) # authors, likes in one query
 
     # GET method: show blank form
     return render(request, "network/following.html", {
         'form': form,
         'name': current_user,
-        "posts": posts,
         "paginator": paginator,
         "page_obj": page_obj
     })
+
+
+def search(request):
+    # Full-text search over posts, best match first
+    query = request.GET.get('q', '').strip()
+    try:
+        number = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        number = 1
+    page_obj = load_page(find(query, number, 10), request.user) if query else None
+
+    return render(request, "network/search.html", {
+        "query": query,
+        "page_obj": page_obj,
+    })
+
+
+@login_required(login_url="login")
+def card_cache_stats(request):
+    # Post card fragment cache counters for this process (staff only)
+    if not request.user.is_staff:
+        return JsonResponse({
+            "error": "Staff only."
+        }, status=403)
+    return JsonResponse(post_cards.stats.snapshot())
+
+
+def request_metrics(request):
+    # Per-view timing histograms of this process, for staff or INTERNAL_IPS (see network.metrics)
+    if not request.user.is_staff and request.META.get("REMOTE_ADDR") not in settings.INTERNAL_IPS:
+        return JsonResponse({
+            "error": "Staff only."
+        }, status=403)
+    return JsonResponse({
+        "sample_rate": getattr(settings, "METRICS_SAMPLE_RATE", 0.1),
+        "slow_requests": metrics.slow,
+        "views": metrics.snapshot(),
+        "cards": post_cards.stats.snapshot(),
+    })
+
+
+def media(request, path):
+    # Uploaded media; names that embed their content hash never change, so let browsers and CDNs keep them
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if is_content_addressed(path):
+        response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
@@ -12,5 +12,14 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project4.settings')
+# Serve the feeds with the coroutine views in network/async_views.py
+os.environ.setdefault('DJANGO_ASYNC_VIEWS', '1')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# /live streams like counts and new-post notices next to the Django app,
+# static and media files are answered before either, outside DEBUG
+from network.files import asgi_files
+from network.live import live_app
+
+application = asgi_files(live_app(django_application))
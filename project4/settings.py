@@ -42,10 +42,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so that it times the whole request (network/metrics.py)
+    'network.metrics.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
+    'network.auth.LegacySessionMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -75,15 +78,187 @@ WSGI_APPLICATION = 'project4.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# Chosen from the environment: DB_ENGINE=postgresql|mysql with DB_NAME, DB_USER,
+# DB_PASSWORD, DB_HOST, DB_PORT; anything else keeps the local SQLite file.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite3')
+
+if DB_ENGINE == 'sqlite3':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+            'OPTIONS': {
+                # seconds a writer waits on a locked database before giving up
+                'timeout': 20,
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': f'django.db.backends.{DB_ENGINE}',
+            'NAME': os.environ.get('DB_NAME', 'network'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', ''),
+            # Keep connections open between requests instead of reconnecting each time;
+            # put PgBouncer/ProxySQL in front to pool across worker processes
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        }
     }
+
+# Applied to every new SQLite connection by network.db.tune_sqlite
+SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL',   # fsync at checkpoints only with WAL, less often without
+    'busy_timeout': 20000,     # ms to wait for the write lock
+    'mmap_size': 268435456,    # 256MB of the file read through mmap
+    'cache_size': -65536,      # 64MB page cache
+    'temp_store': 'MEMORY',
 }
+# WAL is written into the database file's header, so it is only switched on for a database
+# named by DB_NAME; the dev db.sqlite3 in the repository keeps its rollback journal
+if 'DB_NAME' in os.environ:
+    SQLITE_PRAGMAS = {'journal_mode': 'WAL', **SQLITE_PRAGMAS} # readers no longer block the writer
 
 AUTH_USER_MODEL = "network.User"
 
+# Loads the user and their Profile in one query (network/auth.py). It is the only backend, so a
+# failed login runs the password hasher once; sessions signed in through ModelBackend before are
+# moved over to it by LegacySessionMiddleware
+AUTHENTICATION_BACKENDS = [
+    'network.auth.ProfileBackend',
+]
+
+# New passwords are hashed with the first hasher; the others still check older hashes.
+# The pooled hasher makes and checks the same PBKDF2 hashes as django's default (which must
+# not be listed too: it would take over checking them, off the pool), on a pool of
+# PASSWORD_HASH_WORKERS threads so that login bursts leave the other cores to the feeds;
+# at most PASSWORD_HASH_QUEUE more hashes wait, for PASSWORD_HASH_WAIT seconds, before a 503
+PASSWORD_HASHERS = [
+    'network.auth.PooledPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_QUEUE = 32
+PASSWORD_HASH_WAIT = 5
+
+# Sessions live in the database unless DJANGO_SESSION_CACHE names a memcached server
+# (host:port) that all workers share. Then they are read from that cache and written through
+# to the database as well ("cached_db"), so they survive restarts; DJANGO_SESSION_WRITE_THROUGH=0
+# keeps them in the cache only. A per-process cache is never used for sessions: a logout in
+# one worker would leave the session valid in the others' caches
+SESSION_CACHE = os.environ.get('DJANGO_SESSION_CACHE')
+SESSION_WRITE_THROUGH = os.environ.get('DJANGO_SESSION_WRITE_THROUGH', '1') == '1'
+if SESSION_CACHE:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.' + ('cached_db' if SESSION_WRITE_THROUGH else 'cache')
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Django REST framework
+REST_FRAMEWORK = {
+    # JSON only: the browsable API would render templates on every poll
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+    'DEFAULT_PAGINATION_CLASS': 'network.api.FeedPagination',
+    'PAGE_SIZE': 10,
+}
+
+# Cache
+# Holds rendered post cards, sized well past the default 300
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'network',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    # Kept apart so that post cards never evict sessions
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': SESSION_CACHE,
+    } if SESSION_CACHE else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    # "does A follow B" answers. Every worker must see a follow made in another, so they are
+    # only cached on the shared memcached server; without one each lookup is an indexed read
+    'follows': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': SESSION_CACHE,
+        'KEY_PREFIX': 'follows',
+    } if SESSION_CACHE else {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+
+# Following feed: authors with more followers than this are merged in at read
+# time instead of being pushed to every follower's timeline when they post
+TIMELINE_FANOUT_LIMIT = 5000
+TIMELINE_BACKFILL = 500
+
+# Buffer like toggles in memory and write them in batches every
+# LIKE_BUFFER_INTERVAL seconds (per process; a crash loses one interval)
+LIKE_WRITE_BEHIND = False
+LIKE_BUFFER_INTERVAL = 1.0
+
+# Feed pages answer conditional GETs with a 304 when nothing they show changed
+# (network/conditional.py); shared proxies may keep the anonymous index this long
+FEED_SHARED_MAX_AGE = 10
+
+# Route the feeds and PUT /post to the coroutine views in network/async_views.py;
+# project4/asgi.py turns this on, WSGI deployments keep the sync views
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS', '0') == '1'
+
+# Seconds between pushes of like counts and new-post notices to /live streams (ASGI only)
+LIVE_TICK = 1.0
+
+# Full-text search index: "fts5" (SQLite), "terms" (the PostTerm inverted index)
+# or "auto" for fts5 on SQLite and terms elsewhere; rebuild_search after a change
+SEARCH_BACKEND = 'auto'
+
+# Only the newest matches of a query are ranked, so a word found in most posts costs this many rows
+SEARCH_MAX_RANKED = 5000
+
+# Trending tags count the posts of the last TRENDING_WINDOW seconds, in buckets of TRENDING_BUCKET seconds
+TRENDING_WINDOW = 60 * 60
+TRENDING_BUCKET = 5 * 60
+
+# The in-memory follow graph (network.graph) is reloaded after this many seconds, so that follows
+# made by other processes show up, or once this many follows were applied on top of it
+FOLLOW_GRAPH_MAX_AGE = 300
+FOLLOW_GRAPH_COMPACT = 10000
+
+# Fraction of requests whose queries and template rendering are timed (Server-Timing, /stats/metrics);
+# requests slower than METRICS_SLOW_MS are written to the "network.slow" log
+METRICS_SAMPLE_RATE = 0.1
+METRICS_SLOW_MS = 500
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        # One JSON object per line
+        'slow': {'class': 'logging.StreamHandler', 'formatter': 'message'},
+    },
+    'loggers': {
+        'network.slow': {'handlers': ['slow'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
+# Most likes and edits accepted by one /post/batch request
+POST_BATCH_LIMIT = 100
+
+# Profile pictures are resized off the request path into these square WebP sizes
+THUMBNAIL_SIZES = (64, 128, 256)
+IMAGE_WORKERS = 2
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -123,6 +298,13 @@ STATIC_URL = '/static/'
 
 MEDIA_URL = '/images/'
 
-STATICFILES_DIRS = (os.path.join(BASE_DIR, "static"),)
-
 MEDIA_ROOT = os.path.join(BASE_DIR, 'static/images')
+
+# collectstatic copies the apps' static files here under fingerprinted names (post.3f2a9c1e8b7d.js),
+# which {% static %} links to, with .gz (and, given the brotli package, .br) copies of the text ones.
+# Outside DEBUG, project4/wsgi.py and asgi.py serve them and MEDIA_ROOT ahead of Django
+# (network/files.py): fingerprinted and content-addressed names as immutable, the rest for
+# STATIC_MAX_AGE seconds
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STATICFILES_STORAGE = 'network.storage.CompressedManifestStaticFilesStorage'
+STATIC_MAX_AGE = 60
@@ -13,4 +13,7 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'project4.settings')
 
-application = get_wsgi_application()
+# Static and media files are answered before Django, outside DEBUG
+from network.files import wsgi_files
+
+application = wsgi_files(get_wsgi_application())